@@ -1,16 +1,50 @@
 import os
+import math
 import secrets
-import hashlib
-import smtplib
-from email.mime.text import MIMEText
+import binascii
+from email.mime.nonmultipart import MIMENonMultipart
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import jwt
-from supabase import create_client, Client
+from outbox import Outbox, OUTBOX_DB_PATH
+from smtp_pool import SMTPConnectionPool, is_outage as is_smtp_outage
+from cache import create_cache, USER_CACHE_SIZE, USER_CACHE_TTL
+from auth import require_auth, require_admin, token_cache
+from passwords import PasswordHasher, PasswordHasherBusy
+import ratelimit
+from static_pages import StaticPage
+from mail_templates import render_mail, verify_success_page, MAIL_LOCALES, MAIL_DEFAULT_LOCALE
+import metrics
+import json_provider
+import singleflight
+from json_provider import StaticJSON
+from profiler import profiler, is_session
+from supabase_client import supabase, pool_stats
+from link_tokens import (LinkTokenSigner, InvalidLinkToken, ExpiredLinkToken, is_signed,
+                         LINK_TOKEN_FORMAT, PURPOSE_VERIFY, PURPOSE_RESET)
+from ratelimit import (rate_limit, RATE_LIMIT_LOGIN_IP, RATE_LIMIT_LOGIN_EMAIL, RATE_LIMIT_REGISTER_IP,
+                       RATE_LIMIT_REGISTER_EMAIL, RATE_LIMIT_RESET_IP, RATE_LIMIT_RESET_EMAIL)
+from repository import (UserRepository, PasswordResetRepository, TokenLedgerRepository, DuplicateEmailError,
+                        query_stats, REPOSITORY_FULL_ROWS)
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metering import TokenMeter, DebitJournal, InsufficientTokens, METERING_MAX_DEBIT, METERING_JOURNAL_PATH
+from user_stream import UserFeed, StreamLimitReached
+from export import export_stream, select_columns, ExportError, EXPORT_FORMATS
 
 app = Flask(__name__)
+# Anzahl vertrauenswürdiger Proxys vor der App (Render: 1). Nur deren Einträge in
+# X-Forwarded-For zählen für request.remote_addr (Rate-Limits pro IP).
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+# Schnellerer JSON-Encoder (orjson), falls installiert
+json_provider.init_app(app)
+metrics.init_app(app)
+profiler.init_app(app)
 
 # CORS-Konfiguration mit Dashboard-URL
 CORS(app, origins=[
@@ -22,8 +56,9 @@ CORS(app, origins=[
 
 # Konfiguration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-SUPABASE_URL = os.environ.get('SUPABASE_URL')
-SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+
+# Signierte Bestätigungs- und Reset-Links (ohne Datenbank-Lookup prüfbar)
+link_tokens = LinkTokenSigner(app.config['SECRET_KEY'])
 
 # E-Mail Konfiguration - Checkdomain SMTP
 SMTP_SERVER = "host285.checkdomain.de"
@@ -31,173 +66,223 @@ SMTP_PORT = 465
 EMAIL_USER = os.environ.get('EMAIL_USER', 'noreply@zyrix.de')
 EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 
-# Supabase Client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase Client (wird pro Worker-Prozess beim ersten Zugriff gebaut)
+users = UserRepository(supabase)
+password_resets = PasswordResetRepository(supabase)
+token_ledger = TokenLedgerRepository(supabase)
+metrics.register_gauge('zyrix_supabase_connections_open', 'Offene Verbindungen im Supabase-Pool',
+                       lambda: pool_stats().get('connections_open', 0))
+metrics.register_gauge('zyrix_supabase_requests_reused', 'Supabase-Requests über bestehende Verbindungen',
+                       lambda: pool_stats().get('requests_reused', 0))
+metrics.register_gauge('zyrix_supabase_requests_waited', 'Supabase-Requests, die auf eine freie Verbindung warten mussten',
+                       lambda: pool_stats().get('requests_waited', 0))
+
+metrics.register_gauge('zyrix_singleflight_saved_calls', 'Durch Single-Flight eingesparte Supabase-Abfragen',
+                       singleflight.saved_calls)
+
+# Passwort-Hashing (scrypt im Prozess-Pool)
+password_hasher = PasswordHasher()
+
+# Read-Through-Cache für Benutzerdaten (/user-info), gemeinsam für alle Worker des Hosts (CACHE_BACKEND)
+user_cache = create_cache('users', USER_CACHE_SIZE, USER_CACHE_TTL)
+
+def load_user(user_id):
+    """Benutzer per ID laden, zuerst aus dem Cache"""
+    return user_cache.get_or_load(user_id, lambda: users.find_info(user_id))
+
+def invalidate_user(user_id):
+    """Cache-Eintrag nach Schreibzugriffen auf users verwerfen"""
+    user_cache.invalidate(user_id)
+    users.forget(user_id)
+
+def load_balance(user_id):
+    """Aktuellen Kontostand direkt aus Supabase lesen (Metering)"""
+    user_data = users.find_balance(user_id)
+    return user_data['tokens'] if user_data else None
+
+# Token-Metering: Abbuchungen im Speicher sammeln, gebündelt ins Ledger schreiben
+token_meter = TokenMeter(load_balance, token_ledger.apply_debits, on_flushed=invalidate_user,
+                         journal=DebitJournal(METERING_JOURNAL_PATH))
+metrics.register_gauge('zyrix_metering_pending_tokens', 'Abgebuchte, noch nicht geschriebene Tokens',
+                       lambda: token_meter.stats()['pending_tokens'])
+
+def stream_value(row):
+    """Wert des Live-Kontostands; ein Event wird nur gesendet, wenn er sich ändert"""
+    return {'tokens': token_meter.available(row['id'], row['tokens']), 'status': row['status']}
+
+# Live-Kontostand: ein Änderungs-Feed pro Worker für alle offenen /user-info/stream-Verbindungen
+user_feed = UserFeed(users.find_balances, stream_value)
+# Retry-After, wenn ein Worker keine weiteren Streams annimmt
+USER_STREAM_RETRY_AFTER = int(os.environ.get('USER_STREAM_RETRY_AFTER', 30))
+metrics.register_gauge('zyrix_user_stream_connections', 'Offene /user-info/stream-Verbindungen',
+                       lambda: user_feed.stats()['connections'])
+
+# SMTP-Pool: authentifizierte Sitzungen werden wiederverwendet
+smtp_pool = SMTPConnectionPool(SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD,
+                               observer=metrics.observe_smtp)
+
+# Circuit für den SMTP-Server: ein Aufruf ist ein ganzer Sammelversand, daher weniger Mindestaufrufe.
+# Keine eigenen Wiederholungen, das übernimmt die Outbox mit Backoff.
+SMTP_BREAKER_MIN_CALLS = int(os.environ.get('SMTP_BREAKER_MIN_CALLS', 3))
+smtp_breaker = CircuitBreaker('smtp', is_failure=is_smtp_outage, min_calls=SMTP_BREAKER_MIN_CALLS, retries=0)
+
+# Über alle Worker der schlechteste Zustand
+metrics.register_gauge('zyrix_circuit_state', 'Circuit-Zustand pro Abhängigkeit (0 closed, 1 half_open, 2 open)',
+                       lambda: {(name, ): circuit_breaker.STATE_VALUES[state]
+                                for name, state in circuit_breaker.states().items()},
+                       labels=['dependency'], multiprocess_mode='livemax')
+metrics.register_gauge('zyrix_circuit_rejected_calls', 'Wegen offenem Circuit sofort abgelehnte Aufrufe',
+                       lambda: {(breaker.name, ): breaker.rejected for breaker in circuit_breaker.breakers()},
+                       labels=['dependency'])
+
+def mime_text(content, subtype):
+    """Text-Teil in Quoted-Printable (Vorlagen sind fast nur ASCII, kleiner als Base64; Kodierung in C)"""
+    part = MIMENonMultipart('text', subtype, charset='utf-8')
+    part['Content-Transfer-Encoding'] = 'quoted-printable'
+    part.set_payload(binascii.b2a_qp(content.encode('utf-8')).decode('ascii'))
+    return part
+
+def build_email(to_email, subject, html_content, text_content=None):
+    """MIME-Nachricht aufbauen (Text-Fassung zuerst, Mail-Programme zeigen den letzten Teil an)"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = EMAIL_USER
+    msg['To'] = to_email
+    
+    if text_content:
+        msg.attach(mime_text(text_content, 'plain'))
+    msg.attach(mime_text(html_content, 'html'))
+    return msg
 
-def send_email(to_email, subject, html_content):
+def send_email(to_email, subject, html_content, text_content=None):
     """E-Mail versenden über Checkdomain SMTP"""
     try:
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = EMAIL_USER
-        msg['To'] = to_email
-        
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
-        
-        # SSL-Verbindung für Port 465
-        server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
-        server.login(EMAIL_USER, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        smtp_breaker.call(lambda: smtp_pool.send(build_email(to_email, subject, html_content, text_content)))
         return True
     except Exception as e:
         print(f"E-Mail Fehler: {e}")
         return False
 
-def create_verification_email(user_name, verification_link):
-    """Bestätigungs-E-Mail Template erstellen"""
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 10px rgba(0,0,0,0.1); }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }}
-            .logo {{ font-size: 2.5rem; font-weight: 800; color: #FF9900; margin-bottom: 10px; }}
-            .content {{ padding: 30px; }}
-            .button {{ display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin: 20px 0; }}
-            .footer {{ background: #f8f9fa; padding: 20px; font-size: 12px; color: #666; border-top: 1px solid #eee; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">Zyrix</div>
-                <h2>E-Mail-Adresse bestätigen</h2>
-            </div>
-            <div class="content">
-                <h3>Hallo {user_name}!</h3>
-                <p>Vielen Dank für Ihre Registrierung bei Zyrix.de!</p>
-                <p>Um Ihr Konto zu aktivieren und Ihre <strong>1200 kostenlosen Test-Tokens</strong> zu erhalten, bestätigen Sie bitte Ihre E-Mail-Adresse:</p>
-                <div style="text-align: center;">
-                    <a href="{verification_link}" class="button">✅ E-Mail-Adresse bestätigen</a>
-                </div>
-                <p><strong>Wichtig:</strong> Ohne Bestätigung können Sie sich nicht anmelden und haben keinen Zugriff auf die Zyrix-Tools.</p>
-                <p>Falls Sie sich nicht bei Zyrix registriert haben, ignorieren Sie diese E-Mail einfach.</p>
-                <p>Bei Fragen erreichen Sie uns unter: <a href="mailto:support@zyrix.de">support@zyrix.de</a></p>
-            </div>
-            <div class="footer">
-                <strong>Zyrix.de</strong><br>
-                Inhaber: Marc Netzer<br>
-                Mürmeln 77, 41363 Jüchen, Deutschland<br>
-                E-Mail: support@zyrix.de | Website: www.zyrix.de<br>
-                USt-IdNr.: DE327892859
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+def send_email_batch(messages):
+    """Mehrere E-Mails über eine SMTP-Sitzung versenden"""
+    try:
+        emails = [build_email(*message) for message in messages]
+        # Verbindungsabbrüche liefert send_many als Ergebnis statt als Ausnahme
+        results = smtp_breaker.call(lambda: smtp_pool.send_many(emails),
+                                    is_failed_result=lambda results: any(
+                                        result is not True and is_smtp_outage(result) for result in results))
+    except Exception as e:
+        print(f"E-Mail Fehler: {e}")
+        return [e] * len(messages)
+    for result in results:
+        if result is not True:
+            print(f"E-Mail Fehler: {result}")
+    return results
 
-def create_password_reset_email(user_name, reset_link):
-    """Passwort-Reset-E-Mail Template erstellen"""
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
-            .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 10px rgba(0,0,0,0.1); }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }}
-            .logo {{ font-size: 2.5rem; font-weight: 800; color: #FF9900; margin-bottom: 10px; }}
-            .content {{ padding: 30px; }}
-            .button {{ display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin: 20px 0; }}
-            .footer {{ background: #f8f9fa; padding: 20px; font-size: 12px; color: #666; border-top: 1px solid #eee; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">Zyrix</div>
-                <h2>Passwort zurücksetzen</h2>
-            </div>
-            <div class="content">
-                <h3>Hallo {user_name}!</h3>
-                <p>Sie haben eine Anfrage zum Zurücksetzen Ihres Passworts gestellt.</p>
-                <p>Klicken Sie auf den folgenden Link, um ein neues Passwort zu erstellen:</p>
-                <div style="text-align: center;">
-                    <a href="{reset_link}" class="button">🔑 Neues Passwort erstellen</a>
-                </div>
-                <p><strong>Wichtig:</strong> Dieser Link ist nur 24 Stunden gültig.</p>
-                <p>Falls Sie diese Anfrage nicht gestellt haben, ignorieren Sie diese E-Mail einfach.</p>
-                <p>Bei Fragen erreichen Sie uns unter: <a href="mailto:support@zyrix.de">support@zyrix.de</a></p>
-            </div>
-            <div class="footer">
-                <strong>Zyrix.de</strong><br>
-                Inhaber: Marc Netzer<br>
-                Mürmeln 77, 41363 Jüchen, Deutschland<br>
-                E-Mail: support@zyrix.de | Website: www.zyrix.de<br>
-                USt-IdNr.: DE327892859
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+# E-Mail-Outbox: Versand im Hintergrund statt im Request
+outbox = Outbox(OUTBOX_DB_PATH, send_email, batch_sender=send_email_batch, available=smtp_breaker.available)
+# Alle Worker lesen dieselbe Outbox-Datei, daher Maximum statt Summe
+metrics.register_gauge('zyrix_outbox_pending', 'Wartende E-Mails in der Outbox', outbox.pending_count,
+                       multiprocess_mode='livemax')
+
+def queue_email(to_email, subject, html_content, text_content=None):
+    """E-Mail in die Outbox stellen, Versand erfolgt asynchron"""
+    try:
+        outbox.enqueue(to_email, subject, html_content, text_content)
+        return True
+    except Exception as e:
+        print(f"Outbox Fehler: {e}")
+        return False
+
+@app.before_request
+def start_background_workers():
+    # Worker erst im jeweiligen gunicorn-Prozess starten (fork-sicher)
+    outbox.start()
+    token_meter.start()
+
+def server_error(e):
+    """Fehlerantwort der Endpunkte: 503 mit Retry-After bei offenem Circuit oder ausgelastetem Hashing, sonst 500"""
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({'error': 'Dienst vorübergehend nicht erreichbar, bitte später erneut versuchen'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+        return response, 503
+    if isinstance(e, PasswordHasherBusy):
+        response = jsonify({'error': 'Server ausgelastet, bitte in Kürze erneut versuchen'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+        return response, 503
+    return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+
+def request_locale():
+    """Sprache für E-Mails und Bestätigungsseite aus Accept-Language (Standard: MAIL_DEFAULT_LOCALE)"""
+    return request.accept_languages.best_match(MAIL_LOCALES, default=MAIL_DEFAULT_LOCALE)
+
+REGISTRATION_REQUIRED_FIELDS = ['full_name', 'email', 'password', 'strasse', 'plz', 'stadt', 'land']
+
+def validate_registration(data, required_fields=REGISTRATION_REQUIRED_FIELDS):
+    """Pflichtfelder prüfen (register und bulk_import), liefert die Fehlermeldung oder None"""
+    for field in required_fields:
+        if not data.get(field):
+            return f'{field} ist erforderlich'
+    return None
+
+def build_user_record(data, password_hash, verification_token):
+    """Neue users-Zeile (status: pending) aus den Registrierungsdaten"""
+    return {
+        'full_name': data['full_name'],
+        'email': data['email'],
+        'password_hash': password_hash,
+        'strasse': data['strasse'],
+        'plz': data['plz'],
+        'stadt': data['stadt'],
+        'land': data['land'],
+        'firmenname': data.get('firmenname'),
+        'ust_idnr': data.get('ust_idnr'),
+        'tokens': 1200,
+        'status': 'pending',
+        'verification_token': verification_token,
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+def build_verification_email(full_name, verification_token, locale=None):
+    """Bestätigungs-E-Mail als (Betreff, HTML, Text)"""
+    verification_link = f"https://zyrix-backend-render.onrender.com/verify-email?token={verification_token}"
+    return render_mail('verification', locale, name=full_name, link=verification_link)
 
 @app.route('/register', methods=['POST'])
+@rate_limit('register', per_ip=RATE_LIMIT_REGISTER_IP, per_email=RATE_LIMIT_REGISTER_EMAIL)
 def register():
     try:
         data = request.get_json()
         
         # Validierung
-        required_fields = ['full_name', 'email', 'password', 'strasse', 'plz', 'stadt', 'land']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} ist erforderlich'}), 400
-        
-        # E-Mail bereits registriert?
-        existing_user = supabase.table('users').select('*').eq('email', data['email']).execute()
-        if existing_user.data:
-            return jsonify({'error': 'E-Mail-Adresse bereits registriert'}), 400
+        error = validate_registration(data)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Passwort hashen
-        password_hash = hashlib.sha256(data['password'].encode()).hexdigest()
+        password_hash = password_hasher.hash(data['password'])
         
-        # Verification Token generieren
-        verification_token = secrets.token_urlsafe(32)
+        # Verification Token generieren (signierte Tokens erst nach dem Insert, sie tragen die User-ID)
+        signed_links = LINK_TOKEN_FORMAT == 'signed'
+        verification_token = None if signed_links else secrets.token_urlsafe(32)
         
         # Benutzer in Datenbank speichern (status: pending)
-        user_data = {
-            'full_name': data['full_name'],
-            'email': data['email'],
-            'password_hash': password_hash,
-            'strasse': data['strasse'],
-            'plz': data['plz'],
-            'stadt': data['stadt'],
-            'land': data['land'],
-            'firmenname': data.get('firmenname'),
-            'ust_idnr': data.get('ust_idnr'),
-            'tokens': 1200,
-            'status': 'pending',
-            'verification_token': verification_token,
-            'created_at': datetime.utcnow().isoformat()
-        }
+        user_data = build_user_record(data, password_hash, verification_token)
         
-        result = supabase.table('users').insert(user_data).execute()
+        # E-Mail bereits registriert? (Unique-Index, kein separater SELECT)
+        try:
+            result = users.create(user_data, return_id=signed_links)
+        except DuplicateEmailError:
+            return jsonify({'error': 'E-Mail-Adresse bereits registriert'}), 400
         
-        if result.data:
-            # Bestätigungs-E-Mail senden
-            verification_link = f"https://zyrix-backend-render.onrender.com/verify-email?token={verification_token}"
-            email_html = create_verification_email(data['full_name'], verification_link)
+        if result:
+            if signed_links:
+                verification_token = link_tokens.verification_token(result)
             
-            email_sent = send_email(
-                data['email'],
-                "Zyrix.de - E-Mail-Adresse bestätigen",
-                email_html
-            )
+            # Bestätigungs-E-Mail senden
+            subject, email_html, email_text = build_verification_email(data['full_name'], verification_token,
+                                                                       request_locale())
+            email_sent = queue_email(data['email'], subject, email_html, email_text)
             
             if email_sent:
                 return jsonify({
@@ -213,7 +298,7 @@ def register():
             return jsonify({'error': 'Registrierung fehlgeschlagen'}), 500
             
     except Exception as e:
-        return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+        return server_error(e)
 
 @app.route('/verify-email', methods=['GET'])
 def verify_email():
@@ -223,51 +308,34 @@ def verify_email():
         if not token:
             return "Ungültiger Bestätigungslink", 400
         
-        # Benutzer mit Token finden
-        user = supabase.table('users').select('*').eq('verification_token', token).eq('status', 'pending').execute()
+        if is_signed(token):
+            # Signatur und Ablauf ohne Datenbank prüfen, dann per ID aktivieren
+            try:
+                claims = link_tokens.verify(token, PURPOSE_VERIFY)
+            except ExpiredLinkToken:
+                return "Bestätigungslink abgelaufen", 400
+            except InvalidLinkToken:
+                return "Bestätigungslink ungültig oder bereits verwendet", 400
+            user_id = users.verify_by_id(claims['u'])
+        else:
+            # Benutzer mit Token finden und aktivieren (ein atomarer Aufruf)
+            user_id = users.verify_by_token(token)
         
-        if not user.data:
+        if not user_id:
             return "Bestätigungslink ungültig oder bereits verwendet", 400
         
-        user_data = user.data[0]
-        
-        # Benutzer aktivieren
-        supabase.table('users').update({
-            'status': 'verified',
-            'verification_token': None,
-            'verified_at': datetime.utcnow().isoformat()
-        }).eq('id', user_data['id']).execute()
-        
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>E-Mail bestätigt - Zyrix</title>
-            <style>
-                body {{ font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; display: flex; align-items: center; justify-content: center; }}
-                .container {{ background: white; border-radius: 20px; padding: 40px; text-align: center; box-shadow: 0 20px 40px rgba(0,0,0,0.1); max-width: 500px; }}
-                .logo {{ font-size: 3rem; font-weight: 800; color: #FF9900; margin-bottom: 20px; }}
-                .success {{ color: #28a745; font-size: 1.2rem; margin-bottom: 20px; }}
-                .button {{ display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="logo">Zyrix</div>
-                <div class="success">✅ E-Mail-Adresse erfolgreich bestätigt!</div>
-                <p>Ihr Konto ist jetzt aktiviert und Sie haben <strong>1200 Test-Tokens</strong> erhalten.</p>
-                <p>Sie können sich jetzt anmelden und alle Zyrix-Tools nutzen.</p>
-                <a href="https://zyrix-dahboard.onrender.com" class="button">🚀 Zum Zyrix Dashboard</a>
-            </div>
-        </body>
-        </html>
-        """
+        invalidate_user(user_id)
+        
+        return verify_success_page(request_locale()).response()
         
+    except CircuitOpenError as e:
+        return ("Bestätigung vorübergehend nicht möglich, bitte versuchen Sie es in Kürze erneut", 503,
+                {'Retry-After': str(max(1, math.ceil(e.retry_after)))})
     except Exception as e:
         return f"Fehler bei der Bestätigung: {str(e)}", 500
 
 @app.route('/login', methods=['POST'])
+@rate_limit('login', per_ip=RATE_LIMIT_LOGIN_IP, per_email=RATE_LIMIT_LOGIN_EMAIL)
 def login():
     try:
         data = request.get_json()
@@ -278,13 +346,11 @@ def login():
             return jsonify({'error': 'E-Mail und Passwort erforderlich'}), 400
         
         # Benutzer finden
-        user = supabase.table('users').select('*').eq('email', email).execute()
+        user_data = users.find_for_login(email)
         
-        if not user.data:
+        if not user_data:
             return jsonify({'error': 'Ungültige Anmeldedaten'}), 401
         
-        user_data = user.data[0]
-        
         # E-Mail-Bestätigung prüfen
         if user_data.get('status') != 'verified':
             return jsonify({
@@ -293,10 +359,16 @@ def login():
             }), 401
         
         # Passwort prüfen
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        if user_data['password_hash'] != password_hash:
+        if not password_hasher.verify(password, user_data['password_hash']):
             return jsonify({'error': 'Ungültige Anmeldedaten'}), 401
         
+        # Alte SHA-256-Hashes bzw. alte Kostenparameter beim Login ersetzen
+        if password_hasher.needs_rehash(user_data['password_hash']):
+            try:
+                users.update_password_hash(user_data['id'], password_hasher.hash(password))
+            except Exception as e:
+                print(f"Rehash Fehler: {e}")
+        
         # JWT Token erstellen
         token_payload = {
             'user_id': user_data['id'],
@@ -318,35 +390,23 @@ def login():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+        return server_error(e)
 
 @app.route('/user-info', methods=['GET'])
+@require_auth
 def get_user_info():
     """Benutzer-Informationen und aktuelle Token-Anzahl abrufen"""
     try:
-        # JWT Token aus Authorization Header lesen
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authorization Token erforderlich'}), 401
-        
-        token = auth_header.split(' ')[1]
-        
-        # JWT Token validieren
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            user_id = payload['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token abgelaufen'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Ungültiger Token'}), 401
+        user_id = g.user_id
         
-        # Aktuelle Benutzer-Daten aus Supabase abrufen
-        user = supabase.table('users').select('*').eq('id', user_id).execute()
+        # Aktuelle Benutzer-Daten abrufen (Cache, sonst Supabase)
+        user_data = load_user(user_id)
         
-        if not user.data:
+        if not user_data:
             return jsonify({'error': 'Benutzer nicht gefunden'}), 404
         
-        user_data = user.data[0]
+        # Noch nicht geschriebene Abbuchungen dieses Workers berücksichtigen
+        tokens = token_meter.available(user_id, user_data['tokens'])
         
         # Benutzer-Informationen zurückgeben
         return jsonify({
@@ -354,16 +414,90 @@ def get_user_info():
                 'id': user_data['id'],
                 'email': user_data['email'],
                 'full_name': user_data['full_name'],
-                'tokens': user_data['tokens'],
+                'tokens': tokens,
                 'status': user_data['status']
             },
-            'tokens': user_data['tokens']
+            'tokens': tokens
+        }), 200
+        
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/user-info/stream', methods=['GET'])
+@require_auth
+def stream_user_info():
+    """Live-Kontostand als Server-Sent Events statt /user-info-Polling.
+
+    Sendet Tokens und Status sofort und danach nur bei Änderungen
+    (event: balance), dazwischen Heartbeats. Endet mit event: expired,
+    wenn das JWT abläuft.
+    """
+    try:
+        user_id = g.user_id
+        user_data = load_user(user_id)
+        if not user_data:
+            return jsonify({'error': 'Benutzer nicht gefunden'}), 404
+        
+        try:
+            subscription = user_feed.subscribe(user_id, user_data)
+        except StreamLimitReached:
+            response = jsonify({'error': 'Zu viele Live-Verbindungen, bitte /user-info verwenden'})
+            response.headers['Retry-After'] = str(USER_STREAM_RETRY_AFTER)
+            return response, 503
+        
+        try:
+            response = Response(user_feed.events(subscription, g.jwt_payload.get('exp')),
+                                mimetype='text/event-stream')
+        except Exception:
+            user_feed.unsubscribe(subscription)
+            raise
+        # Abmelden auch, wenn der Client vor dem ersten Event trennt (der Generator läuft dann nie an)
+        response.call_on_close(lambda: user_feed.unsubscribe(subscription))
+        response.headers['Cache-Control'] = 'no-store'
+        # Reverse-Proxys (nginx) sollen Events nicht puffern
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+        
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/consume-tokens', methods=['POST'])
+@require_auth
+def consume_tokens():
+    """Tokens für eine Tool-Nutzung abbuchen (optional mit Idempotency-Key)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        amount = data.get('amount')
+        if isinstance(amount, bool) or not isinstance(amount, int) or not 0 < amount <= METERING_MAX_DEBIT:
+            return jsonify({'error': f'amount muss eine ganze Zahl zwischen 1 und {METERING_MAX_DEBIT} sein'}), 400
+        
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if idempotency_key is not None and (not isinstance(idempotency_key, str) or len(idempotency_key) > 200):
+            return jsonify({'error': 'Ungültiger Idempotency-Key'}), 400
+        
+        try:
+            result = token_meter.consume(g.user_id, amount, idempotency_key)
+        except InsufficientTokens as e:
+            return jsonify({'error': 'Nicht genügend Tokens', 'tokens': e.available}), 402
+        
+        if result is None:
+            return jsonify({'error': 'Benutzer nicht gefunden'}), 404
+        
+        # Offene Live-Streams dieses Benutzers (dieser Worker) sofort benachrichtigen
+        user_feed.notify(g.user_id)
+        
+        return jsonify({
+            'message': 'Tokens abgebucht',
+            'consumed': result['consumed'],
+            'tokens': result['tokens'],
+            'idempotent_replay': result['replayed']
         }), 200
         
     except Exception as e:
-        return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+        return server_error(e)
 
 @app.route('/request-password-reset', methods=['POST'])
+@rate_limit('request-password-reset', per_ip=RATE_LIMIT_RESET_IP, per_email=RATE_LIMIT_RESET_EMAIL)
 def request_password_reset():
     try:
         data = request.get_json()
@@ -373,41 +507,34 @@ def request_password_reset():
             return jsonify({'error': 'E-Mail-Adresse erforderlich'}), 400
         
         # Benutzer finden
-        user = supabase.table('users').select('*').eq('email', email).execute()
+        user_data = users.find_for_reset_request(email)
         
-        if not user.data:
+        if not user_data:
             # Aus Sicherheitsgründen immer Erfolg melden
             return jsonify({'message': 'Falls die E-Mail-Adresse registriert ist, wurde ein Reset-Link gesendet'}), 200
         
-        user_data = user.data[0]
-        
-        # Reset Token generieren
-        reset_token = secrets.token_urlsafe(32)
-        expires_at = datetime.utcnow() + timedelta(hours=24)
-        
-        # Reset Token in Datenbank speichern
-        supabase.table('password_resets').insert({
-            'user_id': user_data['id'],
-            'token': reset_token,
-            'expires_at': expires_at.isoformat(),
-            'used': False,
-            'created_at': datetime.utcnow().isoformat()
-        }).execute()
+        if LINK_TOKEN_FORMAT == 'signed':
+            # Signierter Token: kein Eintrag in password_resets, gilt bis zum nächsten Passwortwechsel
+            reset_token = link_tokens.reset_token(user_data['id'], user_data['password_hash'])
+        else:
+            # Reset Token generieren
+            reset_token = secrets.token_urlsafe(32)
+            expires_at = datetime.utcnow() + timedelta(hours=24)
+            
+            # Reset Token in Datenbank speichern
+            password_resets.create(user_data['id'], reset_token, expires_at)
         
         # Reset-E-Mail senden
         reset_link = f"https://zyrix-backend-render.onrender.com/reset-password-page?token={reset_token}"
-        email_html = create_password_reset_email(user_data['full_name'], reset_link)
+        subject, email_html, email_text = render_mail('password_reset', request_locale(),
+                                                      name=user_data['full_name'], link=reset_link)
         
-        send_email(
-            email,
-            "Zyrix.de - Passwort zurücksetzen",
-            email_html
-        )
+        queue_email(email, subject, email_html, email_text)
         
         return jsonify({'message': 'Falls die E-Mail-Adresse registriert ist, wurde ein Reset-Link gesendet'}), 200
         
     except Exception as e:
-        return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+        return server_error(e)
 
 @app.route('/reset-password', methods=['POST'])
 def reset_password():
@@ -419,38 +546,43 @@ def reset_password():
         if not token or not new_password:
             return jsonify({'error': 'Token und neues Passwort erforderlich'}), 400
         
-        # Reset Token prüfen
-        reset_entry = supabase.table('password_resets').select('*').eq('token', token).eq('used', False).execute()
+        claims = None
+        if is_signed(token):
+            # Ungültige und abgelaufene Links vor dem Hashen und ohne Datenbank abweisen
+            try:
+                claims = link_tokens.verify(token, PURPOSE_RESET)
+            except ExpiredLinkToken:
+                return jsonify({'error': 'Reset-Link ist abgelaufen'}), 400
+            except InvalidLinkToken:
+                return jsonify({'error': 'Ungültiger oder bereits verwendeter Reset-Link'}), 400
+            
+            # Fingerabdruck (HMAC) nur hier prüfen; passt er nicht mehr, wurde das Passwort schon geändert
+            current = users.find_password_hash(claims['u'])
+            if not current or not link_tokens.matches_fingerprint(claims.get('f'), current['password_hash']):
+                return jsonify({'error': 'Ungültiger oder bereits verwendeter Reset-Link'}), 400
         
-        if not reset_entry.data:
-            return jsonify({'error': 'Ungültiger oder bereits verwendeter Reset-Link'}), 400
+        # Neues Passwort hashen
+        password_hash = password_hasher.hash(new_password)
         
-        reset_data = reset_entry.data[0]
+        if claims is not None:
+            # Passwort nur setzen, wenn der Hash seit der Prüfung unverändert ist (danach verbraucht)
+            result = users.reset_password_signed(claims['u'], current['password_hash'], password_hash)
+        else:
+            # Token prüfen, Passwort setzen und Token entwerten (ein atomarer Aufruf)
+            result = password_resets.consume(token, password_hash)
+        result = result or {'status': 'invalid'}
         
-        # Token-Ablauf prüfen
-        expires_at = datetime.fromisoformat(reset_data['expires_at'].replace('Z', '+00:00'))
-        if datetime.utcnow().replace(tzinfo=expires_at.tzinfo) > expires_at:
+        if result['status'] == 'invalid':
+            return jsonify({'error': 'Ungültiger oder bereits verwendeter Reset-Link'}), 400
+        if result['status'] == 'expired':
             return jsonify({'error': 'Reset-Link ist abgelaufen'}), 400
         
-        # Neues Passwort hashen
-        password_hash = hashlib.sha256(new_password.encode()).hexdigest()
-        
-        # Passwort in Datenbank aktualisieren
-        supabase.table('users').update({
-            'password_hash': password_hash,
-            'updated_at': datetime.utcnow().isoformat()
-        }).eq('id', reset_data['user_id']).execute()
-        
-        # Reset Token als verwendet markieren
-        supabase.table('password_resets').update({
-            'used': True,
-            'used_at': datetime.utcnow().isoformat()
-        }).eq('id', reset_data['id']).execute()
+        invalidate_user(result['user_id'])
         
         return jsonify({'message': 'Passwort erfolgreich zurückgesetzt'}), 200
         
     except Exception as e:
-        return jsonify({'error': f'Server-Fehler: {str(e)}'}), 500
+        return server_error(e)
 
 # HTML-Seiten Templates
 REGISTER_TEMPLATE = """
@@ -808,35 +940,166 @@ RESET_PASSWORD_TEMPLATE = """
 </html>
 """
 
+# HTML-Seiten einmalig minifizieren; komprimiert wird pro Worker beim ersten Abruf
+REGISTER_PAGE = StaticPage(REGISTER_TEMPLATE)
+LOGIN_PAGE = StaticPage(LOGIN_TEMPLATE)
+FORGOT_PASSWORD_PAGE = StaticPage(FORGOT_PASSWORD_TEMPLATE)
+RESET_PASSWORD_PAGE = StaticPage(RESET_PASSWORD_TEMPLATE)
+
 # HTML-Seiten Routes
 @app.route('/register-page')
 def register_page():
-    return REGISTER_TEMPLATE
+    return REGISTER_PAGE.response()
 
 @app.route('/login-page')
 def login_page():
-    return LOGIN_TEMPLATE
+    return LOGIN_PAGE.response()
 
 @app.route('/forgot-password-page')
 def forgot_password_page():
-    return FORGOT_PASSWORD_TEMPLATE
+    return FORGOT_PASSWORD_PAGE.response()
 
 @app.route('/reset-password-page')
 def reset_password_page():
-    return RESET_PASSWORD_TEMPLATE
+    return RESET_PASSWORD_PAGE.response()
+
+@app.route('/outbox-status', methods=['GET'])
+@require_admin
+def outbox_status():
+    """Warteschlangentiefe und Versand-Latenzen der E-Mail-Outbox"""
+    try:
+        stats = outbox.stats()
+        stats['smtp_pool'] = smtp_pool.stats()
+        return jsonify(stats), 200
+    except Exception as e:
+        return server_error(e)
+
+@app.route('/cache-status', methods=['GET'])
+@require_admin
+def cache_status():
+    """Treffer/Fehlzugriffe der Caches dieses Workers"""
+    return jsonify({'user_cache': user_cache.stats(), 'jwt_cache': token_cache.stats()}), 200
+
+@app.route('/repository-stats', methods=['GET'])
+@require_admin
+def repository_stats():
+    """Latenz und Nutzdatengröße pro Supabase-Abfrage dieses Workers"""
+    return jsonify({'full_rows': REPOSITORY_FULL_ROWS, 'queries': query_stats.snapshot(),
+                    'single_flight': singleflight.stats()}), 200
+
+@app.route('/circuit-status', methods=['GET'])
+@require_admin
+def circuit_status():
+    """Circuit-Breaker pro Abhängigkeit (dieser Worker)"""
+    return jsonify(circuit_breaker.stats()), 200
+
+@app.route('/user-stream-status', methods=['GET'])
+@require_admin
+def user_stream_status():
+    """Offene Live-Streams und Änderungs-Feed dieses Workers"""
+    return jsonify(user_feed.stats()), 200
+
+@app.route('/supabase-pool-status', methods=['GET'])
+@require_admin
+def supabase_pool_status():
+    """Verbindungs-Pool zu Supabase (dieser Worker)"""
+    return jsonify(pool_stats()), 200
+
+@app.route('/metering-status', methods=['GET'])
+@require_admin
+def metering_status():
+    """Abbuchungen und Ledger-Flushes dieses Workers"""
+    return jsonify(token_meter.stats()), 200
+
+@app.route('/rate-limit-status', methods=['GET'])
+@require_admin
+def rate_limit_status():
+    """Erlaubte/abgewiesene Anfragen pro Limiter dieses Workers"""
+    return jsonify(ratelimit.stats()), 200
+
+# Admin: Sampling-Profiler (wirkt auf alle Worker)
+@app.route('/admin/profiler/start', methods=['POST'])
+@require_admin
+def profiler_start():
+    """Profiling-Fenster starten: duration_seconds, sample_rate (0-1), interval_ms"""
+    data = request.get_json(silent=True) or {}
+    try:
+        control = profiler.start(
+            float(data.get('duration_seconds', 60)),
+            float(data.get('sample_rate', 1.0)),
+            int(data.get('interval_ms', 10))
+        )
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Ungültige Parameter'}), 400
+    return jsonify({'message': 'Profiler gestartet', 'session': control['session']}), 200
+
+@app.route('/admin/profiler/stop', methods=['POST'])
+@require_admin
+def profiler_stop():
+    profiler.stop()
+    return jsonify({'message': 'Profiler gestoppt'}), 200
+
+@app.route('/admin/profiler/status', methods=['GET'])
+@require_admin
+def profiler_status():
+    return jsonify(profiler.status()), 200
+
+@app.route('/admin/profiler/profile', methods=['GET'])
+@require_admin
+def profiler_profile():
+    """Collapsed Stacks für flamegraph.pl oder speedscope (zuletzt gestartete Sitzung oder ?session=)"""
+    session = request.args.get('session')
+    if session is not None and not is_session(session):
+        return jsonify({'error': 'Ungültige Sitzung'}), 400
+    return Response(profiler.collapsed(session), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=zyrix-profile.collapsed'})
+
+# Admin: Export von users und password_resets (Streaming, Keyset-Pagination)
+@app.route('/admin/export/<table>', methods=['GET'])
+@require_admin
+def admin_export(table):
+    """Tabelle als NDJSON oder CSV streamen: format=ndjson|csv, columns=a,b,c, gzip=1"""
+    repository = {'users': users, 'password_resets': password_resets}.get(table)
+    fmt = request.args.get('format', 'ndjson')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        if repository is None:
+            raise ExportError(f'Unbekannte Tabelle: {table}')
+        columns = select_columns(table, request.args.get('columns'))
+        chunks = export_stream(repository, columns, fmt, compress)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        # Erste Seite nicht lesbar: Fehler statt leerem Download
+        return server_error(e)
+
+    filename = f"zyrix-{table}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    if compress:
+        filename += '.gz'
+    return Response(chunks, mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}',
+                             'Cache-Control': 'no-store'})
+
+# Hauptseite Route (Health-Check von Render): Antwort wird nur einmal serialisiert
+HOME_INFO = {
+    'message': 'Zyrix Backend API',
+    'version': '3.1',
+    'status': 'online',
+    'platform': 'Render.com',
+    'cors_enabled': True,
+    'dashboard_url': 'https://zyrix-dahboard.onrender.com',
+    'endpoints': ['/register', '/login', '/user-info', '/request-password-reset', '/reset-password']
+}
+HOME_RESPONSE = StaticJSON(dict(HOME_INFO, dependencies={name: circuit_breaker.CLOSED
+                                                         for name in circuit_breaker.states()}))
 
-# Hauptseite Route
 @app.route('/')
 def home():
-    return jsonify({
-        'message': 'Zyrix Backend API',
-        'version': '3.1',
-        'status': 'online',
-        'platform': 'Render.com',
-        'cors_enabled': True,
-        'dashboard_url': 'https://zyrix-dahboard.onrender.com',
-        'endpoints': ['/register', '/login', '/user-info', '/request-password-reset', '/reset-password']
-    })
+    states = circuit_breaker.states()
+    if all(state == circuit_breaker.CLOSED for state in states.values()):
+        return HOME_RESPONSE.response()
+    # Gestörte Abhängigkeit: Status pro Anfrage; weiterhin 200, damit Render den Worker nicht neu startet
+    return jsonify(dict(HOME_INFO, status='degraded', dependencies=states)), 200
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=False)
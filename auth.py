@@ -0,0 +1,74 @@
+import os
+import hmac
+import time
+import hashlib
+from functools import wraps
+from flask import request, jsonify, current_app, g
+import jwt
+from cache import TTLCache
+
+# JWT-Cache Konfiguration
+JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE', 20000))
+JWT_CACHE_TTL = float(os.environ.get('JWT_CACHE_TTL', 300))
+# Admin-Endpunkte sind nur mit gesetztem ADMIN_TOKEN erreichbar
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Bereits verifizierte Tokens: SHA-256 des Tokens -> dekodierte Claims
+token_cache = TTLCache(JWT_CACHE_SIZE, JWT_CACHE_TTL)
+
+def verify_token(token, secret):
+    """JWT prüfen; wiederholte Tokens kommen aus dem Cache statt aus jwt.decode"""
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        # exp gilt auch für gecachte Tokens
+        if payload.get('exp', 0) > time.time():
+            return payload
+        token_cache.invalidate(digest)
+        raise jwt.ExpiredSignatureError('Signature has expired')
+
+    payload = jwt.decode(token, secret, algorithms=['HS256'])
+    if 'user_id' not in payload:
+        raise jwt.InvalidTokenError('user_id fehlt')
+    exp = payload.get('exp')
+    if exp is not None:
+        remaining = exp - time.time()
+        if remaining > 0:
+            token_cache.set(digest, payload, ttl=min(remaining, token_cache.ttl))
+    return payload
+
+def require_auth(view):
+    """Decorator für geschützte Endpunkte: setzt g.user_id und g.jwt_payload"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # JWT Token aus Authorization Header lesen
+        auth_header = request.headers.get('Authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return jsonify({'error': 'Authorization Token erforderlich'}), 401
+
+        token = auth_header.split(' ')[1]
+
+        # JWT Token validieren
+        try:
+            payload = verify_token(token, current_app.config['SECRET_KEY'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'error': 'Token abgelaufen'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'error': 'Ungültiger Token'}), 401
+
+        g.jwt_payload = payload
+        g.user_id = payload['user_id']
+        return view(*args, **kwargs)
+    return wrapper
+
+def require_admin(view):
+    """Decorator für Admin-Endpunkte: Bearer ADMIN_TOKEN erforderlich"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin-Zugang nicht konfiguriert'}), 403
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header.encode(), f'Bearer {ADMIN_TOKEN}'.encode()):
+            return jsonify({'error': 'Nicht autorisiert'}), 401
+        return view(*args, **kwargs)
+    return wrapper
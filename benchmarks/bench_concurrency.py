@@ -0,0 +1,175 @@
+"""Lasttest: gleichzeitige Requests pro gunicorn-Worker je Worker-Modell.
+
+Startet pro Modell (sync, gthread) einen echten
+gunicorn mit genau einem Worker gegen einen lokalen PostgREST-Stub mit
+fester Latenz. Getrieben wird POST /login mit unbekannten Adressen: ein
+Supabase-Round-Trip pro Request, kein Passwort-Hashing. Die Kapazität
+pro Worker ist Durchsatz x Stub-Latenz, also die Zahl der Requests, die
+der Worker im Mittel gleichzeitig in Arbeit hatte.
+
+Aufruf: python benchmarks/bench_concurrency.py --latency-ms 100 --concurrency 1,16,64
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+class SlowPostgRESTStub(BaseHTTPRequestHandler):
+    """Antwortet nach fester Latenz mit einer leeren Ergebnisliste"""
+
+    latency = 0.1
+
+    def _empty(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.latency)
+        body = b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = _empty
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(kind, port, supabase_url, tmpdir, concurrency):
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': supabase_url,
+        'SUPABASE_KEY': 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench',
+        'OUTBOX_DB_PATH': os.path.join(tmpdir, 'outbox.sqlite3'),
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(tmpdir, f'prometheus-{kind}'),
+        'RATE_LIMIT_ENABLED': 'false',
+        # gunicorn.conf.py soll dasselbe Modell wählen (sonst macht threads > 1 aus sync gthread)
+        'GUNICORN_WORKER_CLASS': kind,
+        'WEB_CONCURRENCY': '1',
+        # Der Pool soll die gemessene Parallelität nicht begrenzen
+        'SUPABASE_POOL_SIZE': str(concurrency)
+    })
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--backlog', '512']
+    if kind == 'gthread':
+        env['GUNICORN_THREADS'] = str(concurrency)
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'gunicorn ({kind}) ist nicht gestartet')
+
+def login(base_url, i):
+    body = json.dumps({'email': f'nobody{i}@example.com', 'password': 'x'}).encode()
+    request = urllib.request.Request(base_url + '/login', data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+def run_level(base_url, concurrency, requests, latency):
+    timings = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status = login(base_url, i)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings.append(elapsed)
+            # 401 = Benutzer nicht gefunden, also ein erfolgreicher Round-Trip
+            if status != 401:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    timings.sort()
+    throughput = requests / wall
+    return {
+        'requests': requests,
+        'errors': errors,
+        'requests_per_second': round(throughput, 1),
+        'concurrent_per_worker': round(throughput * latency, 1),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 1),
+        'p95_ms': round(timings[int(len(timings) * 0.95)] * 1000, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--concurrency', default='1,16,64', help='Parallele Clients, kommagetrennt')
+    parser.add_argument('--worker-concurrency', type=int, default=64,
+                        help='Threads pro Worker (gthread)')
+    parser.add_argument('--requests-per-client', type=int, default=4)
+    parser.add_argument('--modes', default='sync,gthread')
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    SlowPostgRESTStub.latency = latency
+    stub = StubServer(('127.0.0.1', 0), SlowPostgRESTStub)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    supabase_url = f'http://127.0.0.1:{stub.server_port}'
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-concurrency-')
+    results = {}
+    try:
+        for kind in args.modes.split(','):
+            port = free_port()
+            process = start_gunicorn(kind, port, supabase_url, tmpdir, args.worker_concurrency)
+            try:
+                base_url = f'http://127.0.0.1:{port}'
+                # Aufwärmen: Supabase-Client und erste Verbindungen aufbauen
+                run_level(base_url, 4, 8, latency)
+                results[kind] = {
+                    str(level): run_level(base_url, level, max(level * args.requests_per_client, 20), latency)
+                    for level in levels
+                }
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        stub.shutdown()
+    print(json.dumps({
+        'benchmark': 'concurrency',
+        'supabase_latency_ms': args.latency_ms,
+        'worker_concurrency': args.worker_concurrency,
+        'results': results
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark: JSON-Serialisierung der API-Antworten, stdlib vs. orjson.
+
+Misst pro Provider die Zeit für provider.response() (das, was jsonify pro
+Request tut) mit den Antwortformen von /login und /user-info sowie der
+Hauptseite. Zusätzlich wird GET / über den Flask-Test-Client mit jsonify
+pro Request gegen die einmal serialisierte StaticJSON-Antwort verglichen.
+
+Aufruf: python benchmarks/bench_json.py --iterations 20000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench')
+
+import jwt
+from flask import jsonify
+import app as zyrix
+import json_provider
+
+USER = {
+    'id': 48213,
+    'email': 'max.mustermann@example.com',
+    'full_name': 'Max Müstermann',
+    'tokens': 1187,
+    'status': 'verified'
+}
+
+def login_response():
+    """Antwortform von login()"""
+    token = jwt.encode({'user_id': USER['id'], 'email': USER['email'], 'exp': datetime.utcnow() + timedelta(days=30)},
+                       'bench-secret', algorithm='HS256')
+    return {
+        'message': 'Anmeldung erfolgreich',
+        'token': token,
+        'redirect_url': 'https://zyrix-dahboard.onrender.com',
+        'user': {key: USER[key] for key in ('id', 'email', 'full_name', 'tokens')}
+    }
+
+def user_info_response():
+    """Antwortform von get_user_info()"""
+    return {'user': dict(USER), 'tokens': USER['tokens']}
+
+def time_per_call(fn, iterations):
+    for _ in range(min(iterations, 1000)):
+        fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+def measure_provider(provider_cls, shapes, iterations):
+    zyrix.app.json = provider_cls(zyrix.app)
+    results = {}
+    with zyrix.app.app_context():
+        for name, payload in shapes.items():
+            body = zyrix.app.json.response(payload).get_data()
+            results[name] = {
+                'us_per_response': time_per_call(lambda: zyrix.app.json.response(payload), iterations),
+                'us_dumps': time_per_call(lambda: zyrix.app.json.dumps(payload), iterations),
+                'bytes': len(body)
+            }
+    return results
+
+def measure_home(iterations):
+    """GET / komplett über den Test-Client: jsonify pro Request vs. vorab serialisiert"""
+    zyrix.app.add_url_rule('/legacy-home', 'legacy_home', lambda: jsonify(zyrix.HOME_RESPONSE.payload))
+    client = zyrix.app.test_client()
+    return {
+        'jsonify_us': time_per_call(lambda: client.get('/legacy-home'), iterations),
+        'static_json_us': time_per_call(lambda: client.get('/'), iterations)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    shapes = {
+        'login': login_response(),
+        'user_info': user_info_response(),
+        'home': zyrix.HOME_RESPONSE.payload
+    }
+    providers = {'stdlib': json_provider.StdlibProvider}
+    if json_provider.orjson is not None:
+        providers['orjson'] = json_provider.OrjsonProvider
+    results = {name: measure_provider(cls, shapes, args.iterations) for name, cls in providers.items()}
+
+    # Test-Client-Messung mit dem schnellsten verfügbaren Provider
+    zyrix.app.json = list(providers.values())[-1](zyrix.app)
+    results['home_request'] = measure_home(max(args.iterations // 10, 100))
+    print(json.dumps({'benchmark': 'json', 'iterations': args.iterations, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
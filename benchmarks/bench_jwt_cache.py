@@ -0,0 +1,80 @@
+"""Micro-Benchmark: Auth-Overhead pro Request mit und ohne JWT-Cache.
+
+Misst den kompletten require_auth-Decorator in einem Flask-Request-Kontext
+mit einem 30-Tage-Token wie aus /login, einmal mit leerem Cache pro Aufruf
+(entspricht jwt.decode bei jedem Request) und einmal mit Cache-Treffern.
+
+Aufruf: python benchmarks/bench_jwt_cache.py --requests 20000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from flask import Flask, g
+
+import auth
+from auth import require_auth
+
+SECRET = 'bench-secret'
+
+def build_app():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = SECRET
+
+    @app.route('/protected')
+    @require_auth
+    def protected():
+        return g.user_id
+
+    return app
+
+def measure(app, token, requests, clear_cache):
+    view = app.view_functions['protected']
+    headers = {'Authorization': f'Bearer {token}'}
+    timings = []
+    with app.test_request_context('/protected', headers=headers):
+        view()
+        for _ in range(requests):
+            if clear_cache:
+                auth.token_cache.clear()
+            started = time.perf_counter()
+            view()
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'requests': requests,
+        'mean_us': round(sum(timings) / len(timings) * 1e6, 2),
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 2),
+        'p99_us': round(timings[int(len(timings) * 0.99)] * 1e6, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = build_app()
+    token = jwt.encode({
+        'user_id': 42,
+        'email': 'kunde@example.com',
+        'exp': datetime.utcnow() + timedelta(days=30)
+    }, SECRET, algorithm='HS256')
+
+    uncached = measure(app, token, args.requests, clear_cache=True)
+    cached = measure(app, token, args.requests, clear_cache=False)
+    print(json.dumps({
+        'benchmark': 'jwt_cache',
+        'uncached': uncached,
+        'cached': cached,
+        'speedup': round(uncached['mean_us'] / cached['mean_us'], 2),
+        'cache': auth.token_cache.stats()
+    }, indent=2, default=str))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Ausfallsimulation: Supabase und SMTP mit und ohne Circuit-Breaker.
+
+Supabase: FakeSupabase antwortet während des Ausfalls erst nach
+--outage-delay Sekunden mit einem Timeout. Gemessen werden für
+POST /request-password-reset die Latenz (p50/p95) und Statuscodes während
+des Ausfalls, wie viele Aufrufe Supabase trotzdem erreichen und wie lange
+es nach dem Ende des Ausfalls bis zur ersten erfolgreichen Antwort dauert
+(Half-Open-Probe).
+
+SMTP: Der Server nimmt Verbindungen an und trennt sie ohne Antwort
+(fakes.DeadSMTP). Gemessen wird, wie viele Verbindungsversuche die Outbox
+in --smtp-seconds unternimmt und wie viele Nachrichten dabei ihre
+Zustellversuche aufbrauchen (endgültig fehlgeschlagen). Mit aiosmtpd wird
+danach auf einen funktionierenden SMTP-Sink umgestellt und die Zeit bis
+zur leeren Outbox gemessen.
+
+Aufruf: python benchmarks/bench_outage.py --requests 200 --concurrency 16 --outage-delay 0.5
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+from loadtest import call, run_phase
+
+def supabase_outage(zyrix, supabase, base_url, args, enabled):
+    import httpx
+    import repository
+
+    breaker = repository.supabase_breaker
+    breaker.enabled = enabled
+    breaker.open_seconds = args.open_seconds
+    build = lambda i: ('POST', '/request-password-reset', {'email': f'unbekannt-{i}@example.com'}, None)
+
+    result = {'healthy': run_phase(base_url, args.requests, args.concurrency, build)}
+
+    supabase.calls = 0
+    supabase.set_outage(httpx.ReadTimeout('timed out'), args.outage_delay)
+    result['outage'] = run_phase(base_url, args.requests, args.concurrency, build)
+    result['outage']['supabase_calls'] = supabase.calls
+
+    # Ausfall vorbei: bis zur ersten erfolgreichen Antwort alle 50 ms anfragen
+    supabase.set_outage(None)
+    started = time.perf_counter()
+    while time.perf_counter() - started < 60:
+        status, _ = call(base_url, *build(0)[:3])
+        if status == 200:
+            break
+        time.sleep(0.05)
+    result['seconds_to_recover'] = round(time.perf_counter() - started, 2)
+    result['breaker'] = breaker.stats()
+    return result
+
+def smtp_outage(zyrix, args, enabled):
+    from smtp_pool import SMTPConnectionPool
+
+    breaker = zyrix.smtp_breaker
+    breaker.enabled = enabled
+    breaker.open_seconds = args.open_seconds
+    outbox = zyrix.outbox
+
+    dead = fakes.DeadSMTP(delay=0.2).start()
+    zyrix.smtp_pool = SMTPConnectionPool(dead.host, dead.port, None, None, use_ssl=False, timeout=5)
+    conn = sqlite3.connect(outbox.path)
+    conn.execute('DELETE FROM outbox')
+    conn.commit()
+    for i in range(args.emails):
+        zyrix.queue_email(f'kunde-{i}@example.com', 'Ausfalltest', '<p>Test</p>', 'Test')
+    time.sleep(args.smtp_seconds)
+    dead.stop()
+    failed = conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'failed'").fetchone()[0]
+    result = {'smtp_connections': dead.connections, 'failed_permanently': failed, 'breaker': breaker.stats()}
+
+    try:
+        sink = fakes.SMTPSink().start()
+    except ImportError:
+        sink = None
+    if sink is not None:
+        zyrix.smtp_pool = SMTPConnectionPool(sink.host, sink.port, None, None, use_ssl=False)
+        started = time.perf_counter()
+        while outbox.pending_count() and time.perf_counter() - started < 60:
+            time.sleep(0.1)
+        result['seconds_to_drain'] = round(time.perf_counter() - started, 2)
+        result['delivered_after_outage'] = sink.received
+        sink.stop()
+    conn.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--outage-delay', type=float, default=0.5, help='Sekunden bis zum Fehler je Supabase-Aufruf')
+    parser.add_argument('--open-seconds', type=float, default=2, help='BREAKER_OPEN_SECONDS für die Simulation')
+    parser.add_argument('--emails', type=int, default=20)
+    parser.add_argument('--smtp-seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-outage-')
+    # Kurzer Backoff, damit die Outbox im Messzeitraum mehrere Zustellversuche unternimmt
+    os.environ.setdefault('OUTBOX_BACKOFF_BASE', '0.2')
+    os.environ.setdefault('OUTBOX_BACKOFF_MAX', '1')
+    fakes.prepare_environment(tmpdir)
+    from werkzeug.serving import make_server
+    import app as zyrix
+
+    supabase = fakes.FakeSupabase()
+    fakes.install(zyrix, supabase)
+    server = make_server('127.0.0.1', fakes.free_port(), zyrix.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {}
+    try:
+        for mode, enabled in (('without_breaker', False), ('with_breaker', True)):
+            results[mode] = {
+                'supabase': supabase_outage(zyrix, supabase, base_url, args, enabled),
+                'smtp': smtp_outage(zyrix, args, enabled)
+            }
+    finally:
+        server.shutdown()
+    print(json.dumps({'benchmark': 'outage', 'config': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: Logins/Sekunde pro Kern für verschiedene scrypt-Kostenparameter.
+
+Misst für jede Einstellung die Verifikationszeit eines Passworts auf einem
+Kern (entspricht einem Login) sowie den Durchsatz des Prozess-Pools mit
+--workers Prozessen. Daraus lässt sich ablesen, welche Parameter die
+p99-Login-Latenz im Budget halten.
+
+Aufruf: python benchmarks/bench_password_hashing.py --logins 50 --workers 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher
+
+COST_SETTINGS = [
+    (2 ** 12, 8, 1),
+    (2 ** 13, 8, 1),
+    (2 ** 14, 8, 1),
+    (2 ** 15, 8, 1),
+    (2 ** 16, 8, 1),
+]
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def single_core(n, r, p, logins):
+    hasher = PasswordHasher(n=n, r=r, p=p, executor='inline')
+    stored = hasher.hash('korrektes-pferd-batterie')
+    timings = []
+    for _ in range(logins):
+        started = time.perf_counter()
+        hasher.verify('korrektes-pferd-batterie', stored)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'logins_per_sec_per_core': round(len(timings) / sum(timings), 1),
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'memory_mb': round(128 * n * r / 1024 / 1024, 1)
+    }
+
+def pooled(n, r, p, logins, workers):
+    hasher = PasswordHasher(n=n, r=r, p=p, executor='process', workers=workers, queue_size=logins)
+    stored = hasher.hash('korrektes-pferd-batterie')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers * 2) as clients:
+        list(clients.map(lambda _: hasher.verify('korrektes-pferd-batterie', stored), range(logins)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    return {'workers': workers, 'logins_per_sec': round(logins / elapsed, 1)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    results = []
+    for n, r, p in COST_SETTINGS:
+        result = {'n': n, 'r': r, 'p': p}
+        result.update(single_core(n, r, p, args.logins))
+        result['pool'] = pooled(n, r, p, args.logins, args.workers)
+        results.append(result)
+    print(json.dumps({'benchmark': 'password_hashing', 'cpu_count': os.cpu_count(), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
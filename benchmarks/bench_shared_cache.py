@@ -0,0 +1,130 @@
+"""Benchmark: Benutzer-Cache pro Worker vs. gemeinsamer Shared-Memory-Cache.
+
+Simuliert mehrere gunicorn-Worker als Prozesse, die /user-info-Abrufe für
+Zipf-verteilte User-IDs über cache.get_or_load() bedienen. Ein Teil der
+Anfragen sind Schreibzugriffe (z.B. verify-email, reset-password): sie
+erhöhen die Version des Benutzers in einer gemeinsamen "Datenbank" und
+invalidieren den Eintrag im Cache des jeweiligen Workers. Gemessen werden
+Trefferquote, Ladevorgänge (= Supabase-Abfragen), veraltete Antworten
+(Version im Cache älter als in der Datenbank) und der Speicherbedarf.
+
+Aufruf: python benchmarks/bench_shared_cache.py --workers 4 --requests 50000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import TTLCache
+from shared_cache import SharedMemoryCache
+
+def zipf_weights(keys, exponent):
+    weights = [1 / (rank ** exponent) for rank in range(1, keys + 1)]
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+def private_memory_kb():
+    """Privater Heap des Prozesses (RssAnon); das geteilte mmap zählt als RssShmem/RssFile"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1])
+    return 0
+
+def worker(backend, args, versions, seed, directory, results):
+    random.seed(seed)
+    ids = list(range(args.keys))
+    cumulative = zipf_weights(args.keys, args.zipf)
+    sequence = random.choices(ids, cum_weights=cumulative, k=args.requests)
+    baseline_kb = private_memory_kb()
+    if backend == 'shared':
+        cache = SharedMemoryCache('bench', args.cache_size, args.ttl, directory=directory)
+    else:
+        cache = TTLCache(args.cache_size, args.ttl)
+    loads = 0
+    stale = 0
+
+    def load(user_id):
+        nonlocal loads
+        loads += 1
+        # Form wie users.find_info
+        return {'id': user_id, 'email': f'user{user_id}@example.com', 'full_name': f'Benutzer {user_id}',
+                'tokens': 1200, 'status': 'verified', 'version': versions[user_id]}
+
+    started = time.perf_counter()
+    for user_id in sequence:
+        if random.random() < args.write_ratio:
+            with versions.get_lock():
+                versions[user_id] += 1
+            cache.invalidate(user_id)
+            continue
+        value = cache.get_or_load(user_id, lambda: load(user_id))
+        if value['version'] != versions[user_id]:
+            stale += 1
+    elapsed = time.perf_counter() - started
+    results.put({
+        'hits': cache.hits,
+        'misses': cache.misses,
+        'loads': loads,
+        'stale': stale,
+        'private_kb': private_memory_kb() - baseline_kb,
+        'us_per_request': elapsed / args.requests * 1e6
+    })
+
+def run(backend, args):
+    context = multiprocessing.get_context('fork')
+    versions = context.Array('i', args.keys)
+    results = context.Queue()
+    directory = tempfile.mkdtemp(prefix='zyrix-cache-')
+    processes = [context.Process(target=worker, args=(backend, args, versions, seed, directory, results))
+                 for seed in range(args.workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    hits = sum(sample['hits'] for sample in samples)
+    misses = sum(sample['misses'] for sample in samples)
+    result = {
+        'hit_rate': round(hits / (hits + misses), 4),
+        'supabase_loads': sum(sample['loads'] for sample in samples),
+        'stale_reads': sum(sample['stale'] for sample in samples),
+        'us_per_request': round(sum(sample['us_per_request'] for sample in samples) / len(samples), 2),
+        # Zuwachs des privaten Speichers aller Worker während des Laufs
+        'worker_private_kb': sum(sample['private_kb'] for sample in samples)
+    }
+    if backend == 'shared':
+        cache = SharedMemoryCache('bench', args.cache_size, args.ttl, directory=directory)
+        result['shared_memory_kb'] = round(cache.size_bytes / 1024, 1)
+        os.unlink(cache.path)
+    result['total_memory_kb'] = round(result['worker_private_kb'] + result.get('shared_memory_kb', 0), 1)
+    os.rmdir(directory)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50000, help='Anfragen pro Worker')
+    parser.add_argument('--keys', type=int, default=20000, help='Anzahl Benutzer')
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--cache-size', type=int, default=5000)
+    parser.add_argument('--ttl', type=float, default=30)
+    parser.add_argument('--write-ratio', type=float, default=0.01)
+    args = parser.parse_args()
+
+    results = {backend: run(backend, args) for backend in ('memory', 'shared')}
+    print(json.dumps({'benchmark': 'shared_cache', 'config': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
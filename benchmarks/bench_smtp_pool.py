@@ -0,0 +1,135 @@
+"""Benchmark: SMTP-Pool gegen Verbindung-pro-Mail.
+
+Startet einen lokalen aiosmtpd-Server mit implizitem TLS (selbstsigniertes
+Zertifikat via openssl) als Ersatz für den Checkdomain-Server und misst
+Nachrichten pro Sekunde für:
+
+- connect-per-mail: SMTP_SSL + login + send + quit je Nachricht (bisheriger Pfad)
+- pool-send: SMTPConnectionPool.send() je Nachricht
+- pool-batch: SMTPConnectionPool.send_many() mit Outbox-Batchgröße
+
+Aufruf: python benchmarks/bench_smtp_pool.py --messages 500
+Benötigt: pip install aiosmtpd
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import smtplib
+import socket
+import argparse
+import logging
+import tempfile
+import subprocess
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# aiosmtpd warnt bei jedem AUTH über login_data
+logging.getLogger('mail.log').setLevel(logging.ERROR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from smtp_pool import SMTPConnectionPool
+
+class SinkHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+def accept_all(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+def make_certificate(directory):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def build_message(i):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = 'Zyrix.de - E-Mail-Adresse bestätigen'
+    msg['From'] = 'noreply@zyrix.de'
+    msg['To'] = f'user{i}@example.com'
+    msg.attach(MIMEText('<p>Hallo!</p>' * 50, 'html', 'utf-8'))
+    return msg
+
+def connect_per_mail(host, port, client_context, messages):
+    for msg in messages:
+        server = smtplib.SMTP_SSL(host, port, context=client_context)
+        server.login('noreply@zyrix.de', 'secret')
+        server.send_message(msg)
+        server.quit()
+
+def run(label, fn, count):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return {'path': label, 'messages': count, 'seconds': round(elapsed, 4),
+            'messages_per_sec': round(count / elapsed, 1)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=20)
+    parser.add_argument('--max-per-session', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        server_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_context.load_cert_chain(cert, key)
+        client_context = ssl.create_default_context()
+        client_context.check_hostname = False
+        client_context.verify_mode = ssl.CERT_NONE
+
+        handler = SinkHandler()
+        host, port = '127.0.0.1', free_port()
+        controller = Controller(handler, hostname=host, port=port, ssl_context=server_context,
+                                authenticator=accept_all, auth_require_tls=False)
+        controller.start()
+        try:
+            messages = [build_message(i) for i in range(args.messages)]
+            pool = SMTPConnectionPool(host, port, 'noreply@zyrix.de', 'secret', size=1,
+                                      max_messages_per_session=args.max_per_session,
+                                      ssl_context=client_context)
+
+            def pool_send():
+                for msg in messages:
+                    pool.send(msg)
+
+            def pool_batch():
+                for i in range(0, len(messages), args.batch):
+                    pool.send_many(messages[i:i + args.batch])
+
+            results = [
+                run('connect-per-mail', lambda: connect_per_mail(host, port, client_context, messages), len(messages)),
+                run('pool-send', pool_send, len(messages)),
+                run('pool-batch', pool_batch, len(messages)),
+            ]
+            pool.close_all()
+        finally:
+            controller.stop()
+
+    baseline = results[0]['messages_per_sec']
+    for result in results:
+        result['speedup'] = round(result['messages_per_sec'] / baseline, 2)
+    print(json.dumps({'benchmark': 'smtp_pool', 'received': handler.received,
+                      'pool': pool.stats(), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
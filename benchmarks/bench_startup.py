@@ -0,0 +1,114 @@
+"""Benchmark: Time-to-First-Request eines frischen Workers.
+
+Startet pro Durchlauf einen neuen Python-Prozess, der app importiert und
+dann den ersten Request (GET /) sowie den ersten Request mit
+Supabase-Zugriff (POST /login gegen einen lokalen PostgREST-Stub, der
+leere Ergebnisse liefert) über den Flask-Test-Client ausführt. Verglichen
+werden der lazy Supabase-Client (Standard) und SUPABASE_EAGER_INIT=1
+(Client beim Import, wie bisher).
+
+Aufruf: python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+class PostgRESTStub(BaseHTTPRequestHandler):
+    """Beantwortet jede Abfrage mit einer leeren Ergebnisliste"""
+
+    def _empty(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = _empty
+
+    def log_message(self, format, *args):
+        pass
+
+def child():
+    """Läuft im frischen Prozess: Zeiten ab Prozessbeginn messen"""
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import app as zyrix
+    imported = time.perf_counter()
+
+    client = zyrix.app.test_client()
+    status_home = client.get('/').status_code
+    first_request = time.perf_counter()
+    status_login = client.post('/login', json={'email': 'nobody@example.com', 'password': 'x'}).status_code
+    first_db_request = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (imported - started) * 1000,
+        'first_request_ms': (first_request - started) * 1000,
+        'first_db_request_ms': (first_db_request - started) * 1000,
+        'statuses': [status_home, status_login]
+    }))
+
+def run(mode, runs, supabase_url, tmpdir):
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': supabase_url,
+        'SUPABASE_KEY': 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench',
+        'SUPABASE_EAGER_INIT': '1' if mode == 'eager' else '0',
+        'OUTBOX_DB_PATH': os.path.join(tmpdir, 'outbox.sqlite3'),
+        'RATE_LIMIT_ENABLED': 'false'
+    })
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    samples = []
+    for _ in range(runs):
+        spawned = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - spawned) * 1000
+        samples.append(sample)
+
+    def median(key):
+        return round(statistics.median(sample[key] for sample in samples), 1)
+
+    return {
+        'import_ms': median('import_ms'),
+        'time_to_first_request_ms': median('first_request_ms'),
+        'time_to_first_db_request_ms': median('first_db_request_ms'),
+        'process_total_ms': median('process_ms'),
+        'statuses': samples[0]['statuses']
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PostgRESTStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    supabase_url = f'http://127.0.0.1:{server.server_port}'
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-startup-')
+    try:
+        results = {mode: run(mode, args.runs, supabase_url, tmpdir) for mode in ('eager', 'lazy')}
+    finally:
+        server.shutdown()
+    print(json.dumps({'benchmark': 'startup', 'runs': args.runs, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark: eingebaute HTML-Seiten vorher/nachher.
+
+Vergleicht für jede Seite die übertragenen Bytes und die Zeit bis zur
+fertigen Antwort (In-Process über den Flask-Test-Client, als Näherung für
+Time-to-First-Byte ohne Netzwerk) zwischen dem bisherigen Handler
+(Template-String unkomprimiert) und der StaticPage-Pipeline mit
+gzip/br und bedingten Anfragen (304).
+
+Aufruf: python benchmarks/bench_static_pages.py --requests 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench')
+
+import app as zyrix
+
+PAGES = {
+    '/register-page': zyrix.REGISTER_TEMPLATE,
+    '/login-page': zyrix.LOGIN_TEMPLATE,
+    '/forgot-password-page': zyrix.FORGOT_PASSWORD_TEMPLATE,
+    '/reset-password-page': zyrix.RESET_PASSWORD_TEMPLATE,
+}
+
+def add_legacy_routes():
+    """Bisheriges Verhalten unter /legacy/...: Template-String bei jedem Aufruf zurückgeben.
+
+    Die Routen hängen an derselben App, damit CORS und before_request-Hooks
+    in beiden Messungen gleich sind.
+    """
+    for path, template in PAGES.items():
+        zyrix.app.add_url_rule('/legacy' + path, 'legacy' + path, lambda template=template: template)
+
+def measure(client, path, requests, headers=None):
+    timings = []
+    size = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        size = len(response.get_data())
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'bytes': size,
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 1),
+        'p99_us': round(timings[int(len(timings) * 0.99)] * 1e6, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    add_legacy_routes()
+    client = zyrix.app.test_client()
+    results = {}
+    for path in PAGES:
+        etag = client.get(path).headers['ETag']
+        results[path] = {
+            'legacy': measure(client, '/legacy' + path, args.requests),
+            'identity': measure(client, path, args.requests),
+            'gzip': measure(client, path, args.requests, {'Accept-Encoding': 'gzip'}),
+            'br': measure(client, path, args.requests, {'Accept-Encoding': 'br, gzip'}),
+            'not_modified': measure(client, path, args.requests, {'If-None-Match': etag})
+        }
+    print(json.dumps({'benchmark': 'static_pages', 'brotli_available': 'br' in zyrix.LOGIN_PAGE.variants,
+                      'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
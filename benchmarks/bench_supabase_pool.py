@@ -0,0 +1,158 @@
+"""Benchmark: Supabase-Client mit Standard-Session vs. PooledTransport.
+
+Startet einen lokalen PostgREST-Stub über HTTPS (selbstsigniertes
+Zertifikat via openssl, HTTP/1.1 Keep-Alive, feste Serverlatenz) und misst
+select-Abfragen über die echte supabase/postgrest-Kette:
+
+- burst: --concurrency Threads gleichzeitig, mehr als die 20 Keep-Alive-
+  Verbindungen, die httpx standardmäßig offen hält
+- idle: einzelne Requests mit --idle-gap Sekunden Pause; httpx schließt
+  Leerlauf-Verbindungen standardmäßig nach 5 s
+
+Ausgabe: p50/p95 pro Request und die Zahl der TLS-Verbindungen, die der
+Server annehmen musste.
+
+Aufruf: python benchmarks/bench_supabase_pool.py --concurrency 32 --rounds 20
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KEY = 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench'
+
+class PostgRESTStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with PostgRESTStub.lock:
+            PostgRESTStub.connections += 1
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.latency)
+        body = b'[{"id": 1, "email": "bench@example.com"}]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def make_certificate(directory):
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-addext', 'subjectAltName=IP:127.0.0.1',
+         '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def summarize(timings, connections):
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'tls_connections': connections
+    }
+
+def query(client):
+    started = time.perf_counter()
+    client.table('users').select('id,email').eq('email', 'bench@example.com').execute()
+    return time.perf_counter() - started
+
+def burst(client, concurrency, rounds):
+    before = PostgRESTStub.connections
+    timings = []
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(rounds):
+            timings.extend(pool.map(lambda _: query(client), range(concurrency)))
+    return summarize(timings, PostgRESTStub.connections - before)
+
+def idle(client, requests, gap):
+    before = PostgRESTStub.connections
+    timings = []
+    for i in range(requests):
+        if i:
+            time.sleep(gap)
+        timings.append(query(client))
+    return summarize(timings, PostgRESTStub.connections - before)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--server-latency-ms', type=float, default=5.0)
+    parser.add_argument('--idle-requests', type=int, default=4, help='0 = Leerlauf-Messung überspringen')
+    parser.add_argument('--idle-gap', type=float, default=6.0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-bench-')
+    cert, key = make_certificate(tmpdir)
+    # httpx vertraut über SSL_CERT_FILE dem selbstsignierten Zertifikat (beide Varianten gleich)
+    os.environ['SSL_CERT_FILE'] = cert
+
+    PostgRESTStub.latency = args.server_latency_ms / 1000.0
+    server = StubServer(('127.0.0.1', 0), PostgRESTStub)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'https://127.0.0.1:{server.server_port}'
+
+    from supabase import create_client
+    from supabase_pool import install_pool, PooledTransport
+
+    default_client = create_client(url, KEY)
+    pooled_client = create_client(url, KEY)
+    transport = install_pool(pooled_client, PooledTransport(size=args.concurrency, keepalive=args.concurrency))
+
+    results = {}
+    try:
+        for label, client in (('default', default_client), ('pooled', pooled_client)):
+            query(client)
+            results[label] = {'burst': burst(client, args.concurrency, args.rounds)}
+            if args.idle_requests:
+                results[label]['idle'] = idle(client, args.idle_requests, args.idle_gap)
+        results['pooled']['pool_stats'] = transport.stats()
+    finally:
+        server.shutdown()
+
+    print(json.dumps({
+        'benchmark': 'supabase_pool',
+        'config': {
+            'concurrency': args.concurrency,
+            'rounds': args.rounds,
+            'server_latency_ms': args.server_latency_ms,
+            'idle_gap_seconds': args.idle_gap
+        },
+        'results': results
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
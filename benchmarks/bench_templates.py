@@ -0,0 +1,118 @@
+"""Benchmark: E-Mail-Vorlagen vorher/nachher.
+
+Vergleicht die bisherige f-String-Vorlage (komplettes Dokument inkl.
+<style>-Block pro Nachricht, nur HTML-Teil in Base64) mit den kompilierten
+Vorlagen aus mail_templates.py (Inline-CSS, nur Platzhalter werden ersetzt,
+Text- und HTML-Teil in Quoted-Printable). Gemessen werden Renderings pro
+Sekunde, komplette MIME-Nachrichten pro Sekunde und die Größe der
+MIME-Nachricht in Bytes, je Sprache.
+
+Aufruf: python benchmarks/bench_templates.py --renders 20000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench')
+
+import app as zyrix
+from mail_templates import render_mail, MAIL_LOCALES
+
+NAME = 'Maximilian Müller'
+LINK = 'https://zyrix-backend-render.onrender.com/verify-email?token=' + 'x' * 43
+
+def legacy_verification_email(user_name, verification_link):
+    # Stand vor mail_templates.py (app.create_verification_email)
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <style>
+            body {{ font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }}
+            .container {{ max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 10px rgba(0,0,0,0.1); }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }}
+            .logo {{ font-size: 2.5rem; font-weight: 800; color: #FF9900; margin-bottom: 10px; }}
+            .content {{ padding: 30px; }}
+            .button {{ display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin: 20px 0; }}
+            .footer {{ background: #f8f9fa; padding: 20px; font-size: 12px; color: #666; border-top: 1px solid #eee; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <div class="logo">Zyrix</div>
+                <h2>E-Mail-Adresse bestätigen</h2>
+            </div>
+            <div class="content">
+                <h3>Hallo {user_name}!</h3>
+                <p>Vielen Dank für Ihre Registrierung bei Zyrix.de!</p>
+                <p>Um Ihr Konto zu aktivieren und Ihre <strong>1200 kostenlosen Test-Tokens</strong> zu erhalten, bestätigen Sie bitte Ihre E-Mail-Adresse:</p>
+                <div style="text-align: center;">
+                    <a href="{verification_link}" class="button">✅ E-Mail-Adresse bestätigen</a>
+                </div>
+                <p><strong>Wichtig:</strong> Ohne Bestätigung können Sie sich nicht anmelden und haben keinen Zugriff auf die Zyrix-Tools.</p>
+                <p>Falls Sie sich nicht bei Zyrix registriert haben, ignorieren Sie diese E-Mail einfach.</p>
+                <p>Bei Fragen erreichen Sie uns unter: <a href="mailto:support@zyrix.de">support@zyrix.de</a></p>
+            </div>
+            <div class="footer">
+                <strong>Zyrix.de</strong><br>
+                Inhaber: Marc Netzer<br>
+                Mürmeln 77, 41363 Jüchen, Deutschland<br>
+                E-Mail: support@zyrix.de | Website: www.zyrix.de<br>
+                USt-IdNr.: DE327892859
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+def legacy_build_email(to_email, subject, html_content):
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = zyrix.EMAIL_USER
+    msg['To'] = to_email
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg
+
+def rate(fn, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return round(count / (time.perf_counter() - started))
+
+def measure(render, build, count):
+    message = build(*render()).as_bytes()
+    return {
+        'renders_per_second': rate(render, count),
+        'mime_per_second': rate(lambda: build(*render()).as_bytes(), max(1, count // 10)),
+        'mime_bytes': len(message)
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renders', type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {
+        'legacy_de': measure(
+            lambda: ('user@example.com', 'Zyrix.de - E-Mail-Adresse bestätigen',
+                     legacy_verification_email(NAME, LINK)),
+            legacy_build_email, args.renders)
+    }
+    for locale in MAIL_LOCALES:
+        # Erster Aufruf kompiliert die Vorlage, gemessen wird danach
+        render_mail('verification', locale, name=NAME, link=LINK)
+        results[f'templates_{locale}'] = measure(
+            lambda: ('user@example.com', *render_mail('verification', locale, name=NAME, link=LINK)),
+            zyrix.build_email, args.renders)
+    print(json.dumps({'benchmark': 'templates', 'config': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Benchmark: Live-Kontostand per SSE (/user-info/stream) gegenüber /user-info-Polling.
+
+Mit --connections Clients gegen einen lokalen Server (werkzeug, ein Thread
+pro Verbindung wie gthread) und FakeSupabase:
+
+polling: jeder Client ruft /user-info alle --poll-interval Sekunden ab.
+stream: jeder Client hält eine /user-info/stream-Verbindung offen.
+
+Gemessen werden pro Phase Requests an den Server und Supabase-Abfragen pro
+Sekunde, bei stream zusätzlich die Verzögerung bis zum Event nach einer
+Abbuchung über /consume-tokens (notify) und nach einer Änderung direkt in
+der Datenbank (Feed-Abfrage), der Speicher pro Verbindung (RSS-Zuwachs des
+Prozesses inkl. Server-Thread) und der Speicher des Feeds pro Stream
+(tracemalloc).
+
+Aufruf: python benchmarks/bench_user_stream.py --connections 200 --seconds 10
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import selectors
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+from loadtest import call, run_phase
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+class StreamClients:
+    """Viele SSE-Verbindungen, gelesen von einem einzigen Thread (selectors)"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        # Pro Verbindung: [Puffer, Header gelesen, [(Zeitpunkt, Event, Daten), ...]]
+        self.clients = []
+        self.bytes_received = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def open(self, token):
+        sock = socket.create_connection((self.host, self.port))
+        # HTTP/1.0: Antwort ohne Chunked-Encoding, Events kommen direkt im Byte-Strom
+        sock.sendall((f'GET /user-info/stream HTTP/1.0\r\nHost: {self.host}\r\n'
+                      f'Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n').encode())
+        sock.setblocking(False)
+        state = [b'', False, []]
+        with self.lock:
+            self.clients.append(state)
+        self.selector.register(sock, selectors.EVENT_READ, state)
+        return state
+
+    def _read(self):
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.1):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                now = time.perf_counter()
+                with self.lock:
+                    self.bytes_received += len(data)
+                    state = key.data
+                    state[0] += data
+                    if not state[1]:
+                        if b'\r\n\r\n' not in state[0]:
+                            continue
+                        head, state[0] = state[0].split(b'\r\n\r\n', 1)
+                        state[1] = True
+                        if b' 200 ' not in head.split(b'\r\n', 1)[0]:
+                            state[2].append((now, 'http-error', head.split(b'\r\n', 1)[0].decode()))
+                    while b'\n\n' in state[0]:
+                        message, state[0] = state[0].split(b'\n\n', 1)
+                        event, payload = None, None
+                        for line in message.decode().split('\n'):
+                            if line.startswith('event: '):
+                                event = line[7:]
+                            elif line.startswith('data: '):
+                                payload = json.loads(line[6:])
+                        if event is not None:
+                            state[2].append((now, event, payload))
+
+    def wait_for(self, state, count, timeout=30):
+        """Zeitpunkt, zu dem state mindestens count Events hat (None bei Timeout)"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if len(state[2]) >= count:
+                    return state[2][count - 1][0]
+            time.sleep(0.001)
+        return None
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+def polling_phase(zyrix, supabase, base_url, tokens, args):
+    build = lambda i: ('GET', '/user-info', None, {'Authorization': f'Bearer {tokens[i % len(tokens)]}'})
+    supabase.calls = 0
+    rounds = max(1, int(args.seconds / args.poll_interval))
+    requests = 0
+    started = time.perf_counter()
+    for round_index in range(rounds):
+        round_started = time.perf_counter()
+        run_phase(base_url, len(tokens), args.concurrency, build)
+        requests += len(tokens)
+        time.sleep(max(0.0, args.poll_interval - (time.perf_counter() - round_started)))
+    wall = time.perf_counter() - started
+    return {
+        'requests_per_second': round(requests / wall, 1),
+        'supabase_queries_per_second': round(supabase.calls / wall, 2),
+        'change_visible_after_ms': f'bis {args.poll_interval * 1000:g} (Abfrageintervall)'
+    }
+
+def stream_phase(zyrix, supabase, base_url, tokens, user_ids, args):
+    host, port = base_url.rsplit('/', 1)[1].split(':')
+    rss_before = rss_kb()
+    clients = StreamClients(host, int(port))
+    states = [clients.open(token) for token in tokens]
+    for state in states:
+        if clients.wait_for(state, 1) is None:
+            raise RuntimeError('Stream liefert kein erstes Event')
+    opened = sum(1 for state in states if state[2][0][1] == 'balance')
+    rss_per_connection = (rss_kb() - rss_before) / len(states)
+
+    # Ruhephase: nur Feed-Abfragen und Heartbeats
+    supabase.calls = 0
+    requests_before = clients.bytes_received
+    time.sleep(args.seconds)
+    quiet = {
+        'supabase_queries_per_second': round(supabase.calls / args.seconds, 2),
+        'bytes_per_connection_per_second': round((clients.bytes_received - requests_before) / len(states) / args.seconds, 1)
+    }
+
+    # Abbuchung im selben Worker: notify() weckt den Stream sofort
+    notify_ms = []
+    for i in range(min(20, len(states))):
+        count = len(states[i][2]) + 1
+        started = time.perf_counter()
+        call(base_url, 'POST', '/consume-tokens', {'amount': 1}, {'Authorization': f'Bearer {tokens[i]}'})
+        arrived = clients.wait_for(states[i], count)
+        if arrived is not None:
+            notify_ms.append((arrived - started) * 1000)
+
+    # Änderung direkt in der Datenbank (z.B. anderer Worker, Aufladung): sichtbar mit der nächsten Feed-Abfrage
+    feed_ms = []
+    rows = {row['id']: row for row in supabase.tables['users']}
+    for i in range(len(states) - min(10, len(states)), len(states)):
+        count = len(states[i][2]) + 1
+        started = time.perf_counter()
+        with supabase._lock:
+            rows[user_ids[i]]['tokens'] += 100
+        arrived = clients.wait_for(states[i], count, timeout=args.feed_interval * 3 + 5)
+        if arrived is not None:
+            feed_ms.append((arrived - started) * 1000)
+
+    feed_stats = zyrix.user_feed.stats()
+    clients.close()
+    return {
+        'connections_opened': opened,
+        'rss_kb_per_connection': round(rss_per_connection, 1),
+        'quiet': quiet,
+        'consume_to_event_ms_avg': round(sum(notify_ms) / len(notify_ms), 2) if notify_ms else None,
+        'db_change_to_event_ms_avg': round(sum(feed_ms) / len(feed_ms), 1) if feed_ms else None,
+        'db_change_to_event_ms_max': round(max(feed_ms), 1) if feed_ms else None,
+        'feed': feed_stats
+    }
+
+def feed_bytes_per_subscription(count=10000):
+    """Speicher des Feeds pro Stream (Subscription, Zeile, Event), ohne Server-Thread"""
+    from user_stream import UserFeed
+
+    feed = UserFeed(lambda ids: [], lambda row: {'tokens': row['tokens'], 'status': row['status']},
+                    interval=3600, max_connections=count)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [feed.subscribe(i, {'id': i, 'tokens': 1200, 'status': 'verified'}) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del subscriptions
+    return round(used / count)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10, help='Dauer der Ruhephase je Variante')
+    parser.add_argument('--poll-interval', type=float, default=5, help='Polling-Intervall der Clients')
+    parser.add_argument('--feed-interval', type=float, default=2, help='USER_STREAM_POLL_INTERVAL')
+    parser.add_argument('--concurrency', type=int, default=16, help='Parallele Requests beim Polling')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-user-stream-')
+    os.environ.setdefault('USER_STREAM_POLL_INTERVAL', str(args.feed_interval))
+    os.environ.setdefault('USER_STREAM_MAX_CONNECTIONS', str(args.connections))
+    fakes.prepare_environment(tmpdir)
+    import jwt
+    from werkzeug.serving import make_server
+    import app as zyrix
+
+    supabase = fakes.FakeSupabase()
+    fakes.install(zyrix, supabase)
+    user_ids = []
+    for i in range(args.connections):
+        supabase.tables['users'].append({
+            'id': i + 1, 'email': f'stream-{i}@example.com', 'full_name': f'Stream {i}',
+            'tokens': 1200, 'status': 'verified'
+        })
+        user_ids.append(i + 1)
+    tokens = [jwt.encode({'user_id': user_id, 'email': f'stream-{user_id - 1}@example.com',
+                          'exp': datetime.utcnow() + timedelta(days=1)},
+                         zyrix.app.config['SECRET_KEY'], algorithm='HS256') for user_id in user_ids]
+
+    server = make_server('127.0.0.1', fakes.free_port(), zyrix.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    try:
+        results = {
+            'polling': polling_phase(zyrix, supabase, base_url, tokens, args),
+            'stream': stream_phase(zyrix, supabase, base_url, tokens, user_ids, args),
+            'feed_bytes_per_subscription': feed_bytes_per_subscription()
+        }
+    finally:
+        server.shutdown()
+    print(json.dumps({'benchmark': 'user_stream', 'config': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""Lokale Stand-ins für Supabase und SMTP (nur für Benchmarks/Lasttests).
+
+FakeSupabase bildet die Teile der supabase-py-Kette nach, die app.py
+verwendet: table().select/insert/update/eq/gt/in_/order/limit/execute()
+sowie rpc() für die Funktionen aus supabase/migrations (Mengenfunktionen
+liefern wie PostgREST eine Liste). Die Funktionen sind in Python
+nachgebaut, das SQL selbst wird hier nicht ausgeführt. Optional wird pro
+Aufruf eine feste Latenz simuliert, um den Netzwerk-Round-Trip
+nachzustellen, und mit set_outage() ein Ausfall (langsamer Fehler).
+"""
+import os
+import time
+import socket
+import itertools
+import threading
+from datetime import datetime
+
+from postgrest.exceptions import APIError
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class FakeQuery:
+    def __init__(self, backend, table):
+        self.backend = backend
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        self.ordering = None
+        self.row_limit = None
+
+    def select(self, columns='*', **kwargs):
+        self.columns = columns
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.operation = 'insert'
+        self.payload = payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self.operation = 'update'
+        self.payload = payload
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, count, **kwargs):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        return self.backend.execute(self)
+
+class FakeRPC:
+    def __init__(self, backend, name, params):
+        self.backend = backend
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        return self.backend.call(self.name, self.params)
+
+class FakeSupabase:
+    """In-Memory-Ersatz für den Supabase-Client"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.tables = {'users': [], 'password_resets': []}
+        self.calls = 0
+        self.outage = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params or {})
+
+    def set_outage(self, error=None, delay=0.0):
+        """Jeder Aufruf wartet delay Sekunden und wirft dann error (None beendet den Ausfall)"""
+        self.outage = None if error is None else (error, delay)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+        outage = self.outage
+        if outage is not None:
+            error, delay = outage
+            with self._lock:
+                self.calls += 1
+            time.sleep(delay)
+            raise error
+
+    @staticmethod
+    def _project(row, columns):
+        if columns == '*':
+            return dict(row)
+        return {column.strip(): row.get(column.strip()) for column in columns.split(',')}
+
+    def execute(self, query):
+        self._wait()
+        with self._lock:
+            self.calls += 1
+            rows = self.tables.setdefault(query.table, [])
+            if query.operation == 'insert':
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                if query.table == 'users':
+                    existing = {row['email'] for row in rows}
+                    for item in payload:
+                        if item.get('email') in existing:
+                            raise APIError({'code': '23505', 'message': 'duplicate key value violates '
+                                                                        'unique constraint "users_email_key"'})
+                        existing.add(item.get('email'))
+                inserted = []
+                for item in payload:
+                    row = dict(item)
+                    row.setdefault('id', next(self._ids))
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return FakeResponse(inserted)
+
+            matched = [row for row in rows if all(check(row) for check in query.filters)]
+            if query.operation == 'update':
+                for row in matched:
+                    row.update(query.payload)
+                return FakeResponse([dict(row) for row in matched])
+
+            if query.ordering:
+                column, desc = query.ordering
+                matched.sort(key=lambda row: row.get(column), reverse=desc)
+            if query.row_limit is not None:
+                matched = matched[:query.row_limit]
+            return FakeResponse([self._project(row, query.columns) for row in matched])
+
+    def call(self, name, params):
+        self._wait()
+        with self._lock:
+            self.calls += 1
+            now = datetime.utcnow().isoformat()
+            if name == 'verify_email':
+                for row in self.tables['users']:
+                    if row.get('verification_token') == params['p_token'] and row.get('status') == 'pending':
+                        row.update(status='verified', verification_token=None, verified_at=now)
+                        return FakeResponse([{'user_id': row['id']}])
+                return FakeResponse([])
+            if name == 'reset_password':
+                for reset in self.tables['password_resets']:
+                    if reset['token'] == params['p_token'] and not reset['used']:
+                        if datetime.fromisoformat(reset['expires_at']) < datetime.utcnow():
+                            return FakeResponse([{'status': 'expired'}])
+                        for user in self.tables['users']:
+                            if user['id'] == reset['user_id']:
+                                user.update(password_hash=params['p_password_hash'], updated_at=now)
+                        reset.update(used=True, used_at=now)
+                        return FakeResponse([{'status': 'ok', 'user_id': reset['user_id']}])
+                return FakeResponse([{'status': 'invalid'}])
+            if name == 'verify_user':
+                for row in self.tables['users']:
+                    if row['id'] == params['p_user_id'] and row.get('status') == 'pending':
+                        row.update(status='verified', verification_token=None, verified_at=now)
+                        return FakeResponse([{'user_id': row['id']}])
+                return FakeResponse([])
+            if name == 'reset_password_signed':
+                for row in self.tables['users']:
+                    if row['id'] == params['p_user_id'] and row.get('password_hash') == params['p_current_hash']:
+                        row.update(password_hash=params['p_password_hash'], updated_at=now)
+                        return FakeResponse([{'status': 'ok', 'user_id': row['id']}])
+                return FakeResponse([{'status': 'invalid'}])
+            if name == 'apply_token_debits':
+                return FakeResponse(self._apply_token_debits(params['p_debits'], params.get('p_source'), now,
+                                                             params.get('p_strict', False)))
+        raise APIError({'code': 'PGRST202', 'message': f'Could not find the function {name}'})
+
+    def _apply_token_debits(self, debits, source, now, strict=False):
+        keys = self.tables.setdefault('token_idempotency_keys', [])
+        seen = {(row['user_id'], row['key']) for row in keys}
+        ledger = self.tables.setdefault('token_ledger', [])
+        results = []
+        for entry in debits:
+            user_id = entry['user_id']
+            user = next((row for row in self.tables['users'] if row['id'] == user_id), None)
+            if user is None:
+                continue
+            requested, events = entry['amount'], entry['count']
+            fresh = [event for event in entry['keyed'] if (user_id, event['key']) not in seen]
+            if strict and requested + sum(event['amount'] for event in fresh) > max(user['tokens'], 0):
+                results.append({'user_id': user_id, 'balance': user['tokens'], 'applied': 0, 'shortfall': 0,
+                                'rejected': True})
+                continue
+            for event in fresh:
+                seen.add((user_id, event['key']))
+                keys.append({'user_id': user_id, 'key': event['key'], 'created_at': now})
+                requested += event['amount']
+                events += 1
+            applied = min(requested, max(user['tokens'], 0))
+            user['tokens'] -= applied
+            if events:
+                ledger.append({'id': next(self._ids), 'user_id': user_id, 'requested': requested, 'applied': applied,
+                               'events': events, 'balance_after': user['tokens'], 'source': source,
+                               'created_at': now})
+            results.append({'user_id': user_id, 'balance': user['tokens'], 'applied': applied,
+                            'shortfall': requested - applied})
+        return results
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class SMTPSink:
+    """Lokaler SMTP-Server (aiosmtpd, ohne TLS), zählt empfangene Nachrichten"""
+
+    def __init__(self):
+        from aiosmtpd.controller import Controller
+
+        sink = self
+
+        class Handler:
+            async def handle_DATA(self, server, session, envelope):
+                sink.received += 1
+                return '250 OK'
+
+        self.received = 0
+        self.host = '127.0.0.1'
+        self.port = free_port()
+        self._controller = Controller(Handler(), hostname=self.host, port=self.port)
+
+    def start(self):
+        self._controller.start()
+        return self
+
+    def stop(self):
+        self._controller.stop()
+
+class DeadSMTP:
+    """SMTP-Server im Ausfall: nimmt Verbindungen an, antwortet nicht und trennt nach delay Sekunden"""
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self.connections = 0
+        self.host = '127.0.0.1'
+        self._sock = socket.socket()
+        self._sock.bind((self.host, 0))
+        self._sock.listen(64)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = False
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _accept(self):
+        while not self._stopped:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._hang_up, args=(conn,), daemon=True).start()
+
+    def _hang_up(self, conn):
+        time.sleep(self.delay)
+        conn.close()
+
+    def stop(self):
+        self._stopped = True
+        self._sock.close()
+
+def prepare_environment(tmpdir):
+    """Umgebung setzen, bevor app importiert wird"""
+    os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+    os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench')
+    os.environ.setdefault('OUTBOX_DB_PATH', os.path.join(tmpdir, 'outbox.sqlite3'))
+    os.environ.setdefault('OUTBOX_POLL_INTERVAL', '0.2')
+    os.environ.setdefault('METERING_JOURNAL_PATH', os.path.join(tmpdir, 'metering.sqlite3'))
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+def install(app_module, supabase, smtp_sink=None):
+    """Stand-ins in das importierte app-Modul einsetzen"""
+    from smtp_pool import SMTPConnectionPool
+
+    app_module.supabase.set(supabase)
+    if smtp_sink is not None:
+        app_module.smtp_pool = SMTPConnectionPool(smtp_sink.host, smtp_sink.port, None, None, use_ssl=False)
@@ -0,0 +1,213 @@
+"""Lasttest aller API-Endpunkte gegen lokale Stand-ins.
+
+Startet app.py in einem lokalen HTTP-Server (werkzeug, threaded) mit
+FakeSupabase und einem lokalen SMTP-Sink und treibt /register, /login,
+/user-info, /consume-tokens, /verify-email, /request-password-reset und
+/reset-password mit konfigurierbarer Parallelität. Ausgabe ist JSON mit Durchsatz und
+p50/p95/p99 pro Endpunkt, damit Releases verglichen werden können.
+
+Aufruf:
+    python benchmarks/loadtest.py --requests 200 --concurrency 8 \\
+        --supabase-latency-ms 20 --output loadtest.json
+Benötigt: pip install aiosmtpd (ohne aiosmtpd: --no-smtp)
+"""
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+from link_tokens import LINK_TOKEN_FORMAT
+
+ENDPOINTS = ['register', 'login', 'user-info', 'consume-tokens', 'verify-email', 'request-password-reset',
+             'reset-password']
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def call(base_url, method, path, body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method, headers=headers or {})
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def run_phase(base_url, requests, concurrency, build):
+    """build(i) -> (method, path, body, headers); misst Latenz je Request"""
+    timings = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        method, path, body, headers = build(i)
+        started = time.perf_counter()
+        try:
+            status, _ = call(base_url, method, path, body, headers)
+        except Exception:
+            status = 'error'
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    timings.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    return {
+        'requests': requests,
+        'errors': errors,
+        'status_counts': statuses,
+        'throughput_rps': round(requests / wall, 1),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2)
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def seed(supabase, hasher, signer, count):
+    """Verifizierte Benutzer, ausstehende Bestätigungen und Reset-Tokens anlegen.
+
+    Mit LINK_TOKEN_FORMAT=signed (Standard) werden signierte Links erzeugt,
+    sonst Tokens in users.verification_token bzw. password_resets.
+    """
+    signed_links = LINK_TOKEN_FORMAT == 'signed'
+    password_hash = hasher.hash('Lasttest-Passwort')
+    expires_at = (datetime.utcnow() + timedelta(hours=24)).isoformat()
+    verified, pending_tokens, reset_tokens = [], [], []
+    for i in range(count):
+        email = f'lasttest-{i}@example.com'
+        verification_token = None if signed_links else secrets.token_urlsafe(32)
+        user_id = supabase.table('users').insert({
+            'email': email, 'full_name': f'Lasttest {i}', 'password_hash': password_hash,
+            'strasse': 'Teststraße 1', 'plz': '10115', 'stadt': 'Berlin', 'land': 'Deutschland',
+            'tokens': 1200, 'status': 'verified', 'created_at': datetime.utcnow().isoformat()
+        }).execute().data[0]['id']
+        pending_id = supabase.table('users').insert({
+            'email': f'pending-{i}@example.com', 'full_name': f'Pending {i}', 'password_hash': password_hash,
+            'tokens': 1200, 'status': 'pending', 'verification_token': verification_token
+        }).execute().data[0]['id']
+        if signed_links:
+            verification_token = signer.verification_token(pending_id)
+            reset_token = signer.reset_token(user_id, password_hash)
+        else:
+            reset_token = secrets.token_urlsafe(32)
+            supabase.table('password_resets').insert({
+                'user_id': user_id, 'token': reset_token, 'expires_at': expires_at, 'used': False
+            }).execute()
+        verified.append((user_id, email))
+        pending_tokens.append(verification_token)
+        reset_tokens.append(reset_token)
+    supabase.calls = 0
+    return verified, pending_tokens, reset_tokens
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200, help='Requests pro Endpunkt')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--supabase-latency-ms', type=float, default=0.0)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--no-smtp', action='store_true', help='ohne lokalen SMTP-Sink')
+    parser.add_argument('--output', help='JSON zusätzlich in diese Datei schreiben')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='zyrix-loadtest-')
+    fakes.prepare_environment(tmpdir)
+    import jwt
+    from werkzeug.serving import make_server
+    import app as zyrix
+
+    supabase = fakes.FakeSupabase(latency_ms=args.supabase_latency_ms)
+    sink = None if args.no_smtp else fakes.SMTPSink().start()
+    fakes.install(zyrix, supabase, sink)
+
+    verified, pending_tokens, reset_tokens = seed(supabase, zyrix.password_hasher, zyrix.link_tokens, args.requests)
+    tokens = [jwt.encode({'user_id': user_id, 'email': email, 'exp': datetime.utcnow() + timedelta(days=30)},
+                         zyrix.app.config['SECRET_KEY'], algorithm='HS256') for user_id, email in verified]
+
+    server = make_server('127.0.0.1', fakes.free_port(), zyrix.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    run_id = secrets.token_hex(4)
+    builders = {
+        'register': lambda i: ('POST', '/register', {
+            'full_name': f'Neu {i}', 'email': f'neu-{run_id}-{i}@example.com', 'password': 'Lasttest-Passwort',
+            'strasse': 'Teststraße 1', 'plz': '10115', 'stadt': 'Berlin', 'land': 'Deutschland'}, None),
+        'login': lambda i: ('POST', '/login', {'email': verified[i][1], 'password': 'Lasttest-Passwort'}, None),
+        'user-info': lambda i: ('GET', '/user-info', None, {'Authorization': f'Bearer {tokens[i]}'}),
+        'consume-tokens': lambda i: ('POST', '/consume-tokens', {'amount': 1},
+                                     {'Authorization': f'Bearer {tokens[i % len(tokens)]}'}),
+        'verify-email': lambda i: ('GET', f'/verify-email?token={pending_tokens[i]}', None, None),
+        'request-password-reset': lambda i: ('POST', '/request-password-reset', {'email': verified[i][1]}, None),
+        'reset-password': lambda i: ('POST', '/reset-password',
+                                     {'token': reset_tokens[i], 'password': 'Neues-Passwort'}, None),
+    }
+
+    results = {}
+    try:
+        for endpoint in args.endpoints.split(','):
+            supabase.calls = 0
+            results[endpoint] = run_phase(base_url, args.requests, args.concurrency, builders[endpoint])
+            # Abbuchungen werden im Hintergrund gebündelt geschrieben
+            zyrix.token_meter.flush()
+            results[endpoint]['supabase_calls'] = supabase.calls
+    finally:
+        server.shutdown()
+        if sink is not None:
+            # Outbox kurz leerlaufen lassen, damit der Sink die Mails zählt
+            time.sleep(1)
+            sink.stop()
+
+    report = {
+        'benchmark': 'loadtest',
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+            'supabase_latency_ms': args.supabase_latency_ms,
+            'smtp_sink': sink is not None,
+            'link_token_format': LINK_TOKEN_FORMAT
+        },
+        'emails_received': sink.received if sink is not None else None,
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""Massenimport von Benutzern aus CSV oder NDJSON (z.B. Kundenlisten von Partnern).
+
+Die Datei wird zeilenweise gelesen und in Blöcken verarbeitet: Validierung
+wie bei POST /register, Abgleich mit bestehenden Adressen über gebündelte
+in_()-Abfragen, ein insert() pro Block und Bestätigungs-E-Mails über die
+Outbox mit gedrosselter Versandrate. Fehlerhafte Zeilen werden als NDJSON
+gemeldet, der Import läuft weiter.
+
+Die E-Mails stellen entweder die laufenden Worker zu (OUTBOX_DB_PATH muss
+auf deren Outbox-Datei zeigen) oder mit --send dieser Prozess selbst, bis
+die Outbox leer ist.
+
+Aufruf:
+    OUTBOX_DB_PATH=/var/data/outbox.sqlite3 python bulk_import.py kunden.csv --errors fehler.ndjson
+    python bulk_import.py kunden.csv --send
+    python bulk_import.py kunden.ndjson --dry-run
+    cat kunden.csv | python bulk_import.py - --format csv --send
+"""
+import os
+import sys
+import csv
+import json
+import time
+import secrets
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import app as zyrix
+from passwords import PasswordHasher
+from repository import DuplicateEmailError
+from link_tokens import LINK_TOKEN_FORMAT
+
+# Import Konfiguration
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 500))
+# E-Mails pro in_()-Abfrage (begrenzt die URL-Länge)
+IMPORT_LOOKUP_SIZE = int(os.environ.get('IMPORT_LOOKUP_SIZE', 200))
+# Bestätigungs-E-Mails pro Minute (0 = ungedrosselt)
+IMPORT_EMAIL_RATE = float(os.environ.get('IMPORT_EMAIL_RATE', 30))
+IMPORT_HASH_WORKERS = int(os.environ.get('IMPORT_HASH_WORKERS', os.cpu_count() or 1))
+
+FORMATS = ('csv', 'ndjson')
+
+def read_rows(stream, fmt):
+    """Zeilen einzeln liefern: (Zeilennummer, dict oder None, Fehlertext oder None)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, 'Ungültiges JSON'
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, 'Ungültiges JSON-Objekt'
+            continue
+        yield line_no, row, None
+
+def _clean(row):
+    # Leerzeichen aus Tabellenkalkulationen entfernen, überzählige CSV-Spalten (Schlüssel None) verwerfen
+    return {
+        key.strip(): value.strip() if isinstance(value, str) else value
+        for key, value in row.items() if key
+    }
+
+class BulkImporter:
+    """Importiert Benutzer blockweise mit konstantem Speicherbedarf pro Block.
+
+    Gehalten werden nur der aktuelle Block und die Menge der bereits
+    gelesenen Adressen (für Duplikate innerhalb der Datei).
+    """
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, lookup_size=IMPORT_LOOKUP_SIZE,
+                 email_rate=IMPORT_EMAIL_RATE, hash_workers=IMPORT_HASH_WORKERS,
+                 require_password=True, dry_run=False, on_error=None, on_progress=None):
+        self.chunk_size = chunk_size
+        self.lookup_size = lookup_size
+        self.email_interval = 60.0 / email_rate if email_rate > 0 else 0.0
+        self.dry_run = dry_run
+        # on_error({'line', 'email', 'error'}), on_progress(stats)
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.required_fields = [field for field in zyrix.REGISTRATION_REQUIRED_FIELDS
+                                if require_password or field != 'password']
+        self.signed_links = LINK_TOKEN_FORMAT == 'signed'
+        self.hasher = PasswordHasher(workers=hash_workers)
+        self._hash_workers = hash_workers
+        self._seen = set()
+        self._send_at = None
+        self._started = None
+        self.stats = {
+            'rows': 0,
+            'valid': 0,
+            'inserted': 0,
+            'duplicates': 0,
+            'invalid': 0,
+            'failed': 0,
+            'emails_queued': 0
+        }
+
+    def _reject(self, line, email, error, kind):
+        self.stats[kind] += 1
+        if self.on_error is not None:
+            self.on_error({'line': line, 'email': email, 'error': error})
+
+    def run(self, rows):
+        """rows aus read_rows() importieren, liefert die Zusammenfassung"""
+        self._started = time.perf_counter()
+        chunk = []
+        for line, row, error in rows:
+            self.stats['rows'] += 1
+            if error:
+                self._reject(line, None, error, 'invalid')
+                continue
+            data = _clean(row)
+            error = zyrix.validate_registration(data, self.required_fields)
+            if error:
+                self._reject(line, data.get('email'), error, 'invalid')
+                continue
+            if data['email'] in self._seen:
+                self._reject(line, data['email'], 'E-Mail-Adresse mehrfach in der Datei', 'duplicates')
+                continue
+            self._seen.add(data['email'])
+            chunk.append((line, data))
+            if len(chunk) >= self.chunk_size:
+                self._process(chunk)
+                chunk = []
+        if chunk:
+            self._process(chunk)
+        self.hasher.shutdown()
+        return self.summary()
+
+    def _process(self, chunk):
+        emails = [data['email'] for _, data in chunk]
+        existing = set()
+        for start in range(0, len(emails), self.lookup_size):
+            existing |= zyrix.users.existing_emails(emails[start:start + self.lookup_size])
+
+        fresh = []
+        for line, data in chunk:
+            if data['email'] in existing:
+                self._reject(line, data['email'], 'E-Mail-Adresse bereits registriert', 'duplicates')
+            else:
+                fresh.append((line, data))
+        self.stats['valid'] += len(fresh)
+
+        if fresh and not self.dry_run:
+            created = self._insert(fresh)
+            self._queue_emails(fresh, created)
+        if self.on_progress is not None:
+            self.on_progress(self.summary())
+
+    def _hash_passwords(self, fresh):
+        # Ohne Passwort bleibt der Hash leer: Login schlägt fehl, bis über
+        # "Passwort vergessen" eines gesetzt wurde
+        passwords = [data.get('password') or '' for _, data in fresh]
+        with ThreadPoolExecutor(self._hash_workers) as executor:
+            return list(executor.map(lambda password: self.hasher.hash(password) if password else '', passwords))
+
+    def _insert(self, fresh):
+        """Block anlegen, liefert {email: angelegte Zeile}"""
+        hashes = self._hash_passwords(fresh)
+        records = [
+            zyrix.build_user_record(data, password_hash, None if self.signed_links else secrets.token_urlsafe(32))
+            for (_, data), password_hash in zip(fresh, hashes)
+        ]
+        try:
+            rows = zyrix.users.create_many(records)
+        except DuplicateEmailError:
+            # Adresse wurde zwischen Abgleich und Insert registriert
+            rows = self._insert_individually(fresh, records)
+        except Exception as e:
+            for line, data in fresh:
+                self._reject(line, data['email'], f'Speichern fehlgeschlagen: {e}', 'failed')
+            return {}
+        self.stats['inserted'] += len(rows)
+        return {row['email']: row for row in rows}
+
+    def _insert_individually(self, fresh, records):
+        rows = []
+        for (line, data), record in zip(fresh, records):
+            try:
+                user_id = zyrix.users.create(record, return_id=True)
+            except DuplicateEmailError:
+                self._reject(line, data['email'], 'E-Mail-Adresse bereits registriert', 'duplicates')
+                continue
+            except Exception as e:
+                self._reject(line, data['email'], f'Speichern fehlgeschlagen: {e}', 'failed')
+                continue
+            rows.append(dict(record, id=user_id))
+        return rows
+
+    def _queue_emails(self, fresh, created):
+        messages = []
+        lines = []
+        for line, data in fresh:
+            row = created.get(data['email'])
+            if row is None:
+                continue
+            token = zyrix.link_tokens.verification_token(row['id']) if self.signed_links \
+                else row['verification_token']
+            # Optionale Spalte locale (de/en) wählt die Sprache der E-Mail
+            mail = zyrix.build_verification_email(data['full_name'], token, data.get('locale'))
+            messages.append((data['email'], *mail))
+            lines.append((line, data['email']))
+        if not messages:
+            return
+        try:
+            self._send_at = zyrix.outbox.enqueue_many(messages, self._send_at, self.email_interval)
+        except Exception as e:
+            for line, email in lines:
+                self._reject(line, email, f'Bestätigungs-E-Mail nicht eingereiht: {e}', 'failed')
+            return
+        self.stats['emails_queued'] += len(messages)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        summary = dict(self.stats, dry_run=self.dry_run, seconds=round(elapsed, 2),
+                       rows_per_second=round(self.stats['rows'] / elapsed, 1) if elapsed else 0.0)
+        if self._send_at is not None:
+            # Letzte gedrosselte Bestätigungs-E-Mail wird ab diesem Zeitpunkt zugestellt
+            summary['emails_until'] = datetime.fromtimestamp(self._send_at).isoformat(timespec='seconds')
+        return summary
+
+def drain_outbox(outbox, poll_interval=1.0, on_progress=None):
+    """Eingereihte E-Mails selbst zustellen, bis keine mehr wartet (--send), liefert die Zahl der Durchläufe"""
+    rounds = 0
+    while True:
+        pending = outbox.pending_count()
+        if not pending:
+            return rounds
+        if on_progress is not None:
+            on_progress(pending)
+        rounds += 1
+        # Gedrosselte Nachrichten werden erst nach und nach fällig
+        if not outbox.process_due():
+            time.sleep(poll_interval)
+
+def _detect_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+def main():
+    parser = argparse.ArgumentParser(description='Benutzer aus CSV oder NDJSON importieren')
+    parser.add_argument('file', help="Pfad zur Datei oder '-' für stdin")
+    parser.add_argument('--format', choices=FORMATS, help='Standard: nach Dateiendung, sonst csv')
+    parser.add_argument('--errors', help='Fehlerhafte Zeilen als NDJSON in diese Datei schreiben (Standard: stderr)')
+    parser.add_argument('--dry-run', action='store_true', help='Nur prüfen und abgleichen, nichts anlegen')
+    parser.add_argument('--allow-missing-password', action='store_true',
+                        help='Zeilen ohne Passwort anlegen (Passwort später über "Passwort vergessen")')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument('--email-rate', type=float, default=IMPORT_EMAIL_RATE,
+                        help='Bestätigungs-E-Mails pro Minute (0 = ungedrosselt)')
+    parser.add_argument('--send', action='store_true',
+                        help='Bestätigungs-E-Mails selbst zustellen und warten, bis die Outbox leer ist')
+    args = parser.parse_args()
+
+    if not args.dry_run and not args.send:
+        # Sonst landen die E-Mails in einer Datei, die kein Worker abarbeitet
+        outbox_path = os.environ.get('OUTBOX_DB_PATH')
+        if not outbox_path or not os.path.exists(outbox_path):
+            parser.error('OUTBOX_DB_PATH muss auf die bestehende Outbox der laufenden Worker zeigen '
+                         '(oder --send verwenden)')
+
+    fmt = args.format or ('csv' if args.file == '-' else _detect_format(args.file))
+    errors = open(args.errors, 'w', encoding='utf-8') if args.errors else sys.stderr
+
+    def on_error(entry):
+        errors.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def on_progress(summary):
+        print(f"Zeilen {summary['rows']} | angelegt {summary['inserted']} | Duplikate {summary['duplicates']} | "
+              f"ungültig {summary['invalid']} | fehlgeschlagen {summary['failed']} | "
+              f"{summary['rows_per_second']} Zeilen/s", file=sys.stderr, flush=True)
+
+    importer = BulkImporter(chunk_size=args.chunk_size, email_rate=args.email_rate,
+                            require_password=not args.allow_missing_password, dry_run=args.dry_run,
+                            on_error=on_error, on_progress=on_progress)
+    # utf-8-sig: BOM aus Excel-Exporten ignorieren
+    stream = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8-sig', newline='')
+    try:
+        summary = importer.run(read_rows(stream, fmt))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if errors is not sys.stderr:
+            errors.close()
+    if args.send and not args.dry_run:
+        def on_drain(pending):
+            print(f'Outbox: {pending} E-Mails ausstehend', file=sys.stderr, flush=True)
+
+        drain_outbox(zyrix.outbox, on_progress=on_drain)
+        summary['emails_pending'] = zyrix.outbox.pending_count()
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Cache Konfiguration
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+# Backend für gemeinsam nutzbare Caches: 'shared' (Shared Memory, alle Worker eines Hosts),
+# 'memory' (pro Worker) oder 'redis' (lokaler Redis-kompatibler Server)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'shared').lower()
+
+_MISSING = object()
+
+class CacheBackend:
+    """Schnittstelle der Cache-Backends: get, set, invalidate, clear, stats.
+
+    Schlüssel und Werte der prozessübergreifenden Backends müssen
+    JSON-serialisierbar sein.
+    """
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def invalidate(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def get_or_load(self, key, loader):
+        """Read-Through: bei Miss loader() aufrufen und Ergebnis cachen (None wird nicht gecacht)"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+class TTLCache(CacheBackend):
+    """Größenbegrenzter In-Process-Cache mit LRU-Verdrängung und TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Kennzahlen
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+def create_cache(name, maxsize, ttl, backend=CACHE_BACKEND):
+    """Cache mit dem konfigurierten Backend anlegen; ist es nicht verfügbar, pro Worker im Speicher"""
+    try:
+        if backend == 'shared':
+            from shared_cache import SharedMemoryCache
+            return SharedMemoryCache(name, maxsize, ttl)
+        if backend == 'redis':
+            from redis_cache import RedisCache
+            return RedisCache(name, ttl)
+    except (ImportError, RuntimeError) as e:
+        print(f"Cache {name}: Backend {backend} nicht verfügbar ({e}), verwende Cache pro Worker")
+    return TTLCache(maxsize, ttl)
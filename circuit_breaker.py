@@ -0,0 +1,255 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+
+# Circuit-Breaker Konfiguration (pro Worker und Abhängigkeit)
+BREAKER_ENABLED = os.environ.get('BREAKER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+# Fehlerquote über die letzten BREAKER_WINDOW Sekunden, ab BREAKER_MIN_CALLS Aufrufen
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', 10))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))
+BREAKER_FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+# Totalausfall schneller erkennen: so viele Ausfälle in Folge öffnen den Circuit sofort
+BREAKER_CONSECUTIVE_FAILURES = int(os.environ.get('BREAKER_CONSECUTIVE_FAILURES', 5))
+# So lange bleibt der Circuit offen, danach wird ein einzelner Probe-Aufruf durchgelassen
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 15))
+# Wiederholungen nach einem Ausfall (zusätzlich zum ersten Versuch), Wartezeit mit Full Jitter
+RETRY_ATTEMPTS = int(os.environ.get('RETRY_ATTEMPTS', 2))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.05))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 0.5))
+# Wiederholungen höchstens für diesen Anteil der Aufrufe im Fenster (keine Lastverstärkung im Ausfall)
+RETRY_BUDGET = float(os.environ.get('RETRY_BUDGET', 0.2))
+# Bei wenig Verkehr sind trotzdem einige Wiederholungen pro Fenster erlaubt
+RETRY_BUDGET_MIN = 3
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+# Zahlenwerte für /metrics
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+class CircuitOpenError(Exception):
+    """Abhängigkeit gilt als gestört, der Aufruf wurde nicht ausgeführt"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} vorübergehend nicht erreichbar')
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Circuit-Breaker mit Fehlerquote im Zeitfenster und Half-Open-Probe.
+
+    closed: Aufrufe laufen durch, Erfolge und Ausfälle werden in
+    Sekunden-Buckets gezählt. Liegt die Ausfallquote im Fenster bei
+    mindestens failure_rate (ab min_calls Aufrufen) oder scheitern
+    consecutive_failures Aufrufe in Folge, öffnet der Circuit.
+    open: Aufrufe scheitern sofort mit CircuitOpenError. Nach open_seconds
+    wird genau ein Aufruf als Probe durchgelassen (half_open); gelingt er,
+    schließt der Circuit, sonst bleibt er weitere open_seconds offen.
+
+    is_failure(e) entscheidet, welche Ausnahmen als Ausfall zählen
+    (fachliche Fehler wie Unique-Verletzungen nicht). Ausfälle werden bis zu
+    retries Mal mit zufälliger Wartezeit wiederholt, sofern der Aufrufer
+    das per retry(e) erlaubt und das Wiederholungsbudget (retry_budget mal
+    Aufrufe im Fenster) nicht aufgebraucht ist.
+    """
+
+    def __init__(self, name, is_failure=None, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, consecutive_failures=BREAKER_CONSECUTIVE_FAILURES,
+                 open_seconds=BREAKER_OPEN_SECONDS,
+                 retries=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 retry_budget=RETRY_BUDGET, enabled=BREAKER_ENABLED):
+        self.name = name
+        self.is_failure = is_failure or (lambda e: True)
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.consecutive_failures = consecutive_failures
+        self.open_seconds = open_seconds
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._failure_streak = 0
+        # [Sekunde, Aufrufe, Ausfälle, Wiederholungen]
+        self._buckets = deque()
+
+        # Kennzahlen dieses Prozesses
+        self.opened = 0
+        self.rejected = 0
+        self.retried = 0
+        self.retries_denied = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    @property
+    def state(self):
+        return self._state
+
+    def available(self):
+        """True, wenn ein Aufruf jetzt ausgeführt würde (für Hintergrund-Worker vor dem Abholen)"""
+        with self._lock:
+            if self._state == CLOSED or not self.enabled:
+                return True
+            if self._state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_seconds
+            return not self._probing
+
+    def _before(self):
+        """Aufruf zulassen oder CircuitOpenError; liefert True für den Probe-Aufruf"""
+        with self._lock:
+            if self._state == CLOSED:
+                return False
+            now = time.monotonic()
+            if self._state == OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._state = HALF_OPEN
+            if self._probing:
+                # Probe läuft noch, ihr Ergebnis entscheidet
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 1.0)
+            self._probing = True
+            return True
+
+    def _after(self, probe, failed):
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probing = False
+                if failed:
+                    self._state = OPEN
+                    self._opened_at = now
+                    self.opened += 1
+                else:
+                    self._state = CLOSED
+                    self._failure_streak = 0
+                    self._buckets.clear()
+                return
+
+            bucket = self._bucket(now)
+            bucket[1] += 1
+            if not failed:
+                self._failure_streak = 0
+                return
+            bucket[2] += 1
+            self._failure_streak += 1
+
+            if self._state == CLOSED:
+                calls, failures, _ = self._counts()
+                if self._failure_streak >= self.consecutive_failures or (
+                        calls >= self.min_calls and failures / calls >= self.failure_rate):
+                    self._state = OPEN
+                    self._opened_at = now
+                    self.opened += 1
+                    print(f"Circuit {self.name}: geöffnet ({failures}/{calls} Ausfälle in {self.window:g}s, "
+                          f"{self._failure_streak} in Folge), Aufrufe scheitern {self.open_seconds:g}s lang sofort")
+
+    def _bucket(self, now):
+        # Bucket der aktuellen Sekunde, ältere als window verwerfen (Lock muss gehalten werden)
+        second = int(now)
+        if self._buckets and self._buckets[-1][0] == second:
+            return self._buckets[-1]
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        bucket = [second, 0, 0, 0]
+        self._buckets.append(bucket)
+        return bucket
+
+    def _counts(self):
+        calls = failures = retries = 0
+        for _, bucket_calls, bucket_failures, bucket_retries in self._buckets:
+            calls += bucket_calls
+            failures += bucket_failures
+            retries += bucket_retries
+        return calls, failures, retries
+
+    def _take_retry(self):
+        """Wiederholung aus dem Budget nehmen; False, wenn im Fenster schon genug wiederholt wurde"""
+        with self._lock:
+            calls, _, retries = self._counts()
+            if retries >= max(self.retry_budget * calls, RETRY_BUDGET_MIN):
+                self.retries_denied += 1
+                return False
+            self._bucket(time.monotonic())[3] += 1
+            self.retried += 1
+            return True
+
+    def _delay(self, attempt):
+        # Full Jitter: gleichzeitig gescheiterte Requests wiederholen nicht im Gleichschritt
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn, retry=None, is_failed_result=None):
+        """fn() über den Breaker ausführen.
+
+        retry(e): darf nach diesem Ausfall wiederholt werden (Standard: ja);
+        nicht idempotente Schreibzugriffe erlauben das nur, wenn die Anfrage
+        den Server sicher nicht erreicht hat. is_failed_result(result): zählt
+        ein Ergebnis ohne Ausnahme trotzdem als Ausfall (z.B. Sammelversand).
+        """
+        if not self.enabled:
+            return fn()
+        attempt = 0
+        while True:
+            probe = self._before()
+            try:
+                result = fn()
+            except Exception as e:
+                failed = self.is_failure(e)
+                self._after(probe, failed)
+                if not failed or attempt >= self.retries or (retry is not None and not retry(e)) \
+                        or not self._take_retry():
+                    raise
+                time.sleep(self._delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # z.B. abgebrochenes Greenlet: Probe nicht hängen lassen
+                self._after(probe, True)
+                raise
+            self._after(probe, is_failed_result is not None and is_failed_result(result))
+            return result
+
+    def stats(self):
+        with self._lock:
+            calls, failures, _ = self._counts()
+            retry_after = 0.0
+            if self._state == OPEN:
+                retry_after = max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+            return {
+                'state': self._state,
+                'enabled': self.enabled,
+                'window_seconds': self.window,
+                'calls_in_window': calls,
+                'failures_in_window': failures,
+                'failure_rate': round(failures / calls, 4) if calls else 0,
+                'retry_after_seconds': round(retry_after, 1),
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retries': self.retried,
+                'retries_denied': self.retries_denied
+            }
+
+def breakers():
+    with _registry_lock:
+        return list(_registry.values())
+
+def states():
+    """Zustand pro Abhängigkeit, z.B. {'supabase': 'closed', 'smtp': 'open'}"""
+    return {breaker.name: breaker.state for breaker in breakers()}
+
+def stats():
+    """Kennzahlen aller Circuit-Breaker dieses Workers"""
+    return {breaker.name: breaker.stats() for breaker in breakers()}
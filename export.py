@@ -0,0 +1,91 @@
+import os
+import io
+import csv
+import json
+import zlib
+
+# Export Konfiguration
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 1000))
+
+# Exportierbare Spalten pro Tabelle; Passwort-Hashes und Link-Tokens sind bewusst nicht enthalten
+EXPORT_COLUMNS = {
+    'users': ('id', 'email', 'full_name', 'firmenname', 'ust_idnr', 'strasse', 'plz', 'stadt', 'land',
+              'tokens', 'status', 'created_at', 'verified_at', 'updated_at'),
+    'password_resets': ('id', 'user_id', 'expires_at', 'used', 'used_at', 'created_at')
+}
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+class ExportError(ValueError):
+    """Unbekannte Tabelle, Spalte oder Format"""
+
+def select_columns(table, requested=None):
+    """Spaltenauswahl prüfen; id ist immer enthalten (Keyset-Pagination)"""
+    allowed = EXPORT_COLUMNS.get(table)
+    if allowed is None:
+        raise ExportError(f'Unbekannte Tabelle: {table}')
+    if not requested:
+        return list(allowed)
+    columns = [column.strip() for column in requested.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ExportError(f"Unbekannte Spalten: {', '.join(unknown)}")
+    if 'id' not in columns:
+        columns.insert(0, 'id')
+    return columns
+
+def iter_pages(repository, columns, page_size=EXPORT_PAGE_SIZE):
+    """Alle Zeilen seitenweise nach id lesen (WHERE id > letzte id), nie mehr als eine Seite im Speicher.
+
+    Die erste Seite wird sofort gelesen: ein Fehler von Supabase fällt so noch
+    vor dem Start der Response auf und wird kein abgeschnittener 200-Download.
+    """
+    select = ','.join(columns)
+    first = repository.page_after(select, None, page_size)
+
+    def pages():
+        rows = first
+        # Erst eine leere Seite beendet den Export; PostgREST kürzt Seiten auf max-rows,
+        # eine kürzere Seite heißt also nicht, dass die Tabelle zu Ende ist
+        while rows:
+            yield rows
+            rows = repository.page_after(select, rows[-1]['id'], page_size)
+
+    return pages()
+
+def _ndjson(pages, columns):
+    for rows in pages:
+        yield ''.join(json.dumps({column: row.get(column) for column in columns}, separators=(',', ':'),
+                                 ensure_ascii=False, default=str) + '\n' for row in rows).encode('utf-8')
+
+def _csv(pages, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in pages:
+        writer.writerows([row.get(column) for column in columns] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Nur Kopfzeile bei leerer Tabelle
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _gzip(chunks):
+    # wbits=31: gzip-Container, Kompression läuft mit den Seiten mit
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(repository, columns, fmt='ndjson', compress=False, page_size=EXPORT_PAGE_SIZE):
+    """Export als Folge von Byte-Blöcken (ein Block pro Seite) für eine Streaming-Response"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f'Unbekanntes Format: {fmt}')
+    pages = iter_pages(repository, columns, page_size)
+    chunks = _csv(pages, columns) if fmt == 'csv' else _ndjson(pages, columns)
+    return _gzip(chunks) if compress else chunks
@@ -0,0 +1,98 @@
+# gunicorn-Konfiguration (wird von "gunicorn app:app" automatisch geladen)
+import os
+import shutil
+import tempfile
+
+# Prometheus: Metriken aller Worker über ein gemeinsames Verzeichnis zusammenführen.
+# Muss gesetzt sein, bevor app/metrics importiert werden.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'zyrix-prometheus')
+)
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# Worker-Modell: 'gthread' (Standard) oder 'sync'. gevent wird bewusst nicht unterstützt:
+# Hash-Pool (ProcessPoolExecutor), Semaphoren und SQLite-Verbindungen pro Thread sind auf
+# echte Threads ausgelegt.
+GUNICORN_WORKER_CLASS = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread').lower()
+if GUNICORN_WORKER_CLASS not in ('gthread', 'sync'):
+    raise ValueError(f'GUNICORN_WORKER_CLASS={GUNICORN_WORKER_CLASS!r} nicht unterstützt (gthread oder sync)')
+# Geschätzter Speicherbedarf pro Worker inkl. Hash-Prozess (begrenzt die Worker-Zahl)
+GUNICORN_WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 160))
+# Gleichzeitige Requests pro Worker (gthread)
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 16))
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _cpu_count():
+    """Nutzbare Kerne, inkl. CPU-Quota des Containers (cgroup v2)"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        # Bruchteile eines Kerns aufrunden (Render: z.B. 0.5 CPU)
+        cores = min(cores, max(1, -(-int(limit) // int(period))))
+    return cores
+
+def _memory_mb():
+    """Speicherlimit des Containers (cgroup v2/v1), sonst physischer Speicher"""
+    limit = _read('/sys/fs/cgroup/memory.max') or _read('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if limit and limit.isdigit() and int(limit) < 1 << 50:
+        return int(limit) // (1024 * 1024)
+    for line in (_read('/proc/meminfo') or '').splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) // 1024
+    return None
+
+def _worker_count(kind, cores, memory_mb):
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    # sync: ein Request pro Prozess, daher mehr Prozesse als Kerne;
+    # gthread: ein Prozess pro Kern, Parallelität innerhalb des Workers
+    by_cpu = cores * 2 + 1 if kind == 'sync' else cores
+    by_memory = memory_mb // GUNICORN_WORKER_MEMORY_MB if memory_mb else by_cpu
+    return max(1, min(by_cpu, by_memory))
+
+_cores = _cpu_count()
+_memory = _memory_mb()
+
+worker_class = GUNICORN_WORKER_CLASS
+workers = _worker_count(worker_class, _cores, _memory)
+if worker_class == 'gthread':
+    threads = GUNICORN_THREADS
+    _concurrency = GUNICORN_THREADS
+else:
+    _concurrency = 1
+
+# Supabase-Pool an die Parallelität pro Worker anpassen (vor dem Import der App);
+# mehr als 50 Verbindungen pro Worker bringen gegenüber PostgREST nichts
+os.environ.setdefault('SUPABASE_POOL_SIZE', str(max(10, min(_concurrency, 50))))
+
+# Metering: jeder Worker bucht höchstens seinen Anteil am Kontostand ab, ohne sich abzustimmen
+os.environ.setdefault('METERING_WORKERS', str(workers))
+
+# Jeder offene /user-info/stream belegt einen Thread: höchstens die Hälfte der Threads,
+# damit normale Requests nicht verhungern; sync-Worker nehmen keine Streams an
+os.environ.setdefault('USER_STREAM_MAX_CONNECTIONS', str(_concurrency // 2 if worker_class == 'gthread' else 0))
+
+def when_ready(server):
+    # Tatsächliche Werte inkl. Kommandozeilen-Optionen
+    cfg = server.cfg
+    kind = cfg.worker_class_str
+    concurrency = cfg.threads if kind == 'gthread' else 1
+    server.log.info(
+        'Zyrix: %s Worker (%s, %s gleichzeitige Requests pro Worker) bei %s Kernen und %s MB Speicher',
+        cfg.workers, kind, concurrency, _cores, _memory if _memory else '?'
+    )
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,80 @@
+import os
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 'auto' (orjson, falls installiert), 'orjson' oder 'stdlib'
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto').lower()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask-JSON-Provider auf Basis von orjson.
+
+    Ausgabe wie beim Standard-Provider (sortierte Schlüssel, kompakt,
+    Datumswerte als HTTP-Datum), nur Nicht-ASCII-Zeichen werden als UTF-8
+    statt als \\u-Escape geschrieben. Was orjson nicht kodieren kann (z.B.
+    Ganzzahlen über 64 Bit) und Aufrufe mit json.dumps-Argumenten gehen an
+    den Standard-Provider.
+    """
+
+    name = 'orjson'
+
+    def _options(self, indent):
+        # Datumswerte an default (Flask: HTTP-Datum) statt orjsons ISO-Format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, indent=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            if indent:
+                return super().dumps(obj, indent=2).encode('utf-8')
+            return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+class StdlibProvider(DefaultJSONProvider):
+    name = 'stdlib'
+
+def init_app(app, provider=JSON_PROVIDER):
+    """JSON-Provider der App setzen, liefert den Namen des verwendeten Encoders"""
+    if provider == 'orjson' and orjson is None:
+        print("JSON_PROVIDER=orjson, aber orjson ist nicht installiert - verwende stdlib")
+    use_orjson = orjson is not None and provider in ('auto', 'orjson')
+    app.json = OrjsonProvider(app) if use_orjson else StdlibProvider(app)
+    return app.json.name
+
+class StaticJSON:
+    """Konstante JSON-Antwort, einmal serialisiert und danach als fertige Bytes ausgeliefert"""
+
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+        self._body = None
+
+    def response(self):
+        # Serialisiert wird beim ersten Abruf mit dem Provider der App (gleiche Ausgabe wie jsonify)
+        if self._body is None:
+            self._body = current_app.json.response(self.payload).get_data()
+        return current_app.response_class(self._body, status=self.status, mimetype=current_app.json.mimetype)
@@ -0,0 +1,100 @@
+import os
+import json
+import hmac
+import time
+import base64
+import hashlib
+
+# Format der Links in Bestätigungs- und Reset-E-Mails: 'signed' (zustandslos) oder 'database' (bisher)
+LINK_TOKEN_FORMAT = os.environ.get('LINK_TOKEN_FORMAT', 'signed').lower()
+# Gültigkeit in Sekunden
+LINK_TOKEN_VERIFY_TTL = int(os.environ.get('LINK_TOKEN_VERIFY_TTL', 7 * 24 * 3600))
+LINK_TOKEN_RESET_TTL = int(os.environ.get('LINK_TOKEN_RESET_TTL', 24 * 3600))
+
+PURPOSE_VERIFY = 'verify'
+PURPOSE_RESET = 'reset'
+
+class InvalidLinkToken(Exception):
+    """Signatur, Format oder Zweck passen nicht"""
+
+class ExpiredLinkToken(InvalidLinkToken):
+    """Token ist korrekt signiert, aber abgelaufen"""
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def is_signed(token):
+    # Datenbank-Tokens (secrets.token_urlsafe) enthalten keinen Punkt
+    return '.' in token
+
+class LinkTokenSigner:
+    """Selbstbeschreibende, HMAC-signierte Tokens für E-Mail-Links.
+
+    Der Token trägt User-ID, Zweck, Ablaufzeit und optional den
+    Fingerabdruck des Passwort-Hashs. Ungültige und abgelaufene Links werden
+    ohne Datenbankzugriff abgewiesen; ein Reset-Token wird mit dem neuen
+    Passwort-Hash automatisch ungültig.
+
+    Der Fingerabdruck ist ein HMAC mit eigenem Schlüssel: Wer den Link
+    liest, kann daraus den Hash (und bei alten SHA-256-Hashes ohne Salt das
+    Passwort) nicht offline erraten. Geprüft wird er nur in der App.
+    """
+
+    def __init__(self, secret):
+        # Eigene Schlüssel, getrennt vom JWT-Schlüssel
+        self._key = hmac.new(secret.encode('utf-8'), b'zyrix-link-tokens', hashlib.sha256).digest()
+        self._fingerprint_key = hmac.new(secret.encode('utf-8'), b'zyrix-password-fingerprint',
+                                         hashlib.sha256).digest()
+
+    def _signature(self, payload):
+        return _b64encode(hmac.new(self._key, payload.encode('ascii'), hashlib.sha256).digest())
+
+    def fingerprint(self, password_hash):
+        """Fingerabdruck des Passwort-Hashs für Reset-Links (HMAC, 16 Bytes)"""
+        digest = hmac.new(self._fingerprint_key, (password_hash or '').encode('utf-8'), hashlib.sha256).digest()
+        return _b64encode(digest[:16])
+
+    def matches_fingerprint(self, fingerprint, password_hash):
+        """True, wenn der Fingerabdruck aus dem Link zum aktuellen Passwort-Hash passt"""
+        if not isinstance(fingerprint, str):
+            return False
+        expected = self.fingerprint(password_hash)
+        return hmac.compare_digest(fingerprint.encode('ascii', 'replace'), expected.encode('ascii'))
+
+    def sign(self, purpose, user_id, ttl, fingerprint=None):
+        claims = {'p': purpose, 'u': user_id, 'e': int(time.time() + ttl)}
+        if fingerprint is not None:
+            claims['f'] = fingerprint
+        payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return f'{payload}.{self._signature(payload)}'
+
+    def verify(self, token, purpose):
+        """Liefert die Claims {'p', 'u', 'e', 'f'} oder wirft InvalidLinkToken/ExpiredLinkToken"""
+        payload, _, signature = token.partition('.')
+        if not payload or not signature:
+            raise InvalidLinkToken('Format')
+        try:
+            expected = self._signature(payload)
+        except UnicodeEncodeError:
+            # Nicht-ASCII im Link kann nie von uns signiert worden sein
+            raise InvalidLinkToken('Format')
+        if not hmac.compare_digest(signature.encode('ascii', 'replace'), expected.encode('ascii')):
+            raise InvalidLinkToken('Signatur')
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidLinkToken('Format')
+        if claims.get('p') != purpose:
+            raise InvalidLinkToken('Zweck')
+        if claims.get('e', 0) < time.time():
+            raise ExpiredLinkToken('abgelaufen')
+        return claims
+
+    def verification_token(self, user_id):
+        return self.sign(PURPOSE_VERIFY, user_id, LINK_TOKEN_VERIFY_TTL)
+
+    def reset_token(self, user_id, password_hash):
+        return self.sign(PURPOSE_RESET, user_id, LINK_TOKEN_RESET_TTL, self.fingerprint(password_hash))
@@ -0,0 +1,313 @@
+import os
+import re
+import html
+import threading
+from static_pages import StaticPage, minify_html
+
+# Sprachen der E-Mails und der Bestätigungsseite
+MAIL_LOCALES = ('de', 'en')
+MAIL_DEFAULT_LOCALE = os.environ.get('MAIL_DEFAULT_LOCALE', 'de').strip().lower()
+if MAIL_DEFAULT_LOCALE not in MAIL_LOCALES:
+    # Sonst scheitert jede E-Mail ohne passende Accept-Language an einer fehlenden Vorlage
+    print(f"MAIL_DEFAULT_LOCALE={MAIL_DEFAULT_LOCALE!r} nicht unterstützt ({', '.join(MAIL_LOCALES)}), "
+          f"verwende {MAIL_LOCALES[0]}")
+    MAIL_DEFAULT_LOCALE = MAIL_LOCALES[0]
+
+# {{ name }}: pro Nachricht ersetzt (HTML-escaped); [[ name ]]: Sprachtext, beim Kompilieren eingesetzt
+_SLOT = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+_TEXT = re.compile(r'\[\[\s*(\w+)\s*\]\]')
+
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_CSS_RULE = re.compile(r'([^{}]+)\{([^}]*)\}')
+_SIMPLE_SELECTOR = re.compile(r'^\.?[a-zA-Z][\w-]*$')
+_START_TAG = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>')
+_CLASS_ATTR = re.compile(r'\sclass="([^"]*)"')
+_STYLE_ATTR = re.compile(r'\sstyle="([^"]*)"')
+
+_HEAD = re.compile(r'<head>.*?</head>', re.S | re.I)
+_LINK = re.compile(r'<a\s[^>]*?href="([^"]*)"[^>]*>(.*?)</a>', re.S | re.I)
+_LINE_BREAK = re.compile(r'<br\s*/?>', re.I)
+_BLOCK_END = re.compile(r'</(?:p|div|h[1-6]|li|tr)>', re.I)
+_TAG = re.compile(r'<[^>]+>')
+
+def inline_css(source):
+    """Regeln aus <style> als style-Attribute an die Elemente schreiben und den Block entfernen.
+
+    Unterstützt Tag- und .klasse-Selektoren (mehr nutzen die Vorlagen
+    nicht); andere Selektoren sind ein Fehler in der Vorlage. Vorhandene
+    style-Attribute stehen zuletzt und behalten damit Vorrang.
+    """
+    rules = {}
+    for block in _STYLE_BLOCK.findall(source):
+        for selectors, declarations in _CSS_RULE.findall(block):
+            declarations = ' '.join(declarations.split()).strip().rstrip(';').replace('"', "'")
+            for selector in selectors.split(','):
+                selector = selector.strip()
+                if not _SIMPLE_SELECTOR.match(selector):
+                    raise ValueError(f'CSS-Selektor wird nicht unterstützt: {selector}')
+                rules.setdefault(selector.lower(), []).append(declarations)
+    source = _STYLE_BLOCK.sub('', source)
+
+    def inline(match):
+        tag, attrs, closing = match.group(1), match.group(2) or '', match.group(3)
+        declarations = list(rules.get(tag.lower(), ()))
+        class_match = _CLASS_ATTR.search(attrs)
+        if class_match:
+            for name in class_match.group(1).split():
+                declarations.extend(rules.get('.' + name.lower(), ()))
+            attrs = _CLASS_ATTR.sub('', attrs)
+        if declarations:
+            style_match = _STYLE_ATTR.search(attrs)
+            if style_match:
+                declarations.append(style_match.group(1).strip().rstrip(';'))
+                attrs = _STYLE_ATTR.sub('', attrs)
+            attrs += ' style="' + '; '.join(declarations) + '"'
+        return f'<{tag}{attrs}{closing}>'
+
+    return _START_TAG.sub(inline, source)
+
+def _link_text(match):
+    href, label = match.group(1), _TAG.sub('', match.group(2)).strip()
+    if href.startswith('mailto:'):
+        href = href[len('mailto:'):]
+    if not label or label == href:
+        return href
+    # Link in eigener Zeile, damit Mail-Programme ihn vollständig erkennen
+    return f'{label}:\n{href}'
+
+def html_to_text(source):
+    """Text-Fassung einer HTML-Vorlage: Links ausgeschrieben, Absätze durch Leerzeilen getrennt"""
+    # Zeilenumbrüche im Quelltext sind nur Leerraum, Umbrüche entstehen aus <br> und Blockelementen
+    text = ' '.join(_HEAD.sub('', source).split())
+    text = _LINK.sub(_link_text, text)
+    text = _LINE_BREAK.sub('\n', text)
+    text = _BLOCK_END.sub('\n\n', text)
+    text = html.unescape(_TAG.sub('', text))
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip() + '\n'
+
+class Template:
+    """Vorlage, deren statische Teile einmal vorbereitet sind; render() setzt nur die Platzhalter ein"""
+
+    def __init__(self, source, escape=True):
+        # Abwechselnd statischer Text und Platzhaltername
+        self._parts = _SLOT.split(source)
+        self.slots = frozenset(self._parts[1::2])
+        self.escape = escape
+
+    def render(self, values):
+        parts = self._parts[:]
+        for index in range(1, len(parts), 2):
+            value = str(values[parts[index]])
+            parts[index] = html.escape(value, quote=True) if self.escape else value
+        return ''.join(parts)
+
+class CompiledMail:
+    """E-Mail in einer Sprache: Betreff, HTML mit Inline-CSS und Text-Fassung"""
+
+    def __init__(self, subject, source):
+        html_source = minify_html(inline_css(source))
+        self.subject = subject
+        self.html = Template(html_source)
+        # Text-Fassung: Platzhalter unverändert, beim Rendern nicht escaped
+        self.text = Template(html_to_text(html_source), escape=False)
+
+    def render(self, values):
+        """Liefert (Betreff, HTML, Text)"""
+        return self.subject, self.html.render(values), self.text.render(values)
+
+_MAIL_LAYOUT = """
+<!DOCTYPE html>
+<html lang="[[lang]]">
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body { font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; }
+        .container { max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 10px rgba(0,0,0,0.1); }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; }
+        .logo { font-size: 2.5rem; font-weight: 800; color: #FF9900; margin-bottom: 10px; }
+        .content { padding: 30px; }
+        .button { display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin: 20px 0; }
+        .footer { background: #f8f9fa; padding: 20px; font-size: 12px; color: #666; border-top: 1px solid #eee; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="logo">Zyrix</div>
+            <h2>[[heading]]</h2>
+        </div>
+        <div class="content">
+            <h3>[[greeting]]</h3>
+            [[intro]]
+            <div style="text-align: center;">
+                <a href="{{ link }}" class="button">[[button]]</a>
+            </div>
+            [[notes]]
+            <p>[[contact]] <a href="mailto:support@zyrix.de">support@zyrix.de</a></p>
+        </div>
+        <div class="footer">
+            <strong>Zyrix.de</strong><br>
+            [[owner]]: Marc Netzer<br>
+            [[address]]<br>
+            [[email_label]]: support@zyrix.de | Website: www.zyrix.de<br>
+            [[vat_label]]: DE327892859
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Texte für alle E-Mails; Sprachtexte dürfen HTML und {{ platzhalter }} enthalten
+_COMMON_TEXTS = {
+    'de': {
+        'lang': 'de',
+        'greeting': 'Hallo {{ name }}!',
+        'contact': 'Bei Fragen erreichen Sie uns unter:',
+        'owner': 'Inhaber',
+        'address': 'Mürmeln 77, 41363 Jüchen, Deutschland',
+        'email_label': 'E-Mail',
+        'vat_label': 'USt-IdNr.'
+    },
+    'en': {
+        'lang': 'en',
+        'greeting': 'Hello {{ name }}!',
+        'contact': 'If you have any questions, contact us at:',
+        'owner': 'Owner',
+        'address': 'Mürmeln 77, 41363 Jüchen, Germany',
+        'email_label': 'Email',
+        'vat_label': 'VAT ID'
+    }
+}
+
+MAIL_TEXTS = {
+    'verification': {
+        'de': {
+            'subject': 'Zyrix.de - E-Mail-Adresse bestätigen',
+            'heading': 'E-Mail-Adresse bestätigen',
+            'intro': '<p>Vielen Dank für Ihre Registrierung bei Zyrix.de!</p>'
+                     '<p>Um Ihr Konto zu aktivieren und Ihre <strong>1200 kostenlosen Test-Tokens</strong> '
+                     'zu erhalten, bestätigen Sie bitte Ihre E-Mail-Adresse:</p>',
+            'button': '✅ E-Mail-Adresse bestätigen',
+            'notes': '<p><strong>Wichtig:</strong> Ohne Bestätigung können Sie sich nicht anmelden und haben '
+                     'keinen Zugriff auf die Zyrix-Tools.</p>'
+                     '<p>Falls Sie sich nicht bei Zyrix registriert haben, ignorieren Sie diese E-Mail einfach.</p>'
+        },
+        'en': {
+            'subject': 'Zyrix.de - Confirm your email address',
+            'heading': 'Confirm your email address',
+            'intro': '<p>Thank you for registering with Zyrix.de!</p>'
+                     '<p>To activate your account and receive your <strong>1200 free trial tokens</strong>, '
+                     'please confirm your email address:</p>',
+            'button': '✅ Confirm email address',
+            'notes': '<p><strong>Important:</strong> Without confirmation you cannot log in and have no access '
+                     'to the Zyrix tools.</p>'
+                     '<p>If you did not register with Zyrix, simply ignore this email.</p>'
+        }
+    },
+    'password_reset': {
+        'de': {
+            'subject': 'Zyrix.de - Passwort zurücksetzen',
+            'heading': 'Passwort zurücksetzen',
+            'intro': '<p>Sie haben eine Anfrage zum Zurücksetzen Ihres Passworts gestellt.</p>'
+                     '<p>Klicken Sie auf den folgenden Link, um ein neues Passwort zu erstellen:</p>',
+            'button': '🔑 Neues Passwort erstellen',
+            'notes': '<p><strong>Wichtig:</strong> Dieser Link ist nur 24 Stunden gültig.</p>'
+                     '<p>Falls Sie diese Anfrage nicht gestellt haben, ignorieren Sie diese E-Mail einfach.</p>'
+        },
+        'en': {
+            'subject': 'Zyrix.de - Reset your password',
+            'heading': 'Reset your password',
+            'intro': '<p>You have requested to reset your password.</p>'
+                     '<p>Click the following link to create a new password:</p>',
+            'button': '🔑 Create new password',
+            'notes': '<p><strong>Important:</strong> This link is only valid for 24 hours.</p>'
+                     '<p>If you did not make this request, simply ignore this email.</p>'
+        }
+    }
+}
+
+_VERIFY_SUCCESS_SOURCE = """
+<!DOCTYPE html>
+<html lang="[[lang]]">
+<head>
+    <meta charset="UTF-8">
+    <title>[[title]]</title>
+    <style>
+        body { font-family: 'Poppins', Arial, sans-serif; margin: 0; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; display: flex; align-items: center; justify-content: center; }
+        .container { background: white; border-radius: 20px; padding: 40px; text-align: center; box-shadow: 0 20px 40px rgba(0,0,0,0.1); max-width: 500px; }
+        .logo { font-size: 3rem; font-weight: 800; color: #FF9900; margin-bottom: 20px; }
+        .success { color: #28a745; font-size: 1.2rem; margin-bottom: 20px; }
+        .button { display: inline-block; background: linear-gradient(135deg, #FF9900 0%, #FF6600 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="logo">Zyrix</div>
+        <div class="success">[[success]]</div>
+        [[body]]
+        <a href="https://zyrix-dahboard.onrender.com" class="button">[[button]]</a>
+    </div>
+</body>
+</html>
+"""
+
+VERIFY_SUCCESS_TEXTS = {
+    'de': {
+        'lang': 'de',
+        'title': 'E-Mail bestätigt - Zyrix',
+        'success': '✅ E-Mail-Adresse erfolgreich bestätigt!',
+        'body': '<p>Ihr Konto ist jetzt aktiviert und Sie haben <strong>1200 Test-Tokens</strong> erhalten.</p>'
+                '<p>Sie können sich jetzt anmelden und alle Zyrix-Tools nutzen.</p>',
+        'button': '🚀 Zum Zyrix Dashboard'
+    },
+    'en': {
+        'lang': 'en',
+        'title': 'Email confirmed - Zyrix',
+        'success': '✅ Email address confirmed successfully!',
+        'body': '<p>Your account is now active and you have received <strong>1200 trial tokens</strong>.</p>'
+                '<p>You can now log in and use all Zyrix tools.</p>',
+        'button': '🚀 Go to the Zyrix dashboard'
+    }
+}
+
+def _localize(source, texts):
+    return _TEXT.sub(lambda match: texts[match.group(1)], source)
+
+def _locale(locale):
+    return locale if locale in MAIL_LOCALES else MAIL_DEFAULT_LOCALE
+
+# Kompiliert wird pro (Vorlage, Sprache) beim ersten Gebrauch, nicht beim Import
+_compiled = {}
+_compile_lock = threading.Lock()
+
+def _cached(key, build):
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _compile_lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                compiled = _compiled[key] = build()
+    return compiled
+
+def get_mail(template, locale=None):
+    """Kompilierte E-Mail-Vorlage (verification, password_reset) in der gewünschten Sprache"""
+    locale = _locale(locale)
+
+    def build():
+        texts = dict(_COMMON_TEXTS[locale], **MAIL_TEXTS[template][locale])
+        return CompiledMail(texts['subject'], _localize(_MAIL_LAYOUT, texts))
+
+    return _cached((template, locale), build)
+
+def render_mail(template, locale=None, **values):
+    """E-Mail rendern, liefert (Betreff, HTML, Text)"""
+    return get_mail(template, locale).render(values)
+
+def verify_success_page(locale=None):
+    """Erfolgsseite nach der E-Mail-Bestätigung als StaticPage (CSS bleibt im <style>-Block)"""
+    locale = _locale(locale)
+    # max-age=0: der Link löst eine Aktivierung aus und soll nicht aus Zwischenspeichern kommen
+    return _cached(('verify_success', locale), lambda: StaticPage(
+        _localize(_VERIFY_SUCCESS_SOURCE, VERIFY_SUCCESS_TEXTS[locale]), max_age=0,
+        vary='Accept-Encoding, Accept-Language'))
@@ -0,0 +1,561 @@
+import os
+import json
+import time
+import atexit
+import socket
+import sqlite3
+import secrets
+import threading
+from cache import TTLCache
+
+# Metering Konfiguration
+METERING_FLUSH_INTERVAL = float(os.environ.get('METERING_FLUSH_INTERVAL', 1))
+# Nach so vielen Sekunden ohne eigene Buchungen wird der Kontostand neu aus Supabase gelesen
+METERING_RECONCILE_INTERVAL = float(os.environ.get('METERING_RECONCILE_INTERVAL', 30))
+METERING_MAX_BATCH = int(os.environ.get('METERING_MAX_BATCH', 500))
+METERING_MAX_DEBIT = int(os.environ.get('METERING_MAX_DEBIT', 10000))
+METERING_IDEMPOTENCY_SIZE = int(os.environ.get('METERING_IDEMPOTENCY_SIZE', 100000))
+METERING_IDEMPOTENCY_TTL = float(os.environ.get('METERING_IDEMPOTENCY_TTL', 24 * 3600))
+# Anzahl der Worker, die gleichzeitig für denselben Benutzer abbuchen können (gunicorn.conf.py setzt sie).
+# Jeder Worker darf zwischen zwei Abgleichen nur seinen Anteil des Kontostands ausgeben.
+METERING_WORKERS = max(1, int(os.environ.get('METERING_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1))
+# Journal der noch nicht geschriebenen Abbuchungen (übersteht den Absturz eines Workers)
+METERING_JOURNAL_PATH = os.environ.get('METERING_JOURNAL_PATH', 'metering.sqlite3')
+# Abbuchungen eines Workers, der sich so lange nicht gemeldet hat, übernimmt ein anderer
+METERING_JOURNAL_LEASE = float(os.environ.get('METERING_JOURNAL_LEASE', 300))
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS debits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    idempotency_key TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS debits_owner ON debits (owner);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+"""
+
+class InsufficientTokens(Exception):
+    def __init__(self, available):
+        super().__init__(f'nur {available} Tokens verfügbar')
+        self.available = available
+
+class DebitJournal:
+    """Lokales SQLite-Journal der Abbuchungen, die noch nicht in Supabase stehen.
+
+    Jede Abbuchung wird vor der Antwort eingetragen und nach dem Flush wieder
+    gelöscht. Alle Worker eines Hosts teilen sich die Datei; jeder meldet sich
+    bei jedem Flush (owners). Einträge eines Workers, der sich länger als
+    lease_seconds nicht gemeldet hat (abgestürzt, SIGKILL), übernimmt ein
+    anderer transaktional und schreibt sie nach.
+    """
+
+    def __init__(self, path, lease_seconds=METERING_JOURNAL_LEASE, owner=None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._fixed_owner = owner
+        self._owner = None
+        self._owner_pid = None
+        self._local = threading.local()
+        self._registered = None
+
+    @property
+    def owner(self):
+        """Kennung dieses Prozesses im Journal.
+
+        Zufällig pro Prozess: ein neuer Worker mit wiederverwendeter PID darf
+        nicht die Einträge seines abgestürzten Vorgängers als eigene melden.
+        """
+        if self._fixed_owner:
+            return self._fixed_owner
+        if self._owner_pid != os.getpid():
+            self._owner = f'{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}'
+            self._owner_pid = os.getpid()
+        return self._owner
+
+    def _connect(self):
+        # Eine Verbindung pro Thread und Prozess (append liegt auf dem Request-Pfad)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Übersteht den Absturz des Prozesses, nur nicht den des Rechners
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(JOURNAL_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def heartbeat(self):
+        """Diesen Worker als lebend melden"""
+        self._connect().execute(
+            'INSERT INTO owners (owner, seen_at) VALUES (?, ?) '
+            'ON CONFLICT (owner) DO UPDATE SET seen_at = excluded.seen_at',
+            (self.owner, time.time())
+        )
+        self._registered = self.owner
+
+    def append(self, user_id, amount, idempotency_key=None):
+        """Abbuchung eintragen, liefert die Journal-ID"""
+        if self._registered != self.owner:
+            # Vor dem ersten Eintrag melden, sonst gilt er sofort als verwaist
+            self.heartbeat()
+        cursor = self._connect().execute(
+            'INSERT INTO debits (owner, user_id, amount, idempotency_key, created_at) VALUES (?, ?, ?, ?, ?)',
+            (self.owner, json.dumps(user_id), amount, idempotency_key, time.time())
+        )
+        return cursor.lastrowid
+
+    def remove(self, ids):
+        if ids:
+            self._connect().executemany('DELETE FROM debits WHERE id = ?', [(i, ) for i in ids])
+
+    def adopt(self):
+        """Einträge verwaister Worker übernehmen, liefert [(id, user_id, amount, idempotency_key), ...]"""
+        self.heartbeat()
+        conn = self._connect()
+        cutoff = time.time() - self.lease_seconds
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, user_id, amount, idempotency_key FROM debits '
+                'WHERE owner NOT IN (SELECT owner FROM owners WHERE seen_at >= ?) ORDER BY id',
+                (cutoff, )
+            ).fetchall()
+            conn.executemany('UPDATE debits SET owner = ? WHERE id = ?', [(self.owner, row[0]) for row in rows])
+            conn.execute('DELETE FROM owners WHERE seen_at < ?', (cutoff, ))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [(row_id, json.loads(user_id), amount, key) for row_id, user_id, amount, key in rows]
+
+    def count(self):
+        return self._connect().execute('SELECT COUNT(*) FROM debits').fetchone()[0]
+
+class _Account:
+    __slots__ = ('lock', 'balance', 'pending', 'pending_events', 'keyed', 'keyed_amount', 'in_flight',
+                 'journal_ids', 'last_synced', 'retired')
+
+    def __init__(self, balance):
+        self.lock = threading.Lock()
+        # Zuletzt von Supabase gemeldeter Kontostand
+        self.balance = balance
+        # Noch nicht geschriebene Abbuchungen ohne bzw. mit Idempotency-Key
+        self.pending = 0
+        self.pending_events = 0
+        self.keyed = []
+        self.keyed_amount = 0
+        # Gerade an Supabase übergebene Abbuchungen
+        self.in_flight = 0
+        # Journal-IDs der noch nicht geschriebenen Abbuchungen
+        self.journal_ids = []
+        self.last_synced = time.monotonic()
+        # Von reconcile() verworfen; neue Abbuchungen gehen an ein frisch geladenes Konto
+        self.retired = False
+
+    @property
+    def outstanding(self):
+        return self.pending + self.keyed_amount + self.in_flight
+
+    @property
+    def available(self):
+        return self.balance - self.outstanding
+
+    def headroom(self, workers):
+        """Was dieser Worker bis zum nächsten Abgleich noch abbuchen darf"""
+        # Aufgerundet, damit auch kleine Kontostände nutzbar bleiben
+        return -(-max(self.balance, 0) // workers) - self.outstanding
+
+def _entry_amount(entry):
+    return entry['amount'] + sum(item['amount'] for item in entry['keyed'])
+
+def _journal_entries(rows):
+    """Journal-Zeilen zu Ledger-Einträgen pro Benutzer zusammenfassen, liefert [(entry, ids), ...]"""
+    grouped = {}
+    for row_id, user_id, amount, key in rows:
+        entry, ids = grouped.setdefault(user_id, ({'user_id': user_id, 'amount': 0, 'count': 0, 'keyed': []}, []))
+        if key is None:
+            entry['amount'] += amount
+            entry['count'] += 1
+        else:
+            entry['keyed'].append({'key': key, 'amount': amount})
+        ids.append(row_id)
+    return list(grouped.values())
+
+class TokenMeter:
+    """Token-Abbuchungen mit Write-Behind-Ledger.
+
+    Abbuchungen werden pro Benutzer im Speicher gegen den zuletzt bekannten
+    Kontostand geprüft und gesammelt. Ein Hintergrund-Thread schreibt sie
+    periodisch mit einem Aufruf pro Batch als Ledger-Einträge (Postgres-
+    Funktion apply_token_debits) und übernimmt den neuen Kontostand.
+    Idempotency-Keys werden lokal und in Supabase dedupliziert.
+
+    Da jeder Worker nur seinen eigenen Stand kennt, bucht er zwischen zwei
+    Abgleichen höchstens 1/workers des Kontostands im Speicher ab; zusammen
+    bleiben alle Worker so im Guthaben. Reicht der Anteil nicht, weckt der
+    Worker den Flush-Thread und liest nur den Kontostand neu. Reicht er auch
+    danach nicht, wird diese Abbuchung synchron und atomar gebucht
+    (apply_token_debits mit strict), zusammen mit den offenen Abbuchungen
+    des Kontos, damit Supabase sie beim Prüfen mitzählt. Mit journal landet
+    jede Abbuchung vor der Antwort in einem lokalen SQLite-Journal
+    (DebitJournal) und geht bei einem Absturz nicht verloren.
+    """
+
+    def __init__(self, load_balance, apply_debits, flush_interval=METERING_FLUSH_INTERVAL,
+                 reconcile_interval=METERING_RECONCILE_INTERVAL, max_batch=METERING_MAX_BATCH,
+                 on_flushed=None, workers=METERING_WORKERS, journal=None):
+        # load_balance(user_id) -> int oder None
+        # apply_debits(entries, source, strict=False) -> [{'user_id', 'balance', 'applied', 'shortfall'}, ...];
+        # mit strict ganz oder gar nicht, abgelehnte Einträge tragen 'rejected'
+        self.load_balance = load_balance
+        self.apply_debits = apply_debits
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self.max_batch = max_batch
+        # on_flushed(user_id) nach jedem geschriebenen Eintrag (z.B. Cache verwerfen)
+        self.on_flushed = on_flushed
+        self.workers = workers
+        self.journal = journal
+
+        self._accounts = {}
+        self._accounts_lock = threading.Lock()
+        self._replies = TTLCache(METERING_IDEMPOTENCY_SIZE, METERING_IDEMPOTENCY_TTL)
+        self._flush_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        # Aus dem Journal übernommene Abbuchungen, deren Flush noch aussteht: [(entry, ids), ...]
+        self._adopted = []
+
+        # Kennzahlen dieses Prozesses
+        self.debits = 0
+        self.rejected = 0
+        self.refreshes = 0
+        self.sync_debits = 0
+        self.recovered = 0
+        self.replays = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.ledger_entries = 0
+        self.shortfall = 0
+
+    def _account(self, user_id):
+        account = self._accounts.get(user_id)
+        if account is not None:
+            return account
+        balance = self.load_balance(user_id)
+        if balance is None:
+            return None
+        with self._accounts_lock:
+            return self._accounts.setdefault(user_id, _Account(balance))
+
+    def _replay(self, reply_key):
+        reply = self._replies.get(reply_key)
+        if reply is None:
+            return None
+        self.replays += 1
+        return dict(reply, replayed=True)
+
+    def consume(self, user_id, amount, idempotency_key=None):
+        """Tokens abbuchen; liefert {'consumed', 'tokens', 'replayed'} oder None (unbekannter Benutzer).
+
+        Wirft InsufficientTokens, wenn der Kontostand nicht reicht. Ein
+        wiederholter Aufruf mit demselben Idempotency-Key liefert die erste
+        Antwort erneut, ohne nochmals abzubuchen.
+        """
+        reply_key = (user_id, idempotency_key)
+        if idempotency_key is not None:
+            reply = self._replay(reply_key)
+            if reply is not None:
+                return reply
+
+        refreshed = False
+        while True:
+            account = self._account(user_id)
+            if account is None:
+                return None
+            with account.lock:
+                if account.retired:
+                    continue
+                if idempotency_key is not None:
+                    # Wiederholung, die parallel zur ersten Anfrage angekommen ist
+                    reply = self._replay(reply_key)
+                    if reply is not None:
+                        return reply
+                if amount <= account.headroom(self.workers):
+                    self._book(user_id, account, amount, idempotency_key)
+                    reply = {'consumed': amount, 'tokens': account.available}
+                    if idempotency_key is not None:
+                        self._replies.set(reply_key, reply)
+                    self.debits += 1
+                    return dict(reply, replayed=False)
+                # Höchstens ein Abgleich pro Flush-Intervall, auch wenn der Benutzer weiter abbucht
+                synced = refreshed or time.monotonic() - account.last_synced < self.flush_interval
+                if synced and amount > account.available:
+                    self.rejected += 1
+                    raise InsufficientTokens(max(account.available, 0))
+            if synced:
+                return self._debit_now(user_id, account, amount, idempotency_key)
+            refreshed = True
+            self._refresh(user_id, account)
+
+    def _book(self, user_id, account, amount, idempotency_key):
+        """Abbuchung vormerken (account.lock gehalten), zuerst im Journal"""
+        if self.journal is not None:
+            account.journal_ids.append(self.journal.append(user_id, amount, idempotency_key))
+        if idempotency_key is None:
+            account.pending += amount
+            account.pending_events += 1
+        else:
+            account.keyed.append((idempotency_key, amount))
+            account.keyed_amount += amount
+
+    def _refresh(self, user_id, account):
+        """Flush-Thread wecken und nur den Kontostand neu aus Supabase lesen"""
+        self.refreshes += 1
+        self._wakeup.set()
+        synced = account.last_synced
+        balance = self.load_balance(user_id)
+        if balance is None:
+            return
+        with account.lock:
+            # Ein Flush war schneller und hat einen neueren Stand übernommen
+            if account.last_synced == synced:
+                account.balance = balance
+                account.last_synced = time.monotonic()
+
+    def _debit_now(self, user_id, account, amount, idempotency_key):
+        """Abbuchung über den Anteil hinaus synchron und atomar buchen (apply_token_debits mit strict)"""
+        reply_key = (user_id, idempotency_key)
+        with self._flush_lock:
+            with account.lock:
+                if idempotency_key is not None:
+                    reply = self._replay(reply_key)
+                    if reply is not None:
+                        return reply
+                taken = self._take_account(user_id, account)
+            entry, ids = taken or ({'user_id': user_id, 'amount': 0, 'count': 0, 'keyed': []}, [])
+            request = dict(entry, keyed=list(entry['keyed']))
+            if idempotency_key is None:
+                request['amount'] += amount
+                request['count'] += 1
+            else:
+                request['keyed'].append({'key': idempotency_key, 'amount': amount})
+            try:
+                results = self.apply_debits([request], self._source(), strict=True) or []
+            except Exception:
+                self.flush_errors += 1
+                if taken:
+                    self._restore([taken])
+                raise
+            result = next((result for result in results if result['user_id'] == user_id), None)
+            if result is not None and result.get('rejected'):
+                if taken:
+                    self._restore([taken])
+                with account.lock:
+                    account.balance = result['balance']
+                    account.last_synced = time.monotonic()
+                    available = account.available
+                self.rejected += 1
+                raise InsufficientTokens(max(available, 0))
+            self._settle([(entry, ids)], [result] if result is not None else [], in_flight=taken is not None)
+            if result is None:
+                return None
+            with account.lock:
+                reply = {'consumed': amount, 'tokens': max(account.available, 0)}
+            if idempotency_key is not None:
+                self._replies.set(reply_key, reply)
+            self.debits += 1
+            self.sync_debits += 1
+            return dict(reply, replayed=False)
+
+    def available(self, user_id, default):
+        """Kontostand aus Sicht dieses Workers (inkl. noch nicht geschriebener Abbuchungen)"""
+        account = self._accounts.get(user_id)
+        if account is None:
+            return default
+        with account.lock:
+            return max(account.available, 0)
+
+    # Hintergrund-Flush
+
+    def start(self):
+        """Flush-Thread starten (idempotent, auch nach fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Offene Abbuchungen beim Beenden des Workers noch schreiben
+                atexit.register(self._flush_at_exit)
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='metering-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Vorzeitig geweckt, wenn ein Anteil aufgebraucht ist (_refresh)
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.reconcile()
+            except Exception as e:
+                print(f"Metering Fehler: {e}")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Metering Fehler beim Beenden: {e}")
+
+    def _take_account(self, user_id, account):
+        """Offene Abbuchungen eines Kontos übernehmen (account.lock gehalten), liefert (entry, ids) oder None"""
+        if not account.pending and not account.keyed:
+            return None
+        entry = {
+            'user_id': user_id,
+            'amount': account.pending,
+            'count': account.pending_events,
+            'keyed': [{'key': key, 'amount': amount} for key, amount in account.keyed]
+        }
+        ids = account.journal_ids
+        account.in_flight += account.pending + account.keyed_amount
+        account.pending = 0
+        account.pending_events = 0
+        account.keyed = []
+        account.keyed_amount = 0
+        account.journal_ids = []
+        return entry, ids
+
+    def _take_pending(self):
+        """Offene Abbuchungen aller Konten übernehmen (pending -> in_flight), liefert [(entry, ids), ...]"""
+        entries = []
+        for user_id, account in list(self._accounts.items()):
+            with account.lock:
+                taken = self._take_account(user_id, account)
+            if taken is not None:
+                entries.append(taken)
+        return entries
+
+    def _restore(self, entries):
+        """Nach einem Fehler die Abbuchungen für den nächsten Flush zurücklegen"""
+        for entry, ids in entries:
+            account = self._accounts.get(entry['user_id'])
+            if account is None:
+                continue
+            with account.lock:
+                keyed = [(item['key'], item['amount']) for item in entry['keyed']]
+                account.in_flight -= _entry_amount(entry)
+                account.pending += entry['amount']
+                account.pending_events += entry['count']
+                account.keyed = keyed + account.keyed
+                account.keyed_amount += sum(amount for _, amount in keyed)
+                account.journal_ids = ids + account.journal_ids
+
+    def flush(self):
+        """Gesammelte Abbuchungen als Ledger-Batches schreiben, liefert die Zahl der Einträge"""
+        with self._flush_lock:
+            source = self._source()
+            recovered = self._flush_adopted(source)
+            entries = self._take_pending()
+            for start in range(0, len(entries), self.max_batch):
+                batch = entries[start:start + self.max_batch]
+                try:
+                    results = self.apply_debits([entry for entry, _ in batch], source) or []
+                except Exception:
+                    self.flush_errors += 1
+                    self._restore(entries[start:])
+                    raise
+                self._settle(batch, results)
+            return recovered + len(entries)
+
+    def _source(self):
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _flush_adopted(self, source):
+        """Abbuchungen abgestürzter Worker aus dem Journal nachschreiben"""
+        if self.journal is None:
+            return 0
+        self._adopted.extend(_journal_entries(self.journal.adopt()))
+        written = 0
+        while self._adopted:
+            batch = self._adopted[:self.max_batch]
+            try:
+                results = self.apply_debits([entry for entry, _ in batch], source) or []
+            except Exception:
+                self.flush_errors += 1
+                raise
+            del self._adopted[:len(batch)]
+            self.recovered += sum(len(ids) for _, ids in batch)
+            self._settle(batch, results, in_flight=False)
+            written += len(batch)
+        return written
+
+    def _settle(self, batch, results, in_flight=True):
+        results = {result['user_id']: result for result in results}
+        for entry, ids in batch:
+            if self.journal is not None:
+                self.journal.remove(ids)
+            account = self._accounts.get(entry['user_id'])
+            result = results.get(entry['user_id'])
+            if account is not None:
+                with account.lock:
+                    if in_flight:
+                        account.in_flight -= _entry_amount(entry)
+                    if result is not None:
+                        # Enthält auch die Abbuchungen anderer Worker
+                        account.balance = result['balance']
+                        account.last_synced = time.monotonic()
+            if result is not None:
+                self.shortfall += result.get('shortfall', 0)
+            if self.on_flushed is not None:
+                self.on_flushed(entry['user_id'])
+        self.flushes += 1
+        self.ledger_entries += len(results)
+
+    def reconcile(self):
+        """Konten ohne offene Abbuchungen nach reconcile_interval verwerfen.
+
+        Die nächste Abbuchung liest den Kontostand dann neu aus Supabase und
+        sieht damit auch Buchungen anderer Worker und Gutschriften.
+        """
+        cutoff = time.monotonic() - self.reconcile_interval
+        for user_id, account in list(self._accounts.items()):
+            with account.lock:
+                if account.last_synced >= cutoff or account.pending or account.keyed or account.in_flight:
+                    continue
+                account.retired = True
+            with self._accounts_lock:
+                if self._accounts.get(user_id) is account:
+                    del self._accounts[user_id]
+
+    def stats(self):
+        accounts = list(self._accounts.values())
+        return {
+            'accounts': len(accounts),
+            'debits': self.debits,
+            'rejected': self.rejected,
+            'refreshes': self.refreshes,
+            'sync_debits': self.sync_debits,
+            'idempotent_replays': self.replays,
+            'pending_tokens': sum(account.pending + account.keyed_amount for account in accounts),
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'ledger_entries': self.ledger_entries,
+            'shortfall_tokens': self.shortfall,
+            'recovered_debits': self.recovered,
+            'workers': self.workers,
+            'flush_interval_seconds': self.flush_interval
+        }
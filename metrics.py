@@ -0,0 +1,159 @@
+import os
+import hmac
+import time
+import threading
+from flask import request, g, Response
+from prometheus_client import (Histogram, Gauge, CollectorRegistry, generate_latest,
+                               CONTENT_TYPE_LATEST, REGISTRY)
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Unter gunicorn setzt gunicorn.conf.py PROMETHEUS_MULTIPROC_DIR, dann werden
+# die Werte aller Worker beim Abruf von /metrics zusammengeführt
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+# Optionaler Bearer-Token für /metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Multiprozess-Modus: so oft schreibt jeder Worker seine berechneten Gauges in PROMETHEUS_MULTIPROC_DIR
+METRICS_GAUGE_INTERVAL = float(os.environ.get('METRICS_GAUGE_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'zyrix_http_request_duration_seconds', 'Latenz der HTTP-Requests pro Route',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+SUPABASE_LATENCY = Histogram(
+    'zyrix_supabase_request_duration_seconds', 'Latenz der Supabase-Aufrufe (execute/rpc)',
+    ['table', 'operation', 'result'], buckets=LATENCY_BUCKETS
+)
+SMTP_LATENCY = Histogram(
+    'zyrix_smtp_send_duration_seconds', 'Latenz pro SMTP-Versand',
+    ['result'], buckets=LATENCY_BUCKETS
+)
+
+def observe_supabase(table, operation, seconds, ok=True):
+    SUPABASE_LATENCY.labels(table, operation, 'ok' if ok else 'error').observe(seconds)
+
+def observe_smtp(seconds, ok=True):
+    SMTP_LATENCY.labels('ok' if ok else 'error').observe(seconds)
+
+class _CallbackCollector:
+    """Gauges, die erst beim Abruf berechnet werden (z.B. Outbox-Tiefe)"""
+
+    def __init__(self):
+        self.gauges = []
+
+    def collect(self):
+        for name, documentation, callback, labels in self.gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if labels is None:
+                yield GaugeMetricFamily(name, documentation, value=value)
+                continue
+            # Mit Labels liefert der Callback {(Label-Werte, ...): Wert}
+            family = GaugeMetricFamily(name, documentation, labels=labels)
+            for label_values, sample in value.items():
+                family.add_metric(label_values, sample)
+            yield family
+
+class _GaugePublisher:
+    """Multiprozess-Modus: berechnete Gauges als prometheus-Gauges pro Worker schreiben.
+
+    Der Worker, der /metrics beantwortet, sieht nur seine eigenen Objekte.
+    Deshalb rechnet jeder Worker seine Callbacks alle METRICS_GAUGE_INTERVAL
+    Sekunden in einem Hintergrund-Thread aus und schreibt sie in
+    PROMETHEUS_MULTIPROC_DIR. Beim Abruf führt MultiProcessCollector sie
+    gemäß multiprocess_mode über alle lebenden Worker zusammen (z.B.
+    livesum für Verbindungen, livemax für den Circuit-Zustand).
+    """
+
+    def __init__(self, interval=METRICS_GAUGE_INTERVAL):
+        self.interval = interval
+        self.gauges = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def add(self, name, documentation, callback, labels, multiprocess_mode):
+        gauge = Gauge(name, documentation, labels or (), multiprocess_mode=multiprocess_mode)
+        self.gauges.append((gauge, callback, labels))
+
+    def publish(self):
+        for gauge, callback, labels in self.gauges:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if labels is None:
+                gauge.set(value)
+                continue
+            for label_values, sample in value.items():
+                gauge.labels(*label_values).set(sample)
+
+    def start(self):
+        """Thread starten (idempotent, auch nach fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-gauges', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.publish()
+            time.sleep(self.interval)
+
+_callback_collector = _CallbackCollector()
+_gauge_publisher = _GaugePublisher()
+if not MULTIPROCESS:
+    REGISTRY.register(_callback_collector)
+
+def register_gauge(name, documentation, callback, labels=None, multiprocess_mode='livesum'):
+    """Gauge, deren Wert callback() beim Abruf liefert.
+
+    multiprocess_mode legt fest, wie die Werte der Worker unter gunicorn
+    zusammengeführt werden (livesum, livemax, ...).
+    """
+    if MULTIPROCESS:
+        _gauge_publisher.add(name, documentation, callback, labels, multiprocess_mode)
+    else:
+        _callback_collector.gauges.append((name, documentation, callback, labels))
+
+def init_app(app):
+    """Request-Timing und /metrics an die Flask-App hängen"""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        if MULTIPROCESS:
+            _gauge_publisher.start()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_LATENCY.labels(route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus-Textformat, über alle gunicorn-Worker aggregiert"""
+        auth_header = request.headers.get('Authorization', '')
+        if METRICS_TOKEN and not hmac.compare_digest(auth_header.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        if MULTIPROCESS:
+            # Eigene Werte aktuell, die der anderen Worker höchstens METRICS_GAUGE_INTERVAL alt
+            _gauge_publisher.publish()
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,309 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+
+# Outbox Konfiguration
+OUTBOX_DB_PATH = os.environ.get('OUTBOX_DB_PATH', 'outbox.sqlite3')
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 6))
+OUTBOX_BACKOFF_BASE = float(os.environ.get('OUTBOX_BACKOFF_BASE', 5))
+OUTBOX_BACKOFF_MAX = float(os.environ.get('OUTBOX_BACKOFF_MAX', 900))
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2))
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+# Nachrichten, die länger als das hier im Status "sending" hängen, gehörten zu
+# einem abgestürzten Worker und werden erneut freigegeben
+OUTBOX_LEASE_SECONDS = float(os.environ.get('OUTBOX_LEASE_SECONDS', 120))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html_content TEXT NOT NULL,
+    text_content TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+class Outbox:
+    """Persistente E-Mail-Warteschlange mit Hintergrund-Worker.
+
+    Die Nachrichten liegen in einer lokalen SQLite-Datei und überstehen damit
+    einen Neustart des Workers. Mehrere gunicorn-Worker teilen sich dieselbe
+    Datei; das Abholen (claim) erfolgt transaktional. Ist ein batch_sender
+    gesetzt, werden alle abgeholten Nachrichten in einem Aufruf zugestellt.
+    Beide erhalten (to_email, subject, html_content, text_content);
+    text_content ist None bei Nachrichten ohne Text-Fassung. Liefert
+    available() False (z.B. offener Circuit des SMTP-Servers), holt der
+    Worker nichts ab und verbraucht keine Zustellversuche.
+    """
+
+    def __init__(self, path, sender, batch_sender=None, max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 backoff_base=OUTBOX_BACKOFF_BASE, backoff_max=OUTBOX_BACKOFF_MAX,
+                 poll_interval=OUTBOX_POLL_INTERVAL, batch_size=OUTBOX_BATCH_SIZE,
+                 lease_seconds=OUTBOX_LEASE_SECONDS, available=None):
+        self.path = path
+        self.sender = sender
+        self.batch_sender = batch_sender
+        self.available = available
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._schema_ready = False
+
+        # Kennzahlen dieses Prozesses
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            self._schema_ready = True
+        return conn
+
+    def _migrate(self, conn):
+        # Dateien aus älteren Versionen: Spalte für die Text-Fassung nachrüsten
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(outbox)')}
+        if 'text_content' not in columns:
+            try:
+                conn.execute('ALTER TABLE outbox ADD COLUMN text_content TEXT')
+            except sqlite3.OperationalError as e:
+                # Ein anderer Worker war schneller
+                if 'duplicate column' not in str(e):
+                    raise
+
+    def enqueue(self, to_email, subject, html_content, text_content=None):
+        """Nachricht in die Warteschlange stellen, liefert die Outbox-ID"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO outbox (to_email, subject, html_content, text_content, next_attempt_at, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (to_email, subject, html_content, text_content, now, now)
+            )
+            message_id = cursor.lastrowid
+        finally:
+            conn.close()
+        self.start()
+        self._wakeup.set()
+        return message_id
+
+    def enqueue_many(self, messages, start_at=None, interval=0.0):
+        """Mehrere Nachrichten in einer Transaktion einstellen, liefert den nächsten freien Sendezeitpunkt.
+
+        messages: [(to_email, subject, html_content[, text_content]), ...]. Mit interval > 0
+        wird die Zustellung gedrosselt: die n-te Nachricht wird erst ab
+        start_at + n * interval fällig. Zugestellt wird von den laufenden
+        Outbox-Workern, die dieselbe Datei verwenden.
+        """
+        now = time.time()
+        send_at = max(start_at or now, now)
+        rows = []
+        for message in messages:
+            to_email, subject, html_content = message[:3]
+            text_content = message[3] if len(message) > 3 else None
+            rows.append((to_email, subject, html_content, text_content, send_at, now))
+            send_at += interval
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO outbox (to_email, subject, html_content, text_content, next_attempt_at, '
+                    'created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        return send_at
+
+    def start(self):
+        """Hintergrund-Worker starten (idempotent, auch nach fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                processed = self.process_due()
+            except Exception as e:
+                print(f"Outbox Fehler: {e}")
+                processed = 0
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self, conn, now):
+        """Fällige Nachrichten transaktional für diesen Worker reservieren"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Verwaiste Reservierungen abgestürzter Worker freigeben
+            conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                (now - self.lease_seconds,)
+            )
+            rows = conn.execute(
+                "SELECT id, to_email, subject, html_content, text_content, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, self.batch_size)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                    [(now, row[0]) for row in rows]
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def process_due(self):
+        """Alle fälligen Nachrichten einmal zustellen, liefert die Anzahl"""
+        if self.available is not None and not self.available():
+            return 0
+        conn = self._connect()
+        try:
+            rows = self._claim(conn, time.time())
+            if not rows:
+                return 0
+            outcomes = self._deliver(rows)
+            for row, (ok, error) in zip(rows, outcomes):
+                message_id, to_email, _, _, _, attempts = row
+                if ok:
+                    conn.execute('DELETE FROM outbox WHERE id = ?', (message_id,))
+                    self._sent += 1
+                    continue
+
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                        (attempts, error, message_id)
+                    )
+                    self._failed += 1
+                    print(f"Outbox: Nachricht {message_id} an {to_email} endgültig fehlgeschlagen: {error}")
+                else:
+                    delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+                    # Jitter: nach einem Ausfall nicht alle Nachrichten zum selben Zeitpunkt wiederholen
+                    delay *= random.uniform(0.5, 1.0)
+                    conn.execute(
+                        "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, "
+                        "next_attempt_at = ?, claimed_at = NULL WHERE id = ?",
+                        (attempts, error, time.time() + delay, message_id)
+                    )
+                    self._retried += 1
+            return len(rows)
+        finally:
+            conn.close()
+
+    def _deliver(self, rows):
+        """Nachrichten zustellen, liefert je Nachricht (ok, Fehlertext)"""
+        if self.batch_sender is not None:
+            started = time.perf_counter()
+            try:
+                results = self.batch_sender([row[1:5] for row in rows])
+            except Exception as e:
+                results = [e] * len(rows)
+            elapsed = (time.perf_counter() - started) / len(rows)
+            results = list(results)
+            if len(results) != len(rows):
+                # Ohne eindeutige Zuordnung zählt nur, was eine Position hat; fehlende Nachrichten erneut versuchen
+                print(f"Outbox: Sammelversand lieferte {len(results)} Ergebnisse für {len(rows)} Nachrichten")
+                results = results[:len(rows)] + ['Kein Ergebnis vom Sammelversand'] * (len(rows) - len(results))
+            outcomes = []
+            for result in results:
+                self._record_latency(elapsed)
+                if result is True:
+                    outcomes.append((True, None))
+                else:
+                    outcomes.append((False, str(result) if result else 'Versand fehlgeschlagen'))
+            return outcomes
+
+        outcomes = []
+        for _, to_email, subject, html_content, text_content, _ in rows:
+            started = time.perf_counter()
+            try:
+                ok = self.sender(to_email, subject, html_content, text_content)
+                error = None if ok else 'Versand fehlgeschlagen'
+            except Exception as e:
+                ok = False
+                error = str(e)
+            self._record_latency(time.perf_counter() - started)
+            outcomes.append((ok, error))
+        return outcomes
+
+    def _record_latency(self, seconds):
+        self._latency_last = seconds
+        self._latency_total += seconds
+        if seconds > self._latency_max:
+            self._latency_max = seconds
+
+    def pending_count(self):
+        """Anzahl wartender Nachrichten (alle Worker)"""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Warteschlangentiefe und Versand-Latenzen"""
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        attempts = self._sent + self._failed + self._retried
+        return {
+            'pending': counts.get('pending', 0),
+            'sending': counts.get('sending', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_age_seconds': round(time.time() - oldest, 3) if oldest else 0,
+            'worker': {
+                'pid': os.getpid(),
+                'sent': self._sent,
+                'failed': self._failed,
+                'retried': self._retried,
+                'send_latency_avg_ms': round(self._latency_total / attempts * 1000, 2) if attempts else 0,
+                'send_latency_max_ms': round(self._latency_max * 1000, 2),
+                'send_latency_last_ms': round(self._latency_last * 1000, 2)
+            }
+        }
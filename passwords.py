@@ -0,0 +1,143 @@
+import os
+import hmac
+import base64
+import hashlib
+import secrets
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Passwort-Hashing Konfiguration (scrypt)
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+# 'process' (Standard), 'thread' oder 'inline'
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'process')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+# Maximal wartende Hash-Aufträge pro Worker, danach PasswordHasherBusy
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+# Retry-After (Sekunden) der 503-Antwort, wenn das Hashing ausgelastet ist
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 2))
+
+SCHEME = 'scrypt'
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+class PasswordHasherBusy(Exception):
+    """Hash-Warteschlange voll oder Zeitlimit überschritten"""
+
+    def __init__(self, message, retry_after=PASSWORD_HASH_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    # maxmem großzügig setzen, OpenSSL begrenzt sonst auf 32 MB
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+
+def _hash(password, n, r, p):
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f'{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(key)}'
+
+def _verify(password, stored):
+    if stored.startswith(SCHEME + '$'):
+        try:
+            _, n, r, p, salt, key = stored.split('$')
+            candidate = _scrypt(password, _unb64(salt), int(n), int(r), int(p))
+            return hmac.compare_digest(candidate, _unb64(key))
+        except ValueError:
+            # Beschädigter Hash (binascii.Error ist ebenfalls ein ValueError)
+            return False
+    # Altbestand: ungesalzenes SHA-256 (hex)
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legacy, stored)
+
+class PasswordHasher:
+    """scrypt-Hashing in einem begrenzten Prozess-Pool.
+
+    Hält die KDF-Last aus den gunicorn-Workern heraus und begrenzt die Zahl
+    gleichzeitiger Hash-Vorgänge. Alte SHA-256-Hashes werden erkannt und
+    über needs_rehash() zur Migration gemeldet.
+    """
+
+    def __init__(self, n=PASSWORD_SCRYPT_N, r=PASSWORD_SCRYPT_R, p=PASSWORD_SCRYPT_P,
+                 executor=PASSWORD_HASH_EXECUTOR, workers=PASSWORD_HASH_WORKERS,
+                 queue_size=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.executor_kind = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Pool pro Prozess anlegen (nach fork nicht weiterverwenden)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    if self.executor_kind == 'process':
+                        context = multiprocessing.get_context('spawn')
+                        self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                    elif self.executor_kind == 'thread':
+                        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                    else:
+                        self._executor = None
+                    self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return fn(*args)
+        slots = self._slots
+        # Nicht warten: ist die Warteschlange voll, sofort 503 statt den Request-Thread zu blockieren
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Passwort-Hashing ausgelastet')
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # Platz erst freigeben, wenn der Auftrag wirklich fertig ist (auch nach Zeitüberschreitung)
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy('Passwort-Hashing Zeitüberschreitung')
+        except BrokenProcessPool:
+            # Abgestürzten Pool beim nächsten Aufruf neu aufbauen
+            self._pid = None
+            raise
+
+    def hash(self, password):
+        """Passwort mit den aktuellen Kostenparametern hashen"""
+        return self._run(_hash, password, self.n, self.r, self.p)
+
+    def verify(self, password, stored):
+        """Passwort gegen gespeicherten Hash (scrypt oder Alt-SHA-256) prüfen"""
+        if not stored:
+            return False
+        return self._run(_verify, password, stored)
+
+    def needs_rehash(self, stored):
+        """True für Alt-Hashes oder abweichende Kostenparameter"""
+        return not stored.startswith(f'{SCHEME}${self.n}${self.r}${self.p}$')
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import random
+import secrets
+import tempfile
+import threading
+from collections import Counter
+
+# Profiler Konfiguration
+PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'zyrix-profiler'))
+PROFILER_MAX_DURATION = float(os.environ.get('PROFILER_MAX_DURATION', 600))
+# So oft prüft jeder Worker die Steuerdatei (Sekunden)
+PROFILER_CONTROL_CHECK = float(os.environ.get('PROFILER_CONTROL_CHECK', 1))
+PROFILER_FLUSH_INTERVAL = float(os.environ.get('PROFILER_FLUSH_INTERVAL', 5))
+
+CONTROL_FILE = 'control.json'
+# Sitzungskennung aus start(): secrets.token_hex(4)
+SESSION_PATTERN = re.compile(r'[0-9a-f]{8}')
+
+def is_session(value):
+    """True für eine gültige Sitzungskennung (landet ungeprüft nie in einem Dateimuster)"""
+    return isinstance(value, str) and SESSION_PATTERN.fullmatch(value) is not None
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f'{module}:{code.co_name}'
+
+def fold_stack(frame):
+    """Stack als Collapsed-Zeile (äußerster Frame zuerst, ';'-getrennt)"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class SamplingProfiler:
+    """Stack-Sampling der Request-Threads, gesteuert über eine Datei für alle Worker.
+
+    Ist kein Profiling-Fenster aktiv, kostet ein Request nur einen Zeitvergleich
+    (und höchstens einmal pro Sekunde ein stat() auf die Steuerdatei). Der
+    Sampler-Thread läuft nur während eines aktiven Fensters.
+    """
+
+    def __init__(self, directory=PROFILER_DIR):
+        self.directory = directory
+        self._control_path = os.path.join(directory, CONTROL_FILE)
+        self._next_check = 0.0
+        self._control_mtime = None
+        self._control = None
+        self._tracked = {}
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    # Steuerung (von der Admin-Route aus, wirkt auf alle Worker)
+
+    def start(self, duration, sample_rate=1.0, interval_ms=10):
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, '*.collapsed')):
+            os.remove(path)
+        control = {
+            'session': secrets.token_hex(4),
+            'until': time.time() + min(duration, PROFILER_MAX_DURATION),
+            'sample_rate': max(0.0, min(1.0, sample_rate)),
+            'interval': max(1, interval_ms) / 1000.0
+        }
+        self._write_control(control)
+        self._next_check = 0.0
+        return control
+
+    def stop(self):
+        control = self._read_control() or {}
+        control['until'] = 0
+        self._write_control(control)
+        self._next_check = 0.0
+        return control
+
+    def _write_control(self, control):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._control_path + f'.{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(control, f)
+        os.replace(tmp_path, self._control_path)
+
+    def _read_control(self):
+        try:
+            with open(self._control_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _active_control(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + PROFILER_CONTROL_CHECK
+            try:
+                mtime = os.stat(self._control_path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._control_mtime:
+                self._control_mtime = mtime
+                self._control = self._read_control() if mtime else None
+        control = self._control
+        if control and control.get('until', 0) > time.time():
+            return control
+        return None
+
+    # Request-Hooks
+
+    def init_app(self, app):
+        app.before_request(self.request_started)
+        app.teardown_request(lambda exc: self.request_finished())
+
+    def request_started(self):
+        control = self._active_control()
+        if control is None or random.random() >= control['sample_rate']:
+            return
+        self._ensure_sampler(control)
+        self._tracked[threading.get_ident()] = True
+
+    def request_finished(self):
+        if self._tracked:
+            self._tracked.pop(threading.get_ident(), None)
+
+    # Sampler
+
+    def _ensure_sampler(self, control):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._samples = Counter()
+            self._tracked = {}
+            self._thread = threading.Thread(target=self._sample_loop, args=(control,),
+                                            name='profiler-sampler', daemon=True)
+            self._thread.start()
+
+    def _sample_loop(self, control):
+        next_flush = time.monotonic() + PROFILER_FLUSH_INTERVAL
+        while True:
+            current = self._active_control()
+            if current is None or current['session'] != control['session']:
+                break
+            frames = sys._current_frames()
+            for ident in list(self._tracked):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._samples[fold_stack(frame)] += 1
+            del frames
+            if time.monotonic() >= next_flush:
+                self._flush(control['session'])
+                next_flush = time.monotonic() + PROFILER_FLUSH_INTERVAL
+            time.sleep(control['interval'])
+        # Nach einem Neustart gehören die Samples zur alten Sitzung und werden verworfen
+        if current is not None or (self._read_control() or {}).get('session') == control['session']:
+            self._flush(control['session'])
+        self._tracked = {}
+
+    def _session_files(self, session):
+        if not is_session(session):
+            return []
+        return glob.glob(os.path.join(self.directory, f'{session}-*.collapsed'))
+
+    def _flush(self, session):
+        if not self._samples:
+            return
+        path = os.path.join(self.directory, f'{session}-{os.getpid()}.collapsed')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for stack, count in self._samples.items():
+                f.write(f'{stack} {count}\n')
+        os.replace(tmp_path, path)
+
+    # Auswertung
+
+    def collapsed(self, session=None):
+        """Collapsed Stacks aller Worker zusammengeführt (flamegraph.pl / speedscope).
+
+        Nur Dateien der angegebenen bzw. der zuletzt gestarteten Sitzung; ein
+        Worker, der nach einem Neustart noch Samples der alten Sitzung
+        schreibt, verfälscht das Profil nicht.
+        """
+        if session is None:
+            session = (self._read_control() or {}).get('session')
+        merged = Counter()
+        for path in self._session_files(session):
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        merged[stack] += int(count)
+        return ''.join(f'{stack} {count}\n' for stack, count in merged.most_common())
+
+    def status(self):
+        control = self._read_control()
+        active = bool(control and control.get('until', 0) > time.time())
+        files = self._session_files(control.get('session') if control else None)
+        return {
+            'active': active,
+            'session': control.get('session') if control else None,
+            'remaining_seconds': round(control['until'] - time.time(), 1) if active else 0,
+            'sample_rate': control.get('sample_rate') if control else None,
+            'interval_ms': round(control['interval'] * 1000) if control and 'interval' in control else None,
+            'worker_files': len(files)
+        }
+
+profiler = SamplingProfiler()
@@ -0,0 +1,120 @@
+import os
+import math
+import time
+import threading
+from functools import wraps
+from flask import request, jsonify
+
+# Rate-Limit Konfiguration im Format "Anzahl/Sekunden"
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+RATE_LIMIT_LOGIN_IP = os.environ.get('RATE_LIMIT_LOGIN_IP', '30/60')
+RATE_LIMIT_LOGIN_EMAIL = os.environ.get('RATE_LIMIT_LOGIN_EMAIL', '10/300')
+RATE_LIMIT_REGISTER_IP = os.environ.get('RATE_LIMIT_REGISTER_IP', '10/3600')
+RATE_LIMIT_REGISTER_EMAIL = os.environ.get('RATE_LIMIT_REGISTER_EMAIL', '3/3600')
+RATE_LIMIT_RESET_IP = os.environ.get('RATE_LIMIT_RESET_IP', '10/900')
+RATE_LIMIT_RESET_EMAIL = os.environ.get('RATE_LIMIT_RESET_EMAIL', '3/3600')
+# Abstand zwischen zwei Aufräumläufen für inaktive Schlüssel
+RATE_LIMIT_SWEEP_INTERVAL = float(os.environ.get('RATE_LIMIT_SWEEP_INTERVAL', 60))
+
+def parse_limit(spec):
+    """'10/60' -> (10, 60.0)"""
+    count, seconds = spec.split('/')
+    return int(count), float(seconds)
+
+class TokenBucketLimiter:
+    """Token-Bucket pro Schlüssel: O(1) Speicher (Füllstand, Zeitstempel)"""
+
+    def __init__(self, count, seconds, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL):
+        self.capacity = count
+        self.refill_per_second = count / seconds
+        # Nach dieser Zeit ist ein Bucket wieder voll und kann verworfen werden
+        self.idle_seconds = seconds
+        self.sweep_interval = sweep_interval
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        # Kennzahlen
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def hit(self, key):
+        """Einen Token entnehmen; liefert (erlaubt, Sekunden bis zum nächsten Token)"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, last = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self.allowed += 1
+                return True, 0
+            self._buckets[key] = (tokens, now)
+            self.rejected += 1
+            return False, (1 - tokens) / self.refill_per_second
+
+    def _sweep(self, now):
+        cutoff = now - self.idle_seconds
+        stale = [key for key, (_, last) in self._buckets.items() if last < cutoff]
+        for key in stale:
+            del self._buckets[key]
+        self.evicted += len(stale)
+        self._next_sweep = now + self.sweep_interval
+
+    def stats(self):
+        return {
+            'keys': len(self._buckets),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'evicted': self.evicted
+        }
+
+# Alle Limiter nach Name, für die Status-Route
+limiters = {}
+
+def client_ip():
+    """Client-IP hinter dem Render-Proxy.
+
+    remote_addr setzt ProxyFix (app.py) aus dem Eintrag in X-Forwarded-For,
+    den der vertrauenswürdige Proxy angehängt hat. Die Einträge links davon
+    schickt der Client selbst und dürfen nicht als Schlüssel dienen, sonst
+    umgeht ein zufälliger Header pro Request jedes IP-Limit.
+    """
+    return request.remote_addr or 'unknown'
+
+def request_email():
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    return email.strip().lower() if isinstance(email, str) and email else None
+
+def rate_limit(scope, per_ip=None, per_email=None):
+    """Decorator: 429 vor jeder Datenbank- oder SMTP-Arbeit, getrennt nach IP und E-Mail"""
+    checks = []
+    if per_ip:
+        limiters[f'{scope}:ip'] = TokenBucketLimiter(*parse_limit(per_ip))
+        checks.append((limiters[f'{scope}:ip'], client_ip))
+    if per_email:
+        limiters[f'{scope}:email'] = TokenBucketLimiter(*parse_limit(per_email))
+        checks.append((limiters[f'{scope}:email'], request_email))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                for limiter, key_func in checks:
+                    key = key_func()
+                    if key is None:
+                        continue
+                    allowed, retry_after = limiter.hit(key)
+                    if not allowed:
+                        response = jsonify({'error': 'Zu viele Anfragen. Bitte versuchen Sie es später erneut.'})
+                        response.headers['Retry-After'] = str(math.ceil(retry_after))
+                        return response, 429
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def stats():
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -0,0 +1,105 @@
+import os
+import json
+import threading
+from cache import CacheBackend
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Lokaler Redis-kompatibler Server (Redis, Valkey, KeyDB, Dragonfly)
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/0')
+# Kurzes Zeitlimit: ein hängender Cache darf Requests nicht aufhalten
+REDIS_CACHE_TIMEOUT = float(os.environ.get('REDIS_CACHE_TIMEOUT', 0.1))
+
+class RedisCache(CacheBackend):
+    """Cache-Backend für einen lokalen Redis-kompatiblen Server.
+
+    Werte liegen als JSON unter zyrix:<name>:<Schlüssel> mit TTL in
+    Millisekunden. Die Größe begrenzt der Server (maxmemory mit
+    allkeys-lru). Ist der Server nicht erreichbar, zählt jeder Zugriff als
+    Miss und der Request lädt direkt aus Supabase.
+    """
+
+    def __init__(self, name, ttl, url=REDIS_CACHE_URL, timeout=REDIS_CACHE_TIMEOUT):
+        if redis is None:
+            raise RuntimeError('Paket redis ist nicht installiert')
+        self.name = name
+        self.ttl = ttl
+        self.url = url
+        self.timeout = timeout
+        self.prefix = f'zyrix:{name}:'
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Kennzahlen dieses Prozesses
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _get_client(self):
+        # Verbindungs-Pool pro Prozess (nach fork nicht weiterverwenden)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = redis.Redis.from_url(self.url, socket_timeout=self.timeout,
+                                                        socket_connect_timeout=self.timeout)
+                    self._pid = os.getpid()
+        return self._client
+
+    def _key(self, key):
+        return self.prefix + json.dumps(key, separators=(',', ':'), default=str)
+
+    def get(self, key, default=None):
+        try:
+            raw = self._get_client().get(self._key(key))
+        except redis.RedisError:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl_ms = max(1, int((self.ttl if ttl is None else ttl) * 1000))
+        try:
+            self._get_client().set(self._key(key), json.dumps(value, separators=(',', ':'), default=str),
+                                   px=ttl_ms)
+        except redis.RedisError:
+            self.errors += 1
+
+    def invalidate(self, key):
+        try:
+            if self._get_client().delete(self._key(key)):
+                self.invalidations += 1
+        except redis.RedisError:
+            self.errors += 1
+
+    def clear(self):
+        client = self._get_client()
+        batch = []
+        for key in client.scan_iter(match=self.prefix + '*', count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                client.delete(*batch)
+                batch = []
+        if batch:
+            client.delete(*batch)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'url': self.url.split('@')[-1],
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            'invalidations': self.invalidations,
+            'errors': self.errors
+        }
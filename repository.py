@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from metrics import observe_supabase
+from singleflight import SingleFlight
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Zum Vorher/Nachher-Vergleich: alle Abfragen wieder mit select('*') ausführen
+REPOSITORY_FULL_ROWS = os.environ.get('REPOSITORY_FULL_ROWS', '').lower() in ('1', 'true', 'yes')
+# Nutzdatengröße nur bei jedem n-ten Aufruf pro Abfrage messen (json.dumps kostet auf dem Request-Pfad)
+REPOSITORY_STATS_SAMPLE = max(1, int(os.environ.get('REPOSITORY_STATS_SAMPLE', 10)))
+
+# Spalten-Projektionen pro Anwendungsfall
+USER_EXISTS_COLUMNS = 'id'
+USER_LOGIN_COLUMNS = 'id,email,full_name,tokens,status,password_hash'
+USER_INFO_COLUMNS = 'id,email,full_name,tokens,status'
+USER_BALANCE_COLUMNS = 'id,tokens'
+# Live-Kontostand (/user-info/stream): alle verbundenen Benutzer in einer Abfrage
+USER_STREAM_COLUMNS = 'id,tokens,status'
+# password_hash für den Fingerabdruck signierter Reset-Links
+USER_RESET_REQUEST_COLUMNS = 'id,full_name,password_hash'
+USER_PASSWORD_COLUMNS = 'id,password_hash'
+
+# Postgres-Fehlercode für Unique-Verletzungen
+UNIQUE_VIOLATION = '23505'
+# Prefer: return=minimal (entspricht postgrest ReturnMethod.minimal, ohne postgrest beim Import zu laden)
+RETURN_MINIMAL = 'minimal'
+RETURN_REPRESENTATION = 'representation'
+
+class DuplicateEmailError(Exception):
+    """E-Mail-Adresse existiert bereits (Unique-Index users_email_key)"""
+
+def is_supabase_outage(e):
+    """Ausfall von Supabase (Netzwerk, Timeout, Gateway-5xx, Datenbank nicht erreichbar) statt fachlichem Fehler.
+
+    Alles andere zählt nicht, auch keine Ausnahmen aus unserem eigenen Code
+    (AttributeError, KeyError, ...): sonst könnte jeder, der einen Fehlerpfad
+    auslösen kann, den Circuit für alle Endpunkte öffnen.
+    """
+    import httpx
+    from postgrest.exceptions import APIError
+
+    if isinstance(e, httpx.TransportError):
+        # Verbindungsfehler und Timeouts (httpx.TimeoutException ist eine Unterklasse)
+        return True
+    if not isinstance(e, APIError):
+        return False
+    if isinstance(e.code, int):
+        # Antwort ohne JSON (z.B. 502/503 vom Gateway), code ist dann der HTTP-Status
+        return e.code >= 500
+    # 08: Verbindung, 53: Ressourcen, 57: Abbruch/Timeout, PGRST0xx: PostgREST erreicht die Datenbank nicht
+    return str(e.code or '').startswith(('08', '53', '57', 'PGRST0'))
+
+def _request_not_sent(e):
+    # Verbindung kam nicht zustande: auch Schreibzugriffe dürfen dann wiederholt werden
+    import httpx
+
+    return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+def _retry_policy(operation):
+    if operation == 'select':
+        return None
+    return _request_not_sent
+
+# Ein Breaker für alle Supabase-Aufrufe dieses Workers
+supabase_breaker = CircuitBreaker('supabase', is_failure=is_supabase_outage)
+
+class QueryStats:
+    """Latenz und Nutzdatengröße pro benannter Abfrage (Größe als Stichprobe jedes sample-ten Aufrufs)"""
+
+    def __init__(self, sample=REPOSITORY_STATS_SAMPLE):
+        self.sample = sample
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds, rows):
+        with self._lock:
+            entry = self._stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0, 'sampled': 0})
+            measure = entry['calls'] % self.sample == 0
+            entry['calls'] += 1
+            entry['seconds'] += seconds
+            entry['rows'] += (len(rows) if isinstance(rows, list) else 1) if rows else 0
+        if not measure:
+            return
+        payload_bytes = len(json.dumps(rows, default=str)) if rows else 0
+        with self._lock:
+            entry['bytes'] += payload_bytes
+            entry['sampled'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    'calls': entry['calls'],
+                    'avg_latency_ms': round(entry['seconds'] / entry['calls'] * 1000, 3),
+                    'avg_payload_bytes': round(entry['bytes'] / entry['sampled'], 1) if entry['sampled'] else 0,
+                    'rows': entry['rows']
+                }
+                for name, entry in self._stats.items()
+            }
+
+query_stats = QueryStats()
+
+class _Repository:
+    table_name = None
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(self.table_name)
+
+    def _columns(self, columns):
+        return '*' if REPOSITORY_FULL_ROWS else columns
+
+    def _execute(self, name, query, operation='select'):
+        started = time.perf_counter()
+        try:
+            result = supabase_breaker.call(query.execute, retry=_retry_policy(operation))
+        except CircuitOpenError:
+            raise
+        except Exception:
+            observe_supabase(self.table_name, operation, time.perf_counter() - started, ok=False)
+            raise
+        elapsed = time.perf_counter() - started
+        observe_supabase(self.table_name, operation, elapsed)
+        query_stats.record(f'{self.table_name}.{name}', elapsed, result.data)
+        return result.data
+
+    def _rpc(self, name, params):
+        """Postgres-Funktion aufrufen (siehe supabase/migrations)"""
+        started = time.perf_counter()
+        try:
+            # Postgres-Funktionen schreiben: nur wiederholen, wenn die Anfrage nicht gesendet wurde
+            result = supabase_breaker.call(self.client.rpc(name, params).execute, retry=_request_not_sent)
+        except CircuitOpenError:
+            raise
+        except Exception:
+            observe_supabase(self.table_name, f'rpc.{name}', time.perf_counter() - started, ok=False)
+            raise
+        elapsed = time.perf_counter() - started
+        observe_supabase(self.table_name, f'rpc.{name}', elapsed)
+        query_stats.record(f'rpc.{name}', elapsed, result.data)
+        return result.data
+
+    def _first(self, name, query):
+        data = self._execute(name, query)
+        return data[0] if data else None
+
+    def _rpc_first(self, name, params):
+        """Mengenfunktion (RETURNS SETOF jsonb) aufrufen, liefert die erste Zeile oder None"""
+        data = self._rpc(name, params)
+        return data[0] if data else None
+
+    def page_after(self, columns, after_id, limit):
+        """Keyset-Pagination (export.py): bis zu limit Zeilen mit id > after_id, nach id sortiert"""
+        query = self._table().select(columns).order('id').limit(limit)
+        if after_id is not None:
+            query = query.gt('id', after_id)
+        return self._execute('page_after', query)
+
+class UserRepository(_Repository):
+    """Zweckgebundene Abfragen auf users statt select('*').
+
+    Schreibzugriffe, deren Ergebnis nicht gebraucht wird, fordern mit
+    return=minimal keine Zeilen zurück. Mehrstufige Abläufe laufen als
+    Postgres-Funktion in einem Round-Trip.
+    """
+
+    table_name = 'users'
+
+    def __init__(self, client):
+        super().__init__(client)
+        # Gleichzeitige identische Lesezugriffe (mehrere Tabs, Login-Wiederholungen) zusammenfassen
+        self._info_flight = SingleFlight('users.find_info')
+        self._login_flight = SingleFlight('users.find_for_login')
+
+    def email_exists(self, email):
+        query = self._table().select(self._columns(USER_EXISTS_COLUMNS)).eq('email', email).limit(1)
+        return self._first('email_exists', query) is not None
+
+    def find_for_login(self, email):
+        query = self._table().select(self._columns(USER_LOGIN_COLUMNS)).eq('email', email)
+        return self._login_flight.do(email, lambda: self._first('find_for_login', query))
+
+    def find_info(self, user_id):
+        query = self._table().select(self._columns(USER_INFO_COLUMNS)).eq('id', user_id)
+        return self._info_flight.do(user_id, lambda: self._first('find_info', query))
+
+    def forget(self, user_id):
+        """Nach Schreibzugriffen keinen bereits laufenden find_info-Aufruf mehr teilen"""
+        self._info_flight.forget(user_id)
+
+    def find_balance(self, user_id):
+        query = self._table().select(self._columns(USER_BALANCE_COLUMNS)).eq('id', user_id)
+        return self._first('find_balance', query)
+
+    def find_balances(self, user_ids):
+        """Kontostand und Status mehrerer Benutzer, eine Abfrage für die ganze Liste"""
+        if not user_ids:
+            return []
+        query = self._table().select(self._columns(USER_STREAM_COLUMNS)).in_('id', list(user_ids))
+        return self._execute('find_balances', query)
+
+    def find_for_reset_request(self, email):
+        query = self._table().select(self._columns(USER_RESET_REQUEST_COLUMNS)).eq('email', email)
+        return self._first('find_for_reset_request', query)
+
+    def find_password_hash(self, user_id):
+        """Aktueller Passwort-Hash (Prüfung des Fingerabdrucks signierter Reset-Links)"""
+        query = self._table().select(self._columns(USER_PASSWORD_COLUMNS)).eq('id', user_id)
+        return self._first('find_password_hash', query)
+
+    def create(self, user_data, return_id=False):
+        """Benutzer anlegen; Duplikate meldet der Unique-Index statt einer vorherigen Abfrage.
+
+        Mit return_id=True wird die neue Zeile zurückgeliefert und ihre ID
+        zurückgegeben (für signierte Bestätigungslinks), sonst True.
+        """
+        from postgrest.exceptions import APIError
+
+        returning = RETURN_REPRESENTATION if return_id else RETURN_MINIMAL
+        try:
+            data = self._execute('create', self._table().insert(user_data, returning=returning), 'insert')
+        except APIError as e:
+            if e.code == UNIQUE_VIOLATION:
+                raise DuplicateEmailError(user_data.get('email'))
+            raise
+        if return_id:
+            return data[0]['id'] if data else None
+        return True
+
+    def existing_emails(self, emails):
+        """Bereits registrierte Adressen aus emails, eine Abfrage für die ganze Liste"""
+        if not emails:
+            return set()
+        query = self._table().select('email').in_('email', list(emails))
+        return {row['email'] for row in self._execute('existing_emails', query)}
+
+    def create_many(self, records):
+        """Mehrere Benutzer mit einem insert() anlegen, liefert [{'id', 'email', ...}, ...].
+
+        Ein Duplikat lässt den ganzen Aufruf scheitern (DuplicateEmailError),
+        der Aufrufer legt die Zeilen dann einzeln an.
+        """
+        from postgrest.exceptions import APIError
+
+        try:
+            return self._execute('create_many', self._table().insert(records, returning=RETURN_REPRESENTATION),
+                                 'insert')
+        except APIError as e:
+            if e.code == UNIQUE_VIOLATION:
+                raise DuplicateEmailError(None)
+            raise
+
+    def update_password_hash(self, user_id, password_hash):
+        """Hash nach Login-Rehash ersetzen (Migration von SHA-256 auf scrypt)"""
+        return self._execute('update_password_hash', self._table().update({
+            'password_hash': password_hash
+        }, returning=RETURN_MINIMAL).eq('id', user_id), 'update')
+
+    def verify_by_token(self, token):
+        """Ausstehenden Benutzer atomar aktivieren, liefert die User-ID oder None"""
+        result = self._rpc_first('verify_email', {'p_token': token})
+        return result['user_id'] if result else None
+
+    def verify_by_id(self, user_id):
+        """Ausstehenden Benutzer per ID aktivieren (signierter Link), liefert die User-ID oder None"""
+        result = self._rpc_first('verify_user', {'p_user_id': user_id})
+        return result['user_id'] if result else None
+
+    def reset_password_signed(self, user_id, current_hash, password_hash):
+        """Passwort setzen, falls der Hash noch current_hash ist (Fingerabdruck prüft die App).
+
+        Liefert {'status': 'ok'|'invalid', 'user_id': ...}.
+        """
+        return self._rpc_first('reset_password_signed', {
+            'p_user_id': user_id,
+            'p_current_hash': current_hash,
+            'p_password_hash': password_hash
+        })
+
+class PasswordResetRepository(_Repository):
+    """Abfragen auf password_resets"""
+
+    table_name = 'password_resets'
+
+    def create(self, user_id, token, expires_at):
+        return self._execute('create', self._table().insert({
+            'user_id': user_id,
+            'token': token,
+            'expires_at': expires_at.isoformat(),
+            'used': False,
+            'created_at': datetime.utcnow().isoformat()
+        }, returning=RETURN_MINIMAL), 'insert')
+
+    def consume(self, token, password_hash):
+        """Token prüfen, Passwort setzen und Token entwerten in einem Aufruf.
+
+        Liefert {'status': 'ok'|'invalid'|'expired', 'user_id': ...}.
+        """
+        return self._rpc_first('reset_password', {'p_token': token, 'p_password_hash': password_hash})
+
+class TokenLedgerRepository(_Repository):
+    """Schreibzugriffe auf token_ledger (siehe metering.py)"""
+
+    table_name = 'token_ledger'
+
+    def apply_debits(self, entries, source=None, strict=False):
+        """Gesammelte Abbuchungen in einem Aufruf buchen, liefert die neuen Kontostände.
+
+        strict: ein Eintrag wird nur gebucht, wenn der Kontostand reicht, sonst "rejected".
+        """
+        params = {'p_debits': entries, 'p_source': source}
+        if strict:
+            params['p_strict'] = True
+        return self._rpc('apply_token_debits', params) or []
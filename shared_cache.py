@@ -0,0 +1,303 @@
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+from cache import CacheBackend
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Shared-Memory-Cache Konfiguration
+SHARED_CACHE_DIR = os.environ.get(
+    'SHARED_CACHE_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+)
+# Bytes pro Eintrag inkl. Kopf; größere Werte werden nicht gecacht
+SHARED_CACHE_SLOT_SIZE = int(os.environ.get('SHARED_CACHE_SLOT_SIZE', 512))
+SHARED_CACHE_WAYS = 8
+SHARED_CACHE_LOCK_STRIPES = 64
+# Version von Slot-Layout und Kodierung (Teil des Dateinamens): bei jeder Änderung erhöhen,
+# damit Worker verschiedener Versionen während eines Deploys nie dieselbe Datei lesen
+SHARED_CACHE_FORMAT = 1
+
+# Slot-Kopf: Schlüssel-Hash (0 = leer), Ablauf (Unix-Zeit), Referenz-Bit, Schlüssel- und Wertlänge
+SLOT = struct.Struct('<QdBxHI')
+
+def _encode(data):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str)
+        except TypeError:
+            pass
+    return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+_decode = orjson.loads if orjson is not None else json.loads
+
+def _encode_key(key):
+    # Häufige Schlüsseltypen ohne JSON; der Typ-Präfix trennt 5 von '5'
+    if isinstance(key, str):
+        return b's:' + key.encode('utf-8')
+    if isinstance(key, int) and not isinstance(key, bool):
+        return b'i:' + str(key).encode('ascii')
+    return b'j:' + _encode(key)
+
+def _hash(key_bytes):
+    return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little') or 1
+
+class SharedMemoryCache(CacheBackend):
+    """Cache für alle Worker eines Hosts in einer gemeinsamen mmap-Datei.
+
+    Feste Slots, aufgeteilt in Buckets zu je SHARED_CACHE_WAYS Einträgen
+    (set-assoziativ). Ist ein Bucket voll, verdrängt ein CLOCK-Zeiger pro
+    Bucket den ersten Eintrag ohne Referenz-Bit (Annäherung an LRU).
+    Invalidierungen wirken damit sofort in allen Workern. Schreib- und
+    Lesezugriffe sind pro Lock-Streifen über fcntl-Locks (zwischen
+    Prozessen) und threading-Locks (zwischen Threads) geschützt.
+    """
+
+    def __init__(self, name, maxsize, ttl, slot_size=SHARED_CACHE_SLOT_SIZE, directory=SHARED_CACHE_DIR):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.slot_size = slot_size
+        self.ways = SHARED_CACHE_WAYS
+        self.buckets = max(1, -(-maxsize // self.ways))
+        # Format und Layout im Dateinamen: andere Versionen und Größen teilen nie dieselbe Datei
+        self.path = os.path.join(
+            directory, f'zyrix-cache-v{SHARED_CACHE_FORMAT}-{name}-{self.buckets}x{self.ways}x{slot_size}.bin'
+        )
+        # CLOCK-Zeiger (1 Byte pro Bucket), danach die Slots
+        self._slots_offset = -(-self.buckets // 64) * 64
+        self.size_bytes = self._slots_offset + self.buckets * self.ways * slot_size
+
+        self._mm = None
+        self._fd = None
+        self._pid = None
+        self._locks = None
+        self._open_lock = threading.Lock()
+        self._disabled = False
+
+        # Kennzahlen dieses Prozesses
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.too_large = 0
+        self.errors = 0
+
+    def _open(self):
+        """Datei pro Prozess öffnen und mappen (nach fork neu, fcntl-Locks gelten pro Prozess)"""
+        if self._pid == os.getpid():
+            return self._mm
+        with self._open_lock:
+            if self._pid != os.getpid():
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    if os.fstat(fd).st_size < self.size_bytes:
+                        # Speicher reservieren; ein volles /dev/shm führt so zu OSError statt SIGBUS
+                        os.posix_fallocate(fd, 0, self.size_bytes)
+                    self._mm = mmap.mmap(fd, self.size_bytes)
+                except OSError:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+                self._locks = [threading.Lock() for _ in range(SHARED_CACHE_LOCK_STRIPES)]
+                self._pid = os.getpid()
+        return self._mm
+
+    def _bucket(self, key):
+        key_bytes = _encode_key(key)
+        key_hash = _hash(key_bytes)
+        return key_bytes, key_hash, key_hash % self.buckets
+
+    def _locked(self, bucket):
+        stripe = bucket % SHARED_CACHE_LOCK_STRIPES
+        return _StripeLock(self._locks[stripe], self._fd, stripe)
+
+    def _slot_offset(self, bucket, way):
+        return self._slots_offset + (bucket * self.ways + way) * self.slot_size
+
+    def _find(self, mm, bucket, key_bytes, key_hash):
+        """Offset des Slots mit diesem Schlüssel oder None (Lock muss gehalten werden)"""
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            slot_hash, _, _, key_len, _ = SLOT.unpack_from(mm, offset)
+            if slot_hash == key_hash and key_len == len(key_bytes):
+                start = offset + SLOT.size
+                if mm[start:start + key_len] == key_bytes:
+                    return offset
+        return None
+
+    def _usable(self):
+        if self._disabled:
+            return None
+        try:
+            return self._open()
+        except OSError as e:
+            # Ohne Shared Memory weiter ohne Cache statt mit Fehlern
+            self._disabled = True
+            self.errors += 1
+            print(f"Cache {self.name}: {self.path} nicht nutzbar ({e}), Cache deaktiviert")
+            return None
+
+    def get(self, key, default=None):
+        mm = self._usable()
+        if mm is None:
+            self.misses += 1
+            return default
+        key_bytes, key_hash, bucket = self._bucket(key)
+        raw = None
+        with self._locked(bucket):
+            offset = self._find(mm, bucket, key_bytes, key_hash)
+            if offset is not None:
+                _, expires_at, _, key_len, value_len = SLOT.unpack_from(mm, offset)
+                if expires_at > time.time():
+                    # Referenz-Bit setzen (zweite Chance für CLOCK)
+                    mm[offset + 16] = 1
+                    start = offset + SLOT.size + key_len
+                    raw = mm[start:start + value_len]
+                else:
+                    SLOT.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+        if raw is None:
+            self.misses += 1
+            return default
+        try:
+            value = _decode(raw)
+        except ValueError:
+            # Beschädigter oder fremd kodierter Slot: verwerfen und wie einen Fehltreffer behandeln
+            self._discard(mm, bucket, key_bytes, key_hash, raw)
+            self.errors += 1
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def _discard(self, mm, bucket, key_bytes, key_hash, raw):
+        """Slot leeren, sofern er noch den unlesbaren Wert enthält"""
+        with self._locked(bucket):
+            offset = self._find(mm, bucket, key_bytes, key_hash)
+            if offset is None:
+                return
+            _, _, _, key_len, value_len = SLOT.unpack_from(mm, offset)
+            start = offset + SLOT.size + key_len
+            if mm[start:start + value_len] == raw:
+                SLOT.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+
+    def set(self, key, value, ttl=None):
+        mm = self._usable()
+        if mm is None:
+            return
+        key_bytes, key_hash, bucket = self._bucket(key)
+        value_bytes = _encode(value)
+        if SLOT.size + len(key_bytes) + len(value_bytes) > self.slot_size:
+            # Passt nicht in einen Slot: nicht cachen, aber keinen alten Wert stehen lassen
+            self.too_large += 1
+            self.invalidate(key)
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._locked(bucket):
+            offset = self._find(mm, bucket, key_bytes, key_hash)
+            if offset is None:
+                offset = self._victim(mm, bucket)
+            SLOT.pack_into(mm, offset, key_hash, expires_at, 1, len(key_bytes), len(value_bytes))
+            start = offset + SLOT.size
+            mm[start:start + len(key_bytes) + len(value_bytes)] = key_bytes + value_bytes
+
+    def _victim(self, mm, bucket):
+        """Freien/abgelaufenen Slot wählen, sonst CLOCK-Verdrängung (Lock muss gehalten werden)"""
+        now = time.time()
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            slot_hash, expires_at, _, _, _ = SLOT.unpack_from(mm, offset)
+            if slot_hash == 0 or expires_at <= now:
+                return offset
+        hand = mm[bucket] % self.ways
+        while True:
+            offset = self._slot_offset(bucket, hand)
+            hand = (hand + 1) % self.ways
+            if mm[offset + 16]:
+                mm[offset + 16] = 0
+                continue
+            mm[bucket] = hand
+            self.evictions += 1
+            return offset
+
+    def invalidate(self, key):
+        mm = self._usable()
+        if mm is None:
+            return
+        key_bytes, key_hash, bucket = self._bucket(key)
+        with self._locked(bucket):
+            offset = self._find(mm, bucket, key_bytes, key_hash)
+            if offset is not None:
+                SLOT.pack_into(mm, offset, 0, 0.0, 0, 0, 0)
+                self.invalidations += 1
+
+    def clear(self):
+        mm = self._usable()
+        if mm is None:
+            return
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                for way in range(self.ways):
+                    SLOT.pack_into(mm, self._slot_offset(bucket, way), 0, 0.0, 0, 0, 0)
+
+    def _size(self, mm):
+        # Ohne Lock gezählt, nur eine Momentaufnahme
+        now = time.time()
+        size = 0
+        for index in range(self.buckets * self.ways):
+            slot_hash, expires_at, _, _, _ = SLOT.unpack_from(mm, self._slots_offset + index * self.slot_size)
+            if slot_hash and expires_at > now:
+                size += 1
+        return size
+
+    def stats(self):
+        mm = self._usable()
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'shared',
+            'path': self.path,
+            'size': self._size(mm) if mm is not None else 0,
+            'maxsize': self.buckets * self.ways,
+            'ttl_seconds': self.ttl,
+            'slot_bytes': self.slot_size,
+            'shared_bytes': self.size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'too_large': self.too_large,
+            'errors': self.errors
+        }
+
+class _StripeLock:
+    """threading-Lock plus fcntl-Record-Lock auf ein Byte der Cache-Datei"""
+
+    __slots__ = ('lock', 'fd', 'stripe')
+
+    def __init__(self, lock, fd, stripe):
+        self.lock = lock
+        self.fd = fd
+        self.stripe = stripe
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.stripe)
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.stripe)
+        finally:
+            self.lock.release()
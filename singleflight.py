@@ -0,0 +1,101 @@
+import os
+import threading
+
+# Single-Flight Konfiguration
+SINGLEFLIGHT_ENABLED = os.environ.get('SINGLEFLIGHT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+# Maximale Wartezeit auf den laufenden Aufruf, danach eigener Aufruf
+SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_TIMEOUT', 5))
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Gleichzeitige identische Abfragen eines Workers teilen sich einen Aufruf.
+
+    Der erste Aufrufer pro Schlüssel führt die Abfrage aus, alle weiteren
+    warten höchstens timeout Sekunden auf sein Ergebnis (oder seinen
+    Fehler) und rufen danach selbst auf. Das Ergebnis wird geteilt und
+    darf nicht verändert werden.
+    """
+
+    def __init__(self, name, timeout=SINGLEFLIGHT_TIMEOUT, enabled=SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.timeout = timeout
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        # Kennzahlen dieses Prozesses
+        self.upstream = 0
+        self.shared = 0
+        self.timeouts = 0
+        with _registry_lock:
+            _registry[name] = self
+
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream += 1
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+                self.upstream += 1
+            return fn()
+        with self._lock:
+            self.shared += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, key):
+        """Laufenden Aufruf nach einem Schreibzugriff nicht mehr teilen; neue Aufrufer fragen neu ab"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        return {
+            'upstream_calls': self.upstream,
+            'saved_calls': self.shared,
+            'timeouts': self.timeouts,
+            'in_flight': len(self._calls)
+        }
+
+def stats():
+    """Kennzahlen aller Single-Flight-Gruppen dieses Workers"""
+    with _registry_lock:
+        flights = list(_registry.values())
+    return {flight.name: flight.stats() for flight in flights}
+
+def saved_calls():
+    with _registry_lock:
+        return sum(flight.shared for flight in _registry.values())
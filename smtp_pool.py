@@ -0,0 +1,232 @@
+import os
+import time
+import smtplib
+import threading
+from contextlib import contextmanager
+
+# SMTP-Pool Konfiguration
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 2))
+# Obergrenze pro Sitzung, damit der Provider nicht drosselt
+SMTP_MAX_MESSAGES_PER_SESSION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_SESSION', 50))
+# Nach so vielen Sekunden Leerlauf wird die Sitzung vor Benutzung per NOOP geprüft
+SMTP_NOOP_AFTER = float(os.environ.get('SMTP_NOOP_AFTER', 15))
+# Nach so vielen Sekunden Leerlauf wird die Sitzung verworfen (Server trennt ohnehin)
+SMTP_MAX_IDLE = float(os.environ.get('SMTP_MAX_IDLE', 240))
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', 30))
+
+def _is_connection_error(e):
+    # SMTPException erbt von OSError, ist aber meist ein Protokollfehler bei intakter Verbindung
+    if isinstance(e, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)
+
+def is_outage(e):
+    """Server nicht erreichbar oder nicht bereit (statt Fehler einer einzelnen Nachricht, z.B. Empfänger abgelehnt)"""
+    if _is_connection_error(e):
+        return True
+    if isinstance(e, (smtplib.SMTPConnectError, smtplib.SMTPHeloError, smtplib.SMTPAuthenticationError)):
+        return True
+    # 421: Dienst nicht verfügbar, Verbindung wird geschlossen
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code == 421
+
+class _Session:
+    def __init__(self, server):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.sent = 0
+
+class SMTPConnectionPool:
+    """Pool authentifizierter SMTP-Sitzungen.
+
+    Sitzungen werden nach dem Versand offen gehalten, nach längerem Leerlauf
+    per NOOP geprüft und bei Verbindungsabbruch transparent neu aufgebaut.
+    """
+
+    def __init__(self, host, port, user, password, size=SMTP_POOL_SIZE,
+                 max_messages_per_session=SMTP_MAX_MESSAGES_PER_SESSION,
+                 noop_after=SMTP_NOOP_AFTER, max_idle=SMTP_MAX_IDLE,
+                 timeout=SMTP_TIMEOUT, use_ssl=True, ssl_context=None, observer=None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.max_messages_per_session = max_messages_per_session
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.use_ssl = use_ssl
+        self.ssl_context = ssl_context
+        # observer(sekunden, ok) wird nach jedem Versuch aufgerufen (Metriken)
+        self.observer = observer
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._pid = os.getpid()
+
+        # Kennzahlen
+        self.connects = 0
+        self.reuses = 0
+        self.noop_failures = 0
+        self.reconnects = 0
+
+    def _check_fork(self):
+        # Sockets des Elternprozesses nicht weiterverwenden
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._idle = []
+                    self._slots = threading.BoundedSemaphore(self.size)
+                    self._pid = os.getpid()
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.connects += 1
+        return _Session(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_usable(self, session):
+        idle = time.monotonic() - session.last_used
+        if idle > self.max_idle or session.sent >= self.max_messages_per_session:
+            return False
+        if idle > self.noop_after:
+            try:
+                code = session.server.noop()[0]
+            except Exception:
+                code = None
+            if code != 250:
+                self.noop_failures += 1
+                return False
+        return True
+
+    def acquire(self):
+        """Gesunde Sitzung aus dem Pool holen oder neu aufbauen"""
+        self._check_fork()
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    session = self._idle.pop() if self._idle else None
+                if session is None:
+                    return self._connect()
+                if self._is_usable(session):
+                    self.reuses += 1
+                    return session
+                self._close(session.server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, session, broken=False):
+        """Sitzung zurückgeben; defekte oder ausgeschöpfte Sitzungen schließen"""
+        if broken or session.sent >= self.max_messages_per_session:
+            self._close(session.server)
+        else:
+            session.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(session)
+        self._slots.release()
+
+    @contextmanager
+    def session(self):
+        session = self.acquire()
+        broken = False
+        try:
+            yield session
+        except Exception as e:
+            broken = _is_connection_error(e)
+            raise
+        finally:
+            self.release(session, broken)
+
+    def _send_on(self, session, msg):
+        """Nachricht senden und Dauer an den observer melden"""
+        started = time.perf_counter()
+        try:
+            self._send_with_reconnect(session, msg)
+        except Exception:
+            if self.observer is not None:
+                self.observer(time.perf_counter() - started, False)
+            raise
+        if self.observer is not None:
+            self.observer(time.perf_counter() - started, True)
+
+    def _send_with_reconnect(self, session, msg):
+        """Nachricht senden, bei Verbindungsabbruch einmal neu verbinden"""
+        if session.sent >= self.max_messages_per_session:
+            self._close(session.server)
+            fresh = self._connect()
+            session.server, session.sent = fresh.server, 0
+        try:
+            session.server.send_message(msg)
+        except Exception as e:
+            if not _is_connection_error(e):
+                raise
+            self.reconnects += 1
+            self._close(session.server)
+            fresh = self._connect()
+            session.server, session.sent = fresh.server, 0
+            session.server.send_message(msg)
+        session.sent += 1
+
+    def send(self, msg):
+        """Einzelne Nachricht über eine Pool-Sitzung senden"""
+        with self.session() as session:
+            self._send_on(session, msg)
+
+    def send_many(self, messages):
+        """Mehrere Nachrichten über eine Sitzung senden, liefert je Nachricht True/Exception"""
+        results = []
+        session = self.acquire()
+        broken = False
+        try:
+            for msg in messages:
+                try:
+                    self._send_on(session, msg)
+                    results.append(True)
+                except Exception as e:
+                    if _is_connection_error(e):
+                        # Bereits zugestellte Nachrichten nicht als fehlgeschlagen melden
+                        broken = True
+                        results.extend([e] * (len(messages) - len(results)))
+                        break
+                    results.append(e)
+        finally:
+            self.release(session, broken)
+        return results
+
+    def close_all(self):
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            self._close(session.server)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'idle': len(self._idle),
+            'connects': self.connects,
+            'reuses': self.reuses,
+            'reconnects': self.reconnects,
+            'noop_failures': self.noop_failures
+        }
@@ -0,0 +1,63 @@
+import os
+import gzip
+import hashlib
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Cache-Konfiguration für die eingebauten HTML-Seiten
+STATIC_PAGE_MAX_AGE = int(os.environ.get('STATIC_PAGE_MAX_AGE', 86400))
+
+def minify_html(html):
+    """Einrückung und Leerzeilen entfernen; Zeilenumbrüche bleiben (Inline-JS mit //-Kommentaren)"""
+    lines = (line.strip() for line in html.strip().splitlines())
+    return '\n'.join(line for line in lines if line)
+
+class StaticPage:
+    """Einmal minifizierte HTML-Seite mit ETag; gzip/brotli werden einmal pro Prozess erzeugt"""
+
+    def __init__(self, html, max_age=STATIC_PAGE_MAX_AGE, vary='Accept-Encoding'):
+        self.body = minify_html(html).encode('utf-8')
+        # Schwaches ETag: gilt für alle Kodierungen derselben Seite
+        self.etag = 'W/"' + hashlib.sha256(self.body).hexdigest()[:20] + '"'
+        self.cache_control = f'public, max-age={max_age}'
+        self.vary = vary
+        self._variants = None
+
+    @property
+    def variants(self):
+        # Komprimiert wird beim ersten Abruf, nicht beim Import (kürzerer Worker-Start)
+        if self._variants is None:
+            variants = {'identity': self.body, 'gzip': gzip.compress(self.body, 9)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(self.body, quality=11)
+            self._variants = variants
+        return self._variants
+
+    def _encoding(self):
+        variants = self.variants
+        accepted = request.accept_encodings
+        best, best_size = 'identity', len(variants['identity'])
+        for encoding, body in variants.items():
+            if encoding != 'identity' and accepted[encoding] and len(body) < best_size:
+                best, best_size = encoding, len(body)
+        return best
+
+    def response(self):
+        headers = {
+            'ETag': self.etag,
+            'Cache-Control': self.cache_control,
+            'Vary': self.vary
+        }
+        if_none_match = request.headers.get('If-None-Match', '')
+        if self.etag in if_none_match or if_none_match.strip() == '*':
+            return Response(status=304, headers=headers)
+
+        encoding = self._encoding()
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(self.variants[encoding], status=200, headers=headers,
+                        content_type='text/html; charset=utf-8')
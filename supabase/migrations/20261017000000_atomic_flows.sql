@@ -0,0 +1,58 @@
+-- Atomare Abläufe für /register, /verify-email und /reset-password
+-- Jeder Ablauf ist damit ein einziger Round-Trip zu Supabase.
+
+-- /register: Duplikate über den Unique-Index statt über eine vorherige Abfrage erkennen
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON public.users (email);
+
+-- /verify-email: Benutzer mit gültigem Token in einem Schritt aktivieren
+CREATE OR REPLACE FUNCTION public.verify_email(p_token text)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET status = 'verified',
+            verification_token = NULL,
+            verified_at = now()
+        WHERE verification_token = p_token
+          AND status = 'pending'
+        RETURNING id
+    )
+    SELECT jsonb_build_object('user_id', id) FROM updated;
+$$;
+
+-- /reset-password: Token prüfen, Passwort setzen und Token entwerten in einer Transaktion
+CREATE OR REPLACE FUNCTION public.reset_password(p_token text, p_password_hash text)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_reset public.password_resets%ROWTYPE;
+BEGIN
+    SELECT * INTO v_reset
+    FROM public.password_resets
+    WHERE token = p_token
+      AND used = false
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('status', 'invalid');
+    END IF;
+
+    IF v_reset.expires_at::timestamptz < now() THEN
+        RETURN jsonb_build_object('status', 'expired');
+    END IF;
+
+    UPDATE public.users
+    SET password_hash = p_password_hash,
+        updated_at = now()
+    WHERE id = v_reset.user_id;
+
+    UPDATE public.password_resets
+    SET used = true,
+        used_at = now()
+    WHERE id = v_reset.id;
+
+    RETURN jsonb_build_object('status', 'ok', 'user_id', v_reset.user_id);
+END;
+$$;
@@ -0,0 +1,2 @@
+-- scrypt-Hashes (scrypt$n$r$p$salt$key) sind länger als die bisherigen 64 Zeichen SHA-256
+ALTER TABLE public.users ALTER COLUMN password_hash TYPE text;
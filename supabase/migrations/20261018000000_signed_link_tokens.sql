@@ -0,0 +1,43 @@
+-- Signierte Links (link_tokens.py): der Token trägt die User-ID, Signatur und
+-- Ablaufzeit werden bereits in der App geprüft. Nur gültige Links erreichen diese Funktionen.
+
+-- /verify-email: ausstehenden Benutzer per ID aktivieren
+CREATE OR REPLACE FUNCTION public.verify_user(p_user_id public.users.id%TYPE)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET status = 'verified',
+            verification_token = NULL,
+            verified_at = now()
+        WHERE id = p_user_id
+          AND status = 'pending'
+        RETURNING id
+    )
+    SELECT jsonb_build_object('user_id', id) FROM updated;
+$$;
+
+-- /reset-password: Passwort nur setzen, wenn der Fingerabdruck des aktuellen Hashs
+-- noch zum Token passt. Nach dem Reset ändert sich der Hash, der Token ist damit verbraucht.
+CREATE OR REPLACE FUNCTION public.reset_password_signed(
+    p_user_id public.users.id%TYPE,
+    p_fingerprint text,
+    p_password_hash text
+)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET password_hash = p_password_hash,
+            updated_at = now()
+        WHERE id = p_user_id
+          AND left(md5(password_hash), 16) = p_fingerprint
+        RETURNING id
+    )
+    SELECT COALESCE(
+        (SELECT jsonb_build_object('status', 'ok', 'user_id', id) FROM updated),
+        jsonb_build_object('status', 'invalid')
+    );
+$$;
@@ -0,0 +1,112 @@
+-- Token-Metering (metering.py): Abbuchungen werden pro Worker gesammelt und
+-- als Batch über apply_token_debits geschrieben. users.tokens bleibt der Kontostand,
+-- token_ledger ist das unveränderliche Protokoll aller Abbuchungen.
+
+DO $$
+DECLARE
+    v_id_type text;
+BEGIN
+    -- user_id mit demselben Typ wie users.id anlegen
+    SELECT format_type(atttypid, atttypmod) INTO v_id_type
+    FROM pg_attribute
+    WHERE attrelid = 'public.users'::regclass AND attname = 'id';
+
+    EXECUTE format($sql$
+        CREATE TABLE IF NOT EXISTS public.token_ledger (
+            id bigserial PRIMARY KEY,
+            user_id %s NOT NULL REFERENCES public.users (id),
+            requested bigint NOT NULL,
+            applied bigint NOT NULL,
+            events integer NOT NULL,
+            balance_after bigint NOT NULL,
+            source text,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )$sql$, v_id_type);
+
+    EXECUTE format($sql$
+        CREATE TABLE IF NOT EXISTS public.token_idempotency_keys (
+            user_id %s NOT NULL REFERENCES public.users (id),
+            key text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (user_id, key)
+        )$sql$, v_id_type);
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS token_ledger_user_id ON public.token_ledger (user_id, id);
+
+-- Ledger ist append-only
+CREATE OR REPLACE FUNCTION public.token_ledger_append_only()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RAISE EXCEPTION 'token_ledger ist append-only';
+END;
+$$;
+
+DROP TRIGGER IF EXISTS token_ledger_append_only ON public.token_ledger;
+CREATE TRIGGER token_ledger_append_only
+    BEFORE UPDATE OR DELETE ON public.token_ledger
+    FOR EACH ROW EXECUTE FUNCTION public.token_ledger_append_only();
+
+-- p_debits: [{"user_id": ..., "amount": n, "count": n, "keyed": [{"key": "...", "amount": n}, ...]}, ...]
+-- Liefert pro Benutzer den neuen Kontostand. Der Kontostand wird nie negativ: reicht er
+-- nicht (Abbuchungen mehrerer Worker), wird nur der vorhandene Rest abgebucht und die
+-- Differenz als shortfall gemeldet und im Ledger festgehalten.
+CREATE OR REPLACE FUNCTION public.apply_token_debits(p_debits jsonb, p_source text DEFAULT NULL)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_entry jsonb;
+    v_event jsonb;
+    v_user_id public.users.id%TYPE;
+    v_requested bigint;
+    v_events integer;
+    v_inserted integer;
+    v_balance bigint;
+    v_applied bigint;
+    v_result jsonb := '[]'::jsonb;
+BEGIN
+    FOR v_entry IN SELECT * FROM jsonb_array_elements(p_debits) LOOP
+        v_user_id := v_entry->>'user_id';
+        v_requested := COALESCE((v_entry->>'amount')::bigint, 0);
+        v_events := COALESCE((v_entry->>'count')::integer, 0);
+
+        -- Abbuchungen mit Idempotency-Key nur einmal zählen (auch über Worker hinweg)
+        FOR v_event IN SELECT * FROM jsonb_array_elements(COALESCE(v_entry->'keyed', '[]'::jsonb)) LOOP
+            INSERT INTO public.token_idempotency_keys (user_id, key)
+            VALUES (v_user_id, v_event->>'key')
+            ON CONFLICT DO NOTHING;
+            GET DIAGNOSTICS v_inserted = ROW_COUNT;
+            IF v_inserted = 1 THEN
+                v_requested := v_requested + (v_event->>'amount')::bigint;
+                v_events := v_events + 1;
+            END IF;
+        END LOOP;
+
+        SELECT tokens INTO v_balance FROM public.users WHERE id = v_user_id FOR UPDATE;
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+
+        v_applied := LEAST(v_requested, GREATEST(v_balance, 0));
+        IF v_applied > 0 THEN
+            UPDATE public.users SET tokens = v_balance - v_applied WHERE id = v_user_id;
+        END IF;
+        IF v_events > 0 THEN
+            INSERT INTO public.token_ledger (user_id, requested, applied, events, balance_after, source)
+            VALUES (v_user_id, v_requested, v_applied, v_events, v_balance - v_applied, p_source);
+        END IF;
+
+        v_result := v_result || jsonb_build_object(
+            'user_id', v_user_id,
+            'balance', v_balance - v_applied,
+            'applied', v_applied,
+            'shortfall', v_requested - v_applied
+        );
+    END LOOP;
+    RETURN v_result;
+END;
+$$;
@@ -0,0 +1,62 @@
+-- verify_email und reset_password als Mengenfunktionen: PostgREST liefert dann ein Array
+-- ([] oder [{...}]) statt eines einzelnen jsonb-Werts bzw. null. Der Python-Client
+-- (postgrest 0.10) akzeptiert als Antwort nur eine Liste von Objekten.
+-- Der Rückgabetyp lässt sich nicht per CREATE OR REPLACE ändern, daher DROP.
+
+DROP FUNCTION IF EXISTS public.verify_email(text);
+DROP FUNCTION IF EXISTS public.reset_password(text, text);
+
+-- /verify-email: Benutzer mit gültigem Token in einem Schritt aktivieren (keine Zeile = ungültig)
+CREATE FUNCTION public.verify_email(p_token text)
+RETURNS SETOF jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET status = 'verified',
+            verification_token = NULL,
+            verified_at = now()
+        WHERE verification_token = p_token
+          AND status = 'pending'
+        RETURNING id
+    )
+    SELECT jsonb_build_object('user_id', id) FROM updated;
+$$;
+
+-- /reset-password: Token prüfen, Passwort setzen und Token entwerten in einer Transaktion
+CREATE FUNCTION public.reset_password(p_token text, p_password_hash text)
+RETURNS SETOF jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_reset public.password_resets%ROWTYPE;
+BEGIN
+    SELECT * INTO v_reset
+    FROM public.password_resets
+    WHERE token = p_token
+      AND used = false
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN NEXT jsonb_build_object('status', 'invalid');
+        RETURN;
+    END IF;
+
+    IF v_reset.expires_at::timestamptz < now() THEN
+        RETURN NEXT jsonb_build_object('status', 'expired');
+        RETURN;
+    END IF;
+
+    UPDATE public.users
+    SET password_hash = p_password_hash,
+        updated_at = now()
+    WHERE id = v_reset.user_id;
+
+    UPDATE public.password_resets
+    SET used = true,
+        used_at = now()
+    WHERE id = v_reset.id;
+
+    RETURN NEXT jsonb_build_object('status', 'ok', 'user_id', v_reset.user_id);
+END;
+$$;
@@ -0,0 +1,48 @@
+-- Signierte Links: verify_user und reset_password_signed als Mengenfunktionen (PostgREST liefert
+-- ein Array, wie es der Python-Client erwartet).
+-- Reset-Links tragen keinen aus dem Hash abgeleiteten md5-Fingerabdruck mehr, sondern einen HMAC,
+-- den nur die App prüfen kann. reset_password_signed setzt das Passwort deshalb nur noch, wenn
+-- der Hash seit dieser Prüfung unverändert ist (Compare-and-Set), danach ist der Link verbraucht.
+
+DROP FUNCTION IF EXISTS public.verify_user(public.users.id%TYPE);
+DROP FUNCTION IF EXISTS public.reset_password_signed(public.users.id%TYPE, text, text);
+
+-- /verify-email: ausstehenden Benutzer per ID aktivieren (keine Zeile = ungültig oder bereits bestätigt)
+CREATE FUNCTION public.verify_user(p_user_id public.users.id%TYPE)
+RETURNS SETOF jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET status = 'verified',
+            verification_token = NULL,
+            verified_at = now()
+        WHERE id = p_user_id
+          AND status = 'pending'
+        RETURNING id
+    )
+    SELECT jsonb_build_object('user_id', id) FROM updated;
+$$;
+
+-- /reset-password: neuen Hash nur setzen, wenn der aktuelle noch p_current_hash ist
+CREATE FUNCTION public.reset_password_signed(
+    p_user_id public.users.id%TYPE,
+    p_current_hash text,
+    p_password_hash text
+)
+RETURNS SETOF jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE public.users
+        SET password_hash = p_password_hash,
+            updated_at = now()
+        WHERE id = p_user_id
+          AND password_hash IS NOT DISTINCT FROM p_current_hash
+        RETURNING id
+    )
+    SELECT COALESCE(
+        (SELECT jsonb_build_object('status', 'ok', 'user_id', id) FROM updated),
+        jsonb_build_object('status', 'invalid')
+    );
+$$;
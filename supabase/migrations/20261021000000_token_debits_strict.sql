@@ -0,0 +1,83 @@
+-- Token-Metering: apply_token_debits mit p_strict für synchrone Abbuchungen (metering.py).
+-- Reicht der Anteil eines Workers am Kontostand nicht, bucht er die Anfrage sofort und
+-- atomar: mit p_strict wird ein Eintrag ganz oder gar nicht gebucht. Reicht der Kontostand
+-- nicht, bleibt alles unverändert (auch die Idempotency-Keys) und das Ergebnis trägt
+-- "rejected": true. Ohne p_strict verhält sich die Funktion wie bisher (Write-Behind-Flush).
+
+DROP FUNCTION IF EXISTS public.apply_token_debits(jsonb, text);
+
+CREATE FUNCTION public.apply_token_debits(p_debits jsonb, p_source text DEFAULT NULL, p_strict boolean DEFAULT false)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_entry jsonb;
+    v_event jsonb;
+    v_user_id public.users.id%TYPE;
+    v_requested bigint;
+    v_events integer;
+    v_inserted integer;
+    v_balance bigint;
+    v_applied bigint;
+    v_result jsonb := '[]'::jsonb;
+BEGIN
+    FOR v_entry IN SELECT * FROM jsonb_array_elements(p_debits) LOOP
+        v_user_id := v_entry->>'user_id';
+        v_requested := COALESCE((v_entry->>'amount')::bigint, 0);
+        v_events := COALESCE((v_entry->>'count')::integer, 0);
+
+        -- Zuerst die Zeile sperren: alle Idempotency-Keys eines Benutzers entstehen unter dieser Sperre
+        SELECT tokens INTO v_balance FROM public.users WHERE id = v_user_id FOR UPDATE;
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+
+        IF p_strict AND v_requested + COALESCE((
+            SELECT sum((e->>'amount')::bigint)
+            FROM jsonb_array_elements(COALESCE(v_entry->'keyed', '[]'::jsonb)) AS e
+            WHERE NOT EXISTS (
+                SELECT 1 FROM public.token_idempotency_keys k
+                WHERE k.user_id = v_user_id AND k.key = e->>'key'
+            )
+        ), 0) > GREATEST(v_balance, 0) THEN
+            v_result := v_result || jsonb_build_object(
+                'user_id', v_user_id,
+                'balance', v_balance,
+                'applied', 0,
+                'shortfall', 0,
+                'rejected', true
+            );
+            CONTINUE;
+        END IF;
+
+        -- Abbuchungen mit Idempotency-Key nur einmal zählen (auch über Worker hinweg)
+        FOR v_event IN SELECT * FROM jsonb_array_elements(COALESCE(v_entry->'keyed', '[]'::jsonb)) LOOP
+            INSERT INTO public.token_idempotency_keys (user_id, key)
+            VALUES (v_user_id, v_event->>'key')
+            ON CONFLICT DO NOTHING;
+            GET DIAGNOSTICS v_inserted = ROW_COUNT;
+            IF v_inserted = 1 THEN
+                v_requested := v_requested + (v_event->>'amount')::bigint;
+                v_events := v_events + 1;
+            END IF;
+        END LOOP;
+
+        v_applied := LEAST(v_requested, GREATEST(v_balance, 0));
+        IF v_applied > 0 THEN
+            UPDATE public.users SET tokens = v_balance - v_applied WHERE id = v_user_id;
+        END IF;
+        IF v_events > 0 THEN
+            INSERT INTO public.token_ledger (user_id, requested, applied, events, balance_after, source)
+            VALUES (v_user_id, v_requested, v_applied, v_events, v_balance - v_applied, p_source);
+        END IF;
+
+        v_result := v_result || jsonb_build_object(
+            'user_id', v_user_id,
+            'balance', v_balance - v_applied,
+            'applied', v_applied,
+            'shortfall', v_requested - v_applied
+        );
+    END LOOP;
+    RETURN v_result;
+END;
+$$;
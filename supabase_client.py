@@ -0,0 +1,71 @@
+import os
+import threading
+
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+# Client schon beim Import bauen (z.B. um Fehlkonfiguration beim Deploy sofort zu sehen)
+SUPABASE_EAGER_INIT = os.environ.get('SUPABASE_EAGER_INIT', '').lower() in ('1', 'true', 'yes')
+
+def create_supabase_client():
+    """Supabase-Client bauen; supabase/postgrest/httpx werden erst hier importiert"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise RuntimeError('SUPABASE_URL und SUPABASE_KEY müssen gesetzt sein')
+    from supabase import create_client
+    from supabase_pool import install_pool
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    client.pool_transport = install_pool(client)
+    return client
+
+class LazyClient:
+    """Client wird beim ersten Zugriff gebaut und pro Prozess gemerkt.
+
+    Nach einem fork (gunicorn --preload) baut jeder Worker seinen eigenen
+    Client, statt die HTTP-Verbindungen des Master-Prozesses zu erben.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        client = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = self._factory()
+                self._pid = os.getpid()
+            return self._client
+
+    def set(self, client):
+        """Fertigen Client einsetzen (Benchmarks mit lokalen Stand-ins)"""
+        with self._lock:
+            self._client = client
+            self._pid = os.getpid()
+
+    @property
+    def initialized(self):
+        return self._client is not None and self._pid == os.getpid()
+
+    def table(self, name):
+        return self.get().table(name)
+
+    def rpc(self, name, params=None):
+        return self.get().rpc(name, params or {})
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+supabase = LazyClient(create_supabase_client)
+
+def pool_stats():
+    """Kennzahlen des Verbindungs-Pools; vor dem ersten Datenbankzugriff gibt es noch keinen"""
+    transport = getattr(supabase.get(), 'pool_transport', None) if supabase.initialized else None
+    if transport is None:
+        return {'initialized': False}
+    return {'initialized': True, **transport.stats()}
+
+if SUPABASE_EAGER_INIT:
+    supabase.get()
@@ -0,0 +1,140 @@
+import os
+import threading
+import httpx
+from postgrest.utils import SyncClient
+
+# Verbindungs-Pool für PostgREST (pro Worker-Prozess, von allen Threads geteilt)
+SUPABASE_POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', 10))
+SUPABASE_POOL_KEEPALIVE = int(os.environ.get('SUPABASE_POOL_KEEPALIVE', SUPABASE_POOL_SIZE))
+# httpx schließt Leerlauf-Verbindungen standardmäßig nach 5 s; danach kostet jeder Request einen neuen TLS-Handshake
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE_EXPIRY', 60))
+# HTTP/2 benötigt das Paket h2 (pip install httpx[http2]), sonst HTTP/1.1
+SUPABASE_HTTP2 = os.environ.get('SUPABASE_HTTP2', '').lower() in ('1', 'true', 'yes')
+# Timeouts in Sekunden; Lesezugriffe (GET) und Schreibzugriffe/RPC getrennt
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 3))
+SUPABASE_READ_TIMEOUT = float(os.environ.get('SUPABASE_READ_TIMEOUT', 5))
+SUPABASE_WRITE_TIMEOUT = float(os.environ.get('SUPABASE_WRITE_TIMEOUT', 10))
+# Maximale Wartezeit auf eine freie Verbindung, wenn der Pool ausgelastet ist
+SUPABASE_POOL_TIMEOUT = float(os.environ.get('SUPABASE_POOL_TIMEOUT', 2))
+
+READ_METHODS = ('GET', 'HEAD')
+
+def _h2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class PooledTransport(httpx.HTTPTransport):
+    """HTTP-Transport mit festen Pool-Grenzen, Timeouts pro Operation und Kennzahlen.
+
+    Ein Request gilt als "reused", wenn er ohne neuen TCP-Aufbau auskommt,
+    und als "waited", wenn beim Start alle Verbindungen des Pools belegt waren.
+    """
+
+    def __init__(self, size=SUPABASE_POOL_SIZE, keepalive=SUPABASE_POOL_KEEPALIVE,
+                 keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY, http2=SUPABASE_HTTP2,
+                 connect_timeout=SUPABASE_CONNECT_TIMEOUT, read_timeout=SUPABASE_READ_TIMEOUT,
+                 write_timeout=SUPABASE_WRITE_TIMEOUT, pool_timeout=SUPABASE_POOL_TIMEOUT, **kwargs):
+        if http2 and not _h2_available():
+            print("Supabase-Pool: h2 nicht installiert, verwende HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(max_connections=size, max_keepalive_connections=keepalive,
+                              keepalive_expiry=keepalive_expiry)
+        super().__init__(limits=limits, http2=http2, **kwargs)
+        self.size = size
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # Kennzahlen
+        self.requests = 0
+        self.connections_opened = 0
+        self.reused = 0
+        self.waited = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def timeout_for(self, method):
+        read = self.read_timeout if method in READ_METHODS else self.write_timeout
+        return {'connect': self.connect_timeout, 'read': read,
+                'write': self.write_timeout, 'pool': self.pool_timeout}
+
+    def handle_request(self, request):
+        request.extensions['timeout'] = self.timeout_for(request.method)
+        opened = []
+
+        def trace(event, info):
+            if event == 'connection.connect_tcp.complete':
+                opened.append(True)
+
+        request.extensions['trace'] = trace
+        with self._lock:
+            self.requests += 1
+            if self._in_flight >= self.size:
+                self.waited += 1
+            self._in_flight += 1
+        try:
+            response = super().handle_request(request)
+        except httpx.TimeoutException:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        except httpx.TransportError:
+            with self._lock:
+                self.errors += 1
+            raise
+        else:
+            if not opened:
+                with self._lock:
+                    self.reused += 1
+            return response
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                if opened:
+                    self.connections_opened += 1
+
+    def stats(self):
+        connections = list(self._pool.connections)
+        with self._lock:
+            return {
+                'http2': self.http2,
+                'pool_size': self.size,
+                'connections_open': len(connections),
+                'connections_idle': sum(1 for connection in connections if connection.is_idle()),
+                'connections_opened': self.connections_opened,
+                'requests': self.requests,
+                'requests_reused': self.reused,
+                'requests_waited': self.waited,
+                'in_flight': self._in_flight,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'timeouts_seconds': {
+                    'connect': self.connect_timeout,
+                    'read': self.read_timeout,
+                    'write': self.write_timeout,
+                    'pool': self.pool_timeout
+                }
+            }
+
+def install_pool(client, transport=None):
+    """HTTP-Session des PostgREST-Clients durch eine mit PooledTransport ersetzen"""
+    transport = transport or PooledTransport()
+    postgrest = client.postgrest
+    session = postgrest.session
+    postgrest.session = SyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=httpx.Timeout(transport.read_timeout, connect=transport.connect_timeout,
+                              write=transport.write_timeout, pool=transport.pool_timeout),
+        transport=transport
+    )
+    session.close()
+    return transport
@@ -0,0 +1,119 @@
+"""Gemeinsame Fixtures.
+
+Die App spricht mit einem echten supabase/postgrest-Client. Dessen
+HTTP-Session läuft über einen httpx.MockTransport, den FakeSupabase
+(benchmarks/fakes.py) beantwortet: ein In-Memory-Modell in Python, kein
+PostgREST und kein Postgres. Geprüft werden so der Client-Pfad der App
+(Antwortformate, Fehlercodes, Ausnahmen) und die in Python nachgebildete
+Logik der RPCs. Die SQL-Dateien aus supabase/migrations führt kein Test
+aus; Änderungen daran müssen gegen eine echte Datenbank geprüft werden.
+"""
+import os
+import sys
+import json
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ.setdefault('PASSWORD_HASH_EXECUTOR', 'inline')
+os.environ.setdefault('PASSWORD_SCRYPT_N', '16')
+
+import fakes
+
+fakes.prepare_environment(tempfile.mkdtemp(prefix='zyrix-tests-'))
+
+import httpx
+from postgrest.exceptions import APIError
+
+def _literal(value):
+    # PostgREST-Filterwerte kommen als Text, FakeSupabase vergleicht mit Python-Typen
+    value = value.strip('"')
+    if value in ('true', 'false'):
+        return value == 'true'
+    if value == 'null':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+class FakeSupabaseTransport:
+    """HTTP-Anfragen des postgrest-Clients auf FakeSupabase abbilden (kein echtes PostgREST)"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __call__(self, request):
+        path = request.url.path.split('/rest/v1/', 1)[1]
+        body = json.loads(request.content) if request.content else None
+        try:
+            if path.startswith('rpc/'):
+                data = self.backend.call(path[4:], body or {}).data
+                return httpx.Response(200, json=data)
+            data = self.backend.execute(self._query(path, request, body)).data
+        except APIError as e:
+            return httpx.Response(409 if e.code == '23505' else 400,
+                                  json={'code': e.code, 'message': e.message, 'details': None, 'hint': None})
+        if request.method == 'POST':
+            if 'return=minimal' in request.headers.get('prefer', ''):
+                return httpx.Response(201)
+            return httpx.Response(201, json=data)
+        return httpx.Response(200, json=data)
+
+    def _query(self, table, request, body):
+        query = self.backend.table(table)
+        if request.method == 'POST':
+            query.insert(body)
+        elif request.method == 'PATCH':
+            query.update(body)
+        for key, value in request.url.params.multi_items():
+            if key == 'select':
+                query.select(value)
+            elif key == 'order':
+                column, _, direction = value.partition('.')
+                query.order(column, desc=direction.startswith('desc'))
+            elif key == 'limit':
+                query.limit(int(value))
+            else:
+                operator, _, operand = value.partition('.')
+                if operator == 'in':
+                    query.in_(key, [_literal(item) for item in operand.strip('()').split(',')])
+                else:
+                    getattr(query, operator)(key, _literal(operand))
+        return query
+
+def fake_client(backend):
+    """Echter Supabase-Client, dessen Requests das In-Memory-Modell FakeSupabase beantwortet"""
+    from supabase import create_client
+    from postgrest.utils import SyncClient
+
+    client = create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'])
+    session = client.postgrest.session
+    client.postgrest.session = SyncClient(base_url=session.base_url, headers=session.headers,
+                                          transport=httpx.MockTransport(FakeSupabaseTransport(backend)))
+    session.close()
+    return client
+
+@pytest.fixture
+def zyrix():
+    import app
+
+    return app
+
+@pytest.fixture
+def supabase(zyrix, monkeypatch):
+    """Leere In-Memory-Datenbank hinter dem echten Client, frischer Cache"""
+    backend = fakes.FakeSupabase()
+    zyrix.supabase.set(fake_client(backend))
+    zyrix.user_cache.clear()
+    # Keine Zustellversuche an den echten SMTP-Server
+    monkeypatch.setattr(zyrix.outbox, 'start', lambda: None)
+    return backend
+
+@pytest.fixture
+def client(zyrix, supabase):
+    return zyrix.app.test_client()
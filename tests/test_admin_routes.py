@@ -0,0 +1,26 @@
+"""Status-Routen nur mit ADMIN_TOKEN (auth.require_admin)"""
+import pytest
+
+import auth
+
+STATUS_ROUTES = [
+    '/outbox-status',
+    '/cache-status',
+    '/repository-stats',
+    '/supabase-pool-status',
+    '/metering-status',
+    '/circuit-status',
+    '/user-stream-status',
+    '/rate-limit-status',
+]
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(auth, 'ADMIN_TOKEN', 'admin-test')
+    return {'Authorization': 'Bearer admin-test'}
+
+@pytest.mark.parametrize('path', STATUS_ROUTES)
+def test_status_route_requires_admin(client, admin, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer falsch'}).status_code == 401
+    assert client.get(path, headers=admin).status_code == 200
@@ -0,0 +1,87 @@
+"""/register, /verify-email und /reset-password über den echten postgrest-Client"""
+from datetime import datetime, timedelta
+
+import pytest
+
+REGISTRATION = {
+    'full_name': 'Erika Mustermann', 'email': 'erika@example.com', 'password': 'Geheim-123',
+    'strasse': 'Musterweg 1', 'plz': '41363', 'stadt': 'Jüchen', 'land': 'Deutschland'
+}
+
+def add_user(supabase, **fields):
+    row = {'email': 'max@example.com', 'full_name': 'Max', 'tokens': 1200, 'status': 'verified',
+           'password_hash': 'alt', 'verification_token': None}
+    row.update(fields)
+    row.setdefault('id', len(supabase.tables['users']) + 1)
+    supabase.tables['users'].append(row)
+    return row
+
+def add_reset(supabase, user_id, token, expires_in):
+    supabase.tables['password_resets'].append({
+        'id': len(supabase.tables['password_resets']) + 1, 'user_id': user_id, 'token': token,
+        'expires_at': (datetime.utcnow() + expires_in).isoformat(), 'used': False
+    })
+
+@pytest.mark.parametrize('link_format', ['signed', 'database'])
+def test_register_duplicate_email(client, zyrix, supabase, monkeypatch, link_format):
+    monkeypatch.setattr(zyrix, 'LINK_TOKEN_FORMAT', link_format)
+
+    response = client.post('/register', json=REGISTRATION)
+    assert response.status_code == 201
+    assert response.get_json()['status'] == 'pending_verification'
+    assert [row['status'] for row in supabase.tables['users']] == ['pending']
+
+    response = client.post('/register', json=dict(REGISTRATION, full_name='Noch einmal'))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'E-Mail-Adresse bereits registriert'}
+    assert len(supabase.tables['users']) == 1
+
+def test_verify_email_database_token(client, supabase):
+    user = add_user(supabase, status='pending', verification_token='bestaetigung-1')
+
+    response = client.get('/verify-email?token=bestaetigung-1')
+    assert response.status_code == 200
+    assert user['status'] == 'verified'
+    assert user['verification_token'] is None
+
+    # Token ist verbraucht
+    response = client.get('/verify-email?token=bestaetigung-1')
+    assert response.status_code == 400
+
+def test_verify_email_unknown_token(client, supabase):
+    add_user(supabase, status='pending', verification_token='bestaetigung-1')
+
+    response = client.get('/verify-email?token=unbekannt')
+    assert response.status_code == 400
+    assert 'ungültig' in response.get_data(as_text=True)
+    assert supabase.tables['users'][0]['status'] == 'pending'
+
+def test_reset_password_database_token(client, supabase):
+    user = add_user(supabase)
+    add_reset(supabase, user['id'], 'reset-1', timedelta(hours=1))
+
+    response = client.post('/reset-password', json={'token': 'reset-1', 'password': 'Neu-456'})
+    assert response.status_code == 200
+    assert user['password_hash'] != 'alt'
+    assert supabase.tables['password_resets'][0]['used'] is True
+
+    response = client.post('/reset-password', json={'token': 'reset-1', 'password': 'Nochmal-789'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Ungültiger oder bereits verwendeter Reset-Link'}
+
+def test_reset_password_unknown_token(client, supabase):
+    user = add_user(supabase)
+
+    response = client.post('/reset-password', json={'token': 'unbekannt', 'password': 'Neu-456'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Ungültiger oder bereits verwendeter Reset-Link'}
+    assert user['password_hash'] == 'alt'
+
+def test_reset_password_expired_token(client, supabase):
+    user = add_user(supabase)
+    add_reset(supabase, user['id'], 'reset-alt', -timedelta(minutes=1))
+
+    response = client.post('/reset-password', json={'token': 'reset-alt', 'password': 'Neu-456'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Reset-Link ist abgelaufen'}
+    assert user['password_hash'] == 'alt'
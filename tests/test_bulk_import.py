@@ -0,0 +1,28 @@
+"""Massenimport (bulk_import.py): Zustellung der Bestätigungs-E-Mails"""
+import sys
+
+import pytest
+
+import bulk_import
+from outbox import Outbox
+
+def test_requires_existing_outbox_without_send(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'kunden.csv'
+    path.write_text('full_name,email\n')
+    monkeypatch.setenv('OUTBOX_DB_PATH', str(tmp_path / 'fehlt.sqlite3'))
+    monkeypatch.setattr(sys, 'argv', ['bulk_import.py', str(path)])
+
+    with pytest.raises(SystemExit):
+        bulk_import.main()
+    assert 'OUTBOX_DB_PATH' in capsys.readouterr().err
+
+def test_send_drains_throttled_outbox(tmp_path):
+    sent = []
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite3'), lambda *message: sent.append(message[0]) or True,
+                    backoff_base=0)
+    outbox.enqueue_many([(f'kunde-{i}@example.com', 'Bestätigung', '<p>Hallo</p>') for i in range(3)],
+                        interval=0.05)
+
+    bulk_import.drain_outbox(outbox, poll_interval=0.01)
+    assert outbox.pending_count() == 0
+    assert sent == [f'kunde-{i}@example.com' for i in range(3)]
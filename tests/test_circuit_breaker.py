@@ -0,0 +1,224 @@
+"""Circuit-Breaker (circuit_breaker.py) und Ausfälle von Supabase und SMTP mit lokalen Stand-ins"""
+import smtplib
+import sqlite3
+import types
+
+import httpx
+import pytest
+
+import circuit_breaker
+import repository
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, RETRY_BUDGET_MIN
+from outbox import Outbox
+from smtp_pool import is_outage as is_smtp_outage
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+@pytest.fixture
+def make_breaker(monkeypatch):
+    """Breaker mit Test-Parametern; die Registry wird danach wiederhergestellt"""
+    monkeypatch.setattr(circuit_breaker, '_registry', dict(circuit_breaker._registry))
+
+    def make(name='test', **kwargs):
+        options = {'min_calls': 100, 'consecutive_failures': 100, 'retries': 0, 'open_seconds': 10, 'enabled': True}
+        options.update(kwargs)
+        return CircuitBreaker(name, **options)
+
+    return make
+
+def ok():
+    return 'ok'
+
+def fail():
+    raise httpx.ConnectError('nicht erreichbar')
+
+def attempt(breaker, fn):
+    try:
+        return breaker.call(fn)
+    except (httpx.TransportError, CircuitOpenError) as e:
+        return e
+
+def test_opens_on_failure_rate(clock, make_breaker):
+    breaker = make_breaker(min_calls=10, failure_rate=0.5)
+    for i in range(9):
+        attempt(breaker, fail if i % 2 else ok)
+    assert breaker.state == CLOSED
+
+    attempt(breaker, fail)
+    assert breaker.state == OPEN
+    assert isinstance(attempt(breaker, ok), CircuitOpenError)
+    assert breaker.rejected == 1
+
+def test_failure_rate_window_expires(clock, make_breaker):
+    breaker = make_breaker(min_calls=4, failure_rate=0.5, window=10)
+    attempt(breaker, fail)
+    attempt(breaker, fail)
+    clock.now += 11
+    attempt(breaker, ok)
+    attempt(breaker, ok)
+    attempt(breaker, fail)
+    assert breaker.state == CLOSED
+
+def test_opens_on_consecutive_failures(clock, make_breaker):
+    breaker = make_breaker(consecutive_failures=3)
+    attempt(breaker, fail)
+    attempt(breaker, fail)
+    attempt(breaker, ok)
+    attempt(breaker, fail)
+    attempt(breaker, fail)
+    assert breaker.state == CLOSED
+
+    attempt(breaker, fail)
+    assert breaker.state == OPEN
+
+def test_business_errors_do_not_open(clock, make_breaker):
+    breaker = make_breaker(consecutive_failures=2, is_failure=repository.is_supabase_outage)
+    for _ in range(5):
+        with pytest.raises(AttributeError):
+            breaker.call(lambda: None.get('user_id'))
+    assert breaker.state == CLOSED
+
+def test_half_open_probe_reopens_and_closes(clock, make_breaker):
+    breaker = make_breaker(consecutive_failures=1, open_seconds=10)
+    attempt(breaker, fail)
+    assert breaker.state == OPEN
+    assert not breaker.available()
+
+    clock.now += 10
+    assert breaker.available()
+    assert isinstance(attempt(breaker, fail), httpx.ConnectError)
+    assert breaker.state == OPEN
+    # Auch das erneute Öffnen nach einer gescheiterten Probe zählt
+    assert breaker.opened == 2
+    assert isinstance(attempt(breaker, ok), CircuitOpenError)
+
+    clock.now += 10
+
+    def probe():
+        # Während die Probe läuft, wird kein zweiter Aufruf durchgelassen
+        assert isinstance(attempt(breaker, ok), CircuitOpenError)
+        return 'ok'
+
+    assert breaker.call(probe) == 'ok'
+    assert breaker.state == CLOSED
+    assert breaker.call(ok) == 'ok'
+
+def test_retries_limited_by_budget(clock, make_breaker):
+    breaker = make_breaker(retries=2, retry_budget=0.2)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise httpx.ReadTimeout('zu langsam')
+
+    for _ in range(30):
+        attempt(breaker, flaky)
+    retries = len(calls) - 30
+    assert retries == breaker.retried
+    # Ohne Budget wären es 60 Wiederholungen; geprüft wird vor jeder weiteren, daher höchstens eine darüber
+    assert 0 < retries <= max(0.2 * len(calls), RETRY_BUDGET_MIN) + 1
+    assert breaker.retries_denied > 0
+
+def test_retry_only_when_allowed(clock, make_breaker):
+    breaker = make_breaker(retries=2)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise httpx.ReadTimeout('zu langsam')
+
+    with pytest.raises(httpx.ReadTimeout):
+        breaker.call(failing, retry=lambda e: False)
+    assert len(calls) == 1
+
+    with pytest.raises(httpx.ReadTimeout):
+        breaker.call(failing)
+    assert len(calls) == 4
+
+@pytest.fixture
+def supabase_breaker(make_breaker, monkeypatch):
+    breaker = make_breaker('supabase', is_failure=repository.is_supabase_outage, consecutive_failures=3,
+                           open_seconds=30)
+    monkeypatch.setattr(repository, 'supabase_breaker', breaker)
+    return breaker
+
+def test_open_circuit_returns_503_with_retry_after(client, supabase, supabase_breaker):
+    supabase.set_outage(httpx.ReadTimeout('Supabase antwortet nicht'))
+    body = {'email': 'kunde@example.com'}
+    statuses = [client.post('/request-password-reset', json=body).status_code for _ in range(3)]
+    assert statuses == [500, 500, 500]
+    assert supabase_breaker.state == OPEN
+
+    calls = supabase.calls
+    response = client.post('/request-password-reset', json=body)
+    assert response.status_code == 503
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert supabase.calls == calls
+
+    response = client.get('/verify-email?token=irgendein-token')
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert client.get('/').get_json()['status'] == 'degraded'
+
+def test_application_errors_keep_circuit_closed(client, supabase, supabase_breaker):
+    # Fehler in unserem Code (z.B. unerwartete Antwortform) sind kein Ausfall von Supabase
+    supabase.set_outage(AttributeError("'NoneType' object has no attribute 'get'"))
+    for _ in range(10):
+        assert client.get('/verify-email?token=ungueltig').status_code == 500
+    assert supabase_breaker.state == CLOSED
+
+def test_outbox_waits_while_smtp_circuit_open(tmp_path, clock, make_breaker):
+    breaker = make_breaker('smtp-test', is_failure=is_smtp_outage, consecutive_failures=2, open_seconds=30)
+    server = {'up': False, 'batches': 0}
+
+    def send_many(messages):
+        server['batches'] += 1
+        if not server['up']:
+            raise smtplib.SMTPServerDisconnected('Verbindung getrennt')
+        return [True] * len(messages)
+
+    def batch_sender(messages):
+        try:
+            return breaker.call(lambda: send_many(messages))
+        except Exception as e:
+            return [e] * len(messages)
+
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite3'), lambda *message: True, batch_sender=batch_sender,
+                    max_attempts=5, backoff_base=0, available=breaker.available)
+    # Zustellung nur über process_due() im Test, kein Hintergrund-Worker
+    outbox.start = lambda: None
+    for i in range(3):
+        outbox.enqueue(f'kunde-{i}@example.com', 'Test', '<p>Test</p>', 'Test')
+
+    assert outbox.process_due() == 3
+    assert outbox.process_due() == 3
+    assert breaker.state == OPEN
+
+    # Offener Circuit: nichts abholen, keine Zustellversuche verbrauchen
+    for _ in range(5):
+        assert outbox.process_due() == 0
+    assert server['batches'] == 2
+    conn = sqlite3.connect(outbox.path)
+    assert conn.execute("SELECT status, attempts FROM outbox").fetchall() == [('pending', 2)] * 3
+
+    # Nach open_seconds geht die Probe durch und der Versand läuft weiter
+    server['up'] = True
+    clock.now += 30
+    assert outbox.process_due() == 3
+    assert breaker.state == CLOSED
+    assert outbox.pending_count() == 0
+    conn.close()
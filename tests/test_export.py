@@ -0,0 +1,35 @@
+"""Admin-Export (export.py) über den echten postgrest-Client"""
+import json
+
+import httpx
+import pytest
+
+import auth
+import repository
+
+from test_atomic_flows import add_user
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(auth, 'ADMIN_TOKEN', 'admin-test')
+    return {'Authorization': 'Bearer admin-test'}
+
+def test_export_reads_past_short_pages(client, zyrix, supabase, admin, monkeypatch):
+    for i in range(7):
+        add_user(supabase, email=f'kunde-{i}@example.com')
+    page_after = zyrix.users.page_after
+    # PostgREST mit max-rows=2: jede Seite ist kürzer als angefordert
+    monkeypatch.setattr(zyrix.users, 'page_after', lambda columns, after_id, limit: page_after(columns, after_id, 2))
+
+    response = client.get('/admin/export/users?columns=email', headers=admin)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['email'] for row in rows] == [f'kunde-{i}@example.com' for i in range(7)]
+
+def test_export_fails_before_streaming(client, supabase, admin, monkeypatch):
+    monkeypatch.setattr(repository.supabase_breaker, 'enabled', False)
+    supabase.set_outage(httpx.ConnectError('Supabase nicht erreichbar'))
+
+    response = client.get('/admin/export/users?format=csv', headers=admin)
+    assert response.status_code == 500
+    assert response.mimetype == 'application/json'
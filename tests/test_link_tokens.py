@@ -0,0 +1,78 @@
+"""Signierte Bestätigungs- und Reset-Links (link_tokens.py und die Endpunkte)"""
+import hashlib
+
+import pytest
+
+from link_tokens import LinkTokenSigner, InvalidLinkToken, ExpiredLinkToken, PURPOSE_RESET, PURPOSE_VERIFY
+
+from test_atomic_flows import add_user
+
+def test_roundtrip_and_purpose():
+    signer = LinkTokenSigner('geheim')
+    claims = signer.verify(signer.verification_token(7), PURPOSE_VERIFY)
+    assert claims['u'] == 7
+    with pytest.raises(InvalidLinkToken):
+        signer.verify(signer.verification_token(7), PURPOSE_RESET)
+
+def test_tampered_expired_and_non_ascii():
+    signer = LinkTokenSigner('geheim')
+    token = signer.verification_token(7)
+    with pytest.raises(InvalidLinkToken):
+        LinkTokenSigner('anderes-geheimnis').verify(token, PURPOSE_VERIFY)
+    with pytest.raises(ExpiredLinkToken):
+        signer.verify(signer.sign(PURPOSE_VERIFY, 7, -1), PURPOSE_VERIFY)
+    for broken in ('ä' + token, token + 'ü', 'äöü.ß'):
+        with pytest.raises(InvalidLinkToken):
+            signer.verify(broken, PURPOSE_VERIFY)
+
+def test_reset_fingerprint_is_keyed():
+    signer = LinkTokenSigner('geheim')
+    password_hash = hashlib.sha256(b'passwort').hexdigest()
+    claims = signer.verify(signer.reset_token(7, password_hash), PURPOSE_RESET)
+    # Kein unverschlüsselter Hash-Auszug im Link, der offline gegen Passwörter getestet werden könnte
+    assert claims['f'] != hashlib.md5(password_hash.encode()).hexdigest()[:16]
+    assert claims['f'] != LinkTokenSigner('anderes-geheimnis').fingerprint(password_hash)
+    assert signer.matches_fingerprint(claims['f'], password_hash)
+    assert not signer.matches_fingerprint(claims['f'], 'neuer-hash')
+    assert not signer.matches_fingerprint(None, password_hash)
+
+def test_verify_email_signed(client, zyrix, supabase):
+    user = add_user(supabase, status='pending')
+    token = zyrix.link_tokens.verification_token(user['id'])
+
+    assert client.get(f'/verify-email?token={token}').status_code == 200
+    assert user['status'] == 'verified'
+    assert client.get(f'/verify-email?token={token}').status_code == 400
+
+def test_verify_email_non_ascii_token(client, zyrix, supabase):
+    token = zyrix.link_tokens.verification_token(add_user(supabase, status='pending')['id'])
+
+    response = client.get('/verify-email', query_string={'token': 'ä' + token})
+    assert response.status_code == 400
+    assert supabase.tables['users'][0]['status'] == 'pending'
+
+def test_reset_password_signed(client, zyrix, supabase):
+    user = add_user(supabase)
+    token = zyrix.link_tokens.reset_token(user['id'], user['password_hash'])
+
+    response = client.post('/reset-password', json={'token': token, 'password': 'Neu-456'})
+    assert response.status_code == 200
+    assert user['password_hash'] != 'alt'
+
+    # Der Hash hat sich geändert, der Link ist verbraucht
+    response = client.post('/reset-password', json={'token': token, 'password': 'Nochmal-789'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Ungültiger oder bereits verwendeter Reset-Link'}
+
+def test_reset_password_signed_invalid_and_expired(client, zyrix, supabase):
+    user = add_user(supabase)
+    expired = zyrix.link_tokens.sign(PURPOSE_RESET, user['id'], -1, zyrix.link_tokens.fingerprint('alt'))
+    foreign = LinkTokenSigner('anderes-geheimnis').reset_token(user['id'], 'alt')
+
+    response = client.post('/reset-password', json={'token': expired, 'password': 'Neu-456'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Reset-Link ist abgelaufen'}
+    for token in (foreign, 'ä' + zyrix.link_tokens.reset_token(user['id'], 'alt')):
+        response = client.post('/reset-password', json={'token': token, 'password': 'Neu-456'})
+        assert response.status_code == 400
+    assert user['password_hash'] == 'alt'
@@ -0,0 +1,25 @@
+"""E-Mail-Vorlagen (mail_templates.py): Konfiguration der Standardsprache"""
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def default_locale(value):
+    # Eigener Prozess: MAIL_DEFAULT_LOCALE wird beim Import gelesen
+    env = dict(os.environ, MAIL_DEFAULT_LOCALE=value)
+    result = subprocess.run(
+        [sys.executable, '-c', 'import mail_templates as m; print(m.MAIL_DEFAULT_LOCALE); '
+                               'print(m.render_mail("verification", None, name="Max", link="https://x")[0])'],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout.splitlines()
+
+@pytest.mark.parametrize('value, expected', [('en', 'en'), (' EN ', 'en'), ('fr', 'de'), ('', 'de')])
+def test_default_locale_falls_back_to_supported(value, expected):
+    locale, subject = default_locale(value)[-2:]
+    assert locale == expected
+    # E-Mails ohne Accept-Language werden weiter gerendert
+    assert ('bestätigen' in subject) == (expected == 'de')
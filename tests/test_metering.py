@@ -0,0 +1,153 @@
+"""Token-Metering (metering.py): Anteil pro Worker und Journal der offenen Abbuchungen"""
+import os
+
+import pytest
+
+from metering import TokenMeter, DebitJournal, InsufficientTokens
+
+class Ledger:
+    """Stand-in für users.tokens und apply_token_debits (Kontostand nie negativ)"""
+
+    def __init__(self, **balances):
+        self.balances = balances
+        self.calls = 0
+        self.fail = False
+
+    def load_balance(self, user_id):
+        return self.balances.get(user_id)
+
+    def apply_debits(self, entries, source, strict=False):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('Supabase nicht erreichbar')
+        results = []
+        for entry in entries:
+            requested = entry['amount'] + sum(item['amount'] for item in entry['keyed'])
+            balance = self.balances[entry['user_id']]
+            if strict and requested > max(balance, 0):
+                results.append({'user_id': entry['user_id'], 'balance': balance, 'applied': 0, 'shortfall': 0,
+                                'rejected': True})
+                continue
+            applied = min(requested, max(balance, 0))
+            self.balances[entry['user_id']] = balance - applied
+            results.append({'user_id': entry['user_id'], 'balance': balance - applied, 'applied': applied,
+                            'shortfall': requested - applied})
+        return results
+
+def make_meter(ledger, **kwargs):
+    kwargs.setdefault('flush_interval', 0)
+    return TokenMeter(ledger.load_balance, ledger.apply_debits, **kwargs)
+
+def spend(meter, user_id, amount):
+    spent = 0
+    while True:
+        try:
+            meter.consume(user_id, amount)
+        except InsufficientTokens:
+            return spent
+        spent += amount
+
+def test_workers_together_stay_within_balance():
+    ledger = Ledger(kunde=100)
+    meters = [make_meter(ledger, workers=4, flush_interval=60) for _ in range(4)]
+    # Alle Worker laden denselben Kontostand, bevor einer schreibt
+    spent = sum(spend(meter, 'kunde', 5) for meter in meters)
+    for meter in meters:
+        meter.flush()
+    assert spent == 100
+    assert ledger.balances['kunde'] == 0
+    assert sum(meter.shortfall for meter in meters) == 0
+
+def test_exhausted_share_flushes_and_reloads():
+    ledger = Ledger(kunde=100)
+    meter = make_meter(ledger, workers=4)
+    assert spend(meter, 'kunde', 1) == 100
+    assert ledger.balances['kunde'] == 0
+    assert meter.refreshes > 0
+
+    # Gutschrift: die nächste Abbuchung sieht den neuen Kontostand
+    ledger.balances['kunde'] = 40
+    assert meter.consume('kunde', 10)['tokens'] == 30
+    assert ledger.balances['kunde'] == 40
+    sync_debits = meter.sync_debits
+    # Anteil (10) aufgebraucht: synchron gebucht, samt der offenen Abbuchung
+    assert meter.consume('kunde', 10)['tokens'] == 20
+    assert ledger.balances['kunde'] == 20
+    assert meter.sync_debits == sync_debits + 1
+    with pytest.raises(InsufficientTokens) as error:
+        meter.consume('kunde', 25)
+    assert error.value.available == 20
+
+def test_debit_above_share_is_booked_synchronously():
+    ledger = Ledger(kunde=3)
+    meter = make_meter(ledger, workers=4, flush_interval=60)
+    # Anteil ceil(3 / 4) = 1, der Kontostand reicht aber für 2
+    assert meter.consume('kunde', 2) == {'consumed': 2, 'tokens': 1, 'replayed': False}
+    assert ledger.balances['kunde'] == 1
+    with pytest.raises(InsufficientTokens):
+        meter.consume('kunde', 2)
+    assert ledger.balances['kunde'] == 1
+
+def test_rejected_sync_debit_keeps_pending_debits():
+    ledger = Ledger(kunde=8)
+    meter = make_meter(ledger, workers=2, flush_interval=60)
+    meter.consume('kunde', 4)
+    # Ein anderer Worker hat inzwischen gebucht, der Stand ist nicht mehr aktuell
+    ledger.balances['kunde'] = 5
+    meter._accounts['kunde'].last_synced = 0
+    with pytest.raises(InsufficientTokens):
+        meter.consume('kunde', 3)
+    assert ledger.balances['kunde'] == 5
+    assert meter.flush() == 1
+    assert ledger.balances['kunde'] == 1
+
+def test_journal_survives_crashed_worker(tmp_path):
+    path = str(tmp_path / 'metering.sqlite3')
+    ledger = Ledger(kunde=100)
+    crashed = make_meter(ledger, journal=DebitJournal(path, owner='worker-1'))
+    crashed.consume('kunde', 10)
+    crashed.consume('kunde', 5, idempotency_key='auftrag-1')
+    assert ledger.balances['kunde'] == 100
+
+    # Worker-1 meldet sich nicht mehr; ein anderer schreibt seine Abbuchungen nach
+    survivor = make_meter(ledger, journal=DebitJournal(path, lease_seconds=0, owner='worker-2'))
+    assert survivor.flush() == 1
+    assert ledger.balances['kunde'] == 85
+    assert survivor.recovered == 2
+    assert survivor.journal.count() == 0
+    assert survivor.flush() == 0
+
+def test_journal_keeps_debits_until_written(tmp_path):
+    ledger = Ledger(kunde=100)
+    meter = make_meter(ledger, journal=DebitJournal(str(tmp_path / 'metering.sqlite3')))
+    meter.consume('kunde', 10)
+    assert meter.journal.count() == 1
+
+    ledger.fail = True
+    with pytest.raises(ConnectionError):
+        meter.flush()
+    assert meter.journal.count() == 1
+
+    ledger.fail = False
+    meter.flush()
+    assert meter.journal.count() == 0
+    assert ledger.balances['kunde'] == 90
+
+def test_journal_owner_is_random_per_process(tmp_path, monkeypatch):
+    journal = DebitJournal(str(tmp_path / 'metering.sqlite3'))
+    owner = journal.owner
+    assert journal.owner == owner
+    assert DebitJournal(journal.path).owner != owner
+    # Nach fork mit wiederverwendeter PID: neue Kennung
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert journal.owner != owner
+
+def test_live_worker_keeps_its_journal(tmp_path):
+    path = str(tmp_path / 'metering.sqlite3')
+    ledger = Ledger(kunde=100)
+    first = make_meter(ledger, journal=DebitJournal(path, owner='worker-1'))
+    first.consume('kunde', 10)
+    second = make_meter(ledger, journal=DebitJournal(path, owner='worker-2'))
+    assert second.flush() == 0
+    assert first.flush() == 1
+    assert ledger.balances['kunde'] == 90
@@ -0,0 +1,22 @@
+"""E-Mail-Outbox (outbox.py): Sammelversand"""
+import sqlite3
+
+from outbox import Outbox
+
+def test_rows_without_batch_result_are_retried(tmp_path):
+    # Sammelversand meldet nur für die erste Nachricht ein Ergebnis
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite3'), lambda *message: True,
+                    batch_sender=lambda messages: [True], backoff_base=0)
+    outbox.start = lambda: None
+    for i in range(3):
+        outbox.enqueue(f'kunde-{i}@example.com', 'Test', '<p>Test</p>', 'Test')
+
+    assert outbox.process_due() == 3
+    conn = sqlite3.connect(outbox.path)
+    rows = conn.execute('SELECT to_email, status, attempts, last_error FROM outbox ORDER BY id').fetchall()
+    conn.close()
+    assert rows == [
+        ('kunde-1@example.com', 'pending', 1, 'Kein Ergebnis vom Sammelversand'),
+        ('kunde-2@example.com', 'pending', 1, 'Kein Ergebnis vom Sammelversand'),
+    ]
+    assert outbox.stats()['worker']['sent'] == 1
@@ -0,0 +1,73 @@
+"""Passwort-Hashing (passwords.py): Überlast wird zu 503 mit Retry-After"""
+import threading
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy, _verify
+
+from test_atomic_flows import REGISTRATION, add_user
+
+def test_full_queue_raises_busy():
+    hasher = PasswordHasher(n=16, executor='thread', workers=1, queue_size=0, timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    def occupy():
+        # Belegt den einzigen Platz; je nach Timing läuft er selbst in das Zeitlimit
+        try:
+            hasher._run(slow)
+        except PasswordHasherBusy:
+            pass
+
+    worker = threading.Thread(target=occupy)
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(PasswordHasherBusy) as error:
+            hasher.hash('Geheim-123')
+        assert error.value.retry_after >= 1
+    finally:
+        release.set()
+        worker.join()
+        hasher.shutdown()
+
+def test_timed_out_job_keeps_its_slot():
+    hasher = PasswordHasher(n=16, executor='thread', workers=1, queue_size=0, timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            hasher._run(release.wait, 5)
+        # Der Auftrag läuft noch: der Platz bleibt belegt
+        with pytest.raises(PasswordHasherBusy, match='ausgelastet'):
+            hasher.hash('Geheim-123')
+        release.set()
+        hasher._executor.submit(lambda: None).result(5)
+        assert hasher.verify('Geheim-123', hasher.hash('Geheim-123'))
+    finally:
+        release.set()
+        hasher.shutdown()
+
+@pytest.mark.parametrize('stored', ['scrypt$16$8', 'scrypt$x$8$1$AAAA$AAAA', 'scrypt$16$8$1$%%%$AAAA'])
+def test_malformed_hash_does_not_verify(stored):
+    assert _verify('Geheim-123', stored) is False
+
+@pytest.fixture
+def busy_hasher(zyrix, monkeypatch):
+    def busy(*args):
+        raise PasswordHasherBusy('Passwort-Hashing ausgelastet', retry_after=3)
+
+    monkeypatch.setattr(zyrix.password_hasher, 'hash', busy)
+    monkeypatch.setattr(zyrix.password_hasher, 'verify', busy)
+
+@pytest.mark.parametrize('path, body', [
+    ('/register', REGISTRATION),
+    ('/login', {'email': 'max@example.com', 'password': 'Geheim-123'}),
+])
+def test_busy_hasher_returns_503(client, supabase, busy_hasher, path, body):
+    add_user(supabase)
+    response = client.post(path, json=body)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
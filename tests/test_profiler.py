@@ -0,0 +1,37 @@
+"""Sampling-Profiler (profiler.py): Auswertung pro Sitzung"""
+import os
+
+import pytest
+
+import auth
+from profiler import SamplingProfiler
+
+def write_samples(profiler, session, pid, lines):
+    with open(os.path.join(profiler.directory, f'{session}-{pid}.collapsed'), 'w') as f:
+        f.writelines(f'{line}\n' for line in lines)
+
+def test_collapsed_only_merges_current_session(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path))
+    old = profiler.start(60)['session']
+    current = profiler.start(60)['session']
+
+    # Ein Worker schreibt nach dem Neustart noch Samples der alten Sitzung
+    write_samples(profiler, old, 101, ['app:login 50'])
+    write_samples(profiler, current, 101, ['app:home 3', 'app:login 1'])
+    write_samples(profiler, current, 102, ['app:home 2'])
+
+    assert profiler.collapsed() == 'app:home 5\napp:login 1\n'
+    assert profiler.collapsed(old) == 'app:login 50\n'
+    assert profiler.status()['worker_files'] == 2
+
+@pytest.mark.parametrize('session', ['*', '../etc', 'ABCDEF12', '1234567', '[0-9]*'])
+def test_profile_rejects_invalid_session(client, monkeypatch, session):
+    monkeypatch.setattr(auth, 'ADMIN_TOKEN', 'admin-test')
+    response = client.get('/admin/profiler/profile', query_string={'session': session},
+                          headers={'Authorization': 'Bearer admin-test'})
+    assert response.status_code == 400
+
+def test_invalid_session_matches_no_files(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path))
+    write_samples(profiler, profiler.start(60)['session'], 101, ['app:home 1'])
+    assert profiler.collapsed('*') == ''
@@ -0,0 +1,30 @@
+"""Rate-Limits pro IP hinter dem Render-Proxy (ratelimit.py)"""
+import pytest
+
+import ratelimit
+
+@pytest.fixture
+def reset_limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'RATE_LIMIT_ENABLED', True)
+    limiter = ratelimit.limiters['request-password-reset:ip']
+    monkeypatch.setattr(limiter, '_buckets', {})
+    return limiter
+
+def request_reset(client, email, forwarded, remote='10.0.0.1'):
+    return client.post('/request-password-reset', json={'email': email},
+                       headers={'X-Forwarded-For': forwarded}, environ_base={'REMOTE_ADDR': remote})
+
+def test_spoofed_forwarded_for_does_not_bypass_ip_limit(client, reset_limiter):
+    statuses = [
+        request_reset(client, f'kunde-{i}@example.com', f'198.51.100.{i}, 203.0.113.7').status_code
+        for i in range(reset_limiter.capacity + 1)
+    ]
+    assert statuses[:-1] == [200] * reset_limiter.capacity
+    assert statuses[-1] == 429
+    assert list(reset_limiter._buckets) == ['203.0.113.7']
+
+def test_forwarded_for_keeps_clients_apart(client, reset_limiter):
+    for i in range(reset_limiter.capacity):
+        request_reset(client, f'kunde-{i}@example.com', '203.0.113.7')
+    assert request_reset(client, 'kunde@example.com', '203.0.113.7').status_code == 429
+    assert request_reset(client, 'kunde@example.com', '203.0.113.8').status_code == 200
@@ -0,0 +1,27 @@
+"""Shared-Memory-Cache (shared_cache.py)"""
+from shared_cache import SharedMemoryCache, SHARED_CACHE_FORMAT, SLOT
+
+def test_file_name_carries_format_version(tmp_path):
+    cache = SharedMemoryCache('users', 64, 60, directory=str(tmp_path))
+    assert f'zyrix-cache-v{SHARED_CACHE_FORMAT}-users-' in cache.path
+
+def test_corrupt_slot_is_a_miss_and_cleared(tmp_path):
+    cache = SharedMemoryCache('users', 64, 60, directory=str(tmp_path))
+    cache.set(7, {'tokens': 1200})
+    assert cache.get(7) == {'tokens': 1200}
+
+    # Wert im Slot überschreiben, z.B. von einem Worker mit anderer Kodierung
+    mm = cache._open()
+    key_bytes, key_hash, bucket = cache._bucket(7)
+    offset = cache._find(mm, bucket, key_bytes, key_hash)
+    _, _, _, key_len, value_len = SLOT.unpack_from(mm, offset)
+    start = offset + SLOT.size + key_len
+    mm[start:start + value_len] = b'\xff' * value_len
+
+    assert cache.get(7, 'fehlt') == 'fehlt'
+    assert cache._find(mm, bucket, key_bytes, key_hash) is None
+    assert cache.stats()['errors'] == 1
+    assert cache.misses == 1
+
+    cache.set(7, {'tokens': 1100})
+    assert cache.get(7) == {'tokens': 1100}
@@ -0,0 +1,23 @@
+"""Live-Kontostand (/user-info/stream, user_stream.py): Anmeldungen werden wieder freigegeben"""
+import time
+
+import jwt
+
+from test_atomic_flows import add_user
+
+def bearer(zyrix, user_id):
+    token = jwt.encode({'user_id': user_id, 'exp': int(time.time()) + 60}, zyrix.app.config['SECRET_KEY'],
+                       algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+def test_disconnect_before_first_event_unsubscribes(zyrix, supabase):
+    user = add_user(supabase)
+    before = zyrix.user_feed.stats()['connections']
+
+    with zyrix.app.test_request_context('/user-info/stream', headers=bearer(zyrix, user['id'])):
+        response = zyrix.app.full_dispatch_request()
+        assert response.status_code == 200
+        assert zyrix.user_feed.stats()['connections'] == before + 1
+        # Der Server schließt die Antwort, bevor der Generator angelaufen ist
+        response.close()
+    assert zyrix.user_feed.stats()['connections'] == before
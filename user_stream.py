@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import threading
+
+# Live-Kontostand (/user-info/stream) Konfiguration
+# Abstand der gebündelten Abfrage aller verbundenen Benutzer
+USER_STREAM_POLL_INTERVAL = float(os.environ.get('USER_STREAM_POLL_INTERVAL', 2))
+# User-IDs pro in_()-Abfrage (begrenzt die URL-Länge)
+USER_STREAM_BATCH_SIZE = int(os.environ.get('USER_STREAM_BATCH_SIZE', 200))
+# Kommentarzeile ohne Änderung: hält Proxys offen und erkennt getrennte Clients
+USER_STREAM_HEARTBEAT = float(os.environ.get('USER_STREAM_HEARTBEAT', 15))
+# Offene Streams pro Worker (gunicorn.conf.py passt den Standard an das Worker-Modell an)
+USER_STREAM_MAX_CONNECTIONS = int(os.environ.get('USER_STREAM_MAX_CONNECTIONS', 100))
+# Wartezeit, die Clients nach einem Verbindungsabbruch vor dem Neuverbinden einhalten
+USER_STREAM_RETRY_MS = int(os.environ.get('USER_STREAM_RETRY_MS', 5000))
+
+# Spalten, die compute() aus einer Zeile braucht (entspricht repository.USER_STREAM_COLUMNS)
+STREAM_COLUMNS = ('id', 'tokens', 'status')
+
+class StreamLimitReached(Exception):
+    """Dieser Worker hält bereits USER_STREAM_MAX_CONNECTIONS Streams"""
+
+class Subscription:
+    """Ein offener Stream: letzter gesendeter und nächster zu sendender Wert.
+
+    Geweckt wird über ein einfaches Lock statt threading.Event (Condition
+    plus Warteschlange): gesperrt heißt "keine Änderung", offer() gibt es
+    frei, wait() sperrt es wieder. Das spart gut 1 KB pro Verbindung.
+    """
+
+    __slots__ = ('user_id', 'last', '_next', '_signal')
+
+    def __init__(self, user_id, value):
+        self.user_id = user_id
+        self.last = value
+        self._next = None
+        self._signal = threading.Lock()
+        self._signal.acquire()
+
+    def offer(self, value):
+        if value != self.last:
+            self._next = value
+            try:
+                self._signal.release()
+            except RuntimeError:
+                # Bereits geweckt, wait() liest den neuesten Wert
+                pass
+
+    def wait(self, timeout):
+        """Neuen Wert liefern, None nach timeout ohne Änderung"""
+        if not self._signal.acquire(timeout=timeout):
+            return None
+        value, self._next = self._next, None
+        if value is None or value == self.last:
+            return None
+        self.last = value
+        return value
+
+class UserFeed:
+    """Änderungs-Feed für alle Streams eines Workers.
+
+    Ein Hintergrund-Thread fragt alle USER_STREAM_POLL_INTERVAL Sekunden die
+    Zeilen aller verbundenen Benutzer gebündelt ab (load_many, eine
+    in_()-Abfrage pro USER_STREAM_BATCH_SIZE IDs) und weckt nur die Streams,
+    deren Wert (compute(row)) sich geändert hat. Wartende Streams kosten
+    damit keine Abfragen. Änderungen dieses Workers (z.B. Abbuchungen)
+    meldet notify() sofort.
+    """
+
+    def __init__(self, load_many, compute, interval=USER_STREAM_POLL_INTERVAL,
+                 batch_size=USER_STREAM_BATCH_SIZE, heartbeat=USER_STREAM_HEARTBEAT,
+                 max_connections=USER_STREAM_MAX_CONNECTIONS):
+        self.load_many = load_many
+        self.compute = compute
+        self.interval = interval
+        self.batch_size = batch_size
+        self.heartbeat = heartbeat
+        self.max_connections = max_connections
+
+        self._lock = threading.Lock()
+        # user_id -> Streams bzw. zuletzt gelesene Zeile
+        self._subscriptions = {}
+        self._rows = {}
+        self._connections = 0
+        self._thread = None
+        self._pid = None
+
+        # Kennzahlen dieses Prozesses
+        self.polls = 0
+        self.queries = 0
+        self.pushes = 0
+        self.errors = 0
+        self.rejected = 0
+        self._poll_seconds_last = 0.0
+
+    def start(self):
+        """Feed-Thread starten (idempotent, auch nach fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Streams des Elternprozesses gehören nicht zu diesem Worker
+                self._subscriptions = {}
+                self._rows = {}
+                self._connections = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='user-feed', daemon=True)
+            self._thread.start()
+
+    def subscribe(self, user_id, row):
+        """Stream für user_id anmelden; row ist die aktuelle Zeile (z.B. aus dem Cache)"""
+        self.start()
+        with self._lock:
+            if self._connections >= self.max_connections:
+                self.rejected += 1
+                raise StreamLimitReached()
+            # Nur die Spalten des Feeds behalten (row kann die ganze Cache-Zeile sein)
+            self._rows.setdefault(user_id, {column: row[column] for column in STREAM_COLUMNS})
+            subscription = Subscription(user_id, self.compute(self._rows[user_id]))
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self._connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            self._connections -= 1
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+                self._rows.pop(subscription.user_id, None)
+
+    def notify(self, user_id):
+        """Wert neu berechnen und Streams dieses Benutzers wecken (Änderung in diesem Worker)"""
+        with self._lock:
+            row = self._rows.get(user_id)
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        if row is None:
+            return
+        value = self.compute(row)
+        for subscription in subscriptions:
+            subscription.offer(value)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                print(f"User-Feed Fehler: {e}")
+
+    def poll(self):
+        """Alle verbundenen Benutzer gebündelt abfragen und geänderte Streams wecken"""
+        with self._lock:
+            user_ids = list(self._subscriptions)
+        if not user_ids:
+            return
+        started = time.perf_counter()
+        for start in range(0, len(user_ids), self.batch_size):
+            rows = self.load_many(user_ids[start:start + self.batch_size])
+            self.queries += 1
+            for row in rows:
+                with self._lock:
+                    if row['id'] not in self._rows:
+                        # Inzwischen abgemeldet
+                        continue
+                    self._rows[row['id']] = row
+                    subscriptions = list(self._subscriptions.get(row['id'], ()))
+                value = self.compute(row)
+                for subscription in subscriptions:
+                    if value != subscription.last:
+                        self.pushes += 1
+                    subscription.offer(value)
+        self.polls += 1
+        self._poll_seconds_last = time.perf_counter() - started
+
+    def events(self, subscription, expires_at=None):
+        """SSE-Nachrichten: aktueller Wert, danach nur Änderungen und Heartbeats.
+
+        Endet mit event: expired, sobald das JWT (exp) abläuft; der Client
+        verbindet sich dann mit einem neuen Token.
+        """
+        try:
+            yield f'retry: {USER_STREAM_RETRY_MS}\n' + _event('balance', subscription.last)
+            while True:
+                timeout = self.heartbeat
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        yield _event('expired', {})
+                        return
+                    timeout = min(timeout, remaining)
+                value = subscription.wait(timeout)
+                yield _event('balance', value) if value is not None else ': ping\n\n'
+        finally:
+            # Auch bei Verbindungsabbruch (GeneratorExit beim nächsten Schreiben)
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            'connections': self._connections,
+            'users': len(self._subscriptions),
+            'max_connections': self.max_connections,
+            'poll_interval_seconds': self.interval,
+            'polls': self.polls,
+            'queries': self.queries,
+            'pushes': self.pushes,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'last_poll_ms': round(self._poll_seconds_last * 1000, 2)
+        }
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'